@@ -1,18 +1,27 @@
+import logging
 from bson import ObjectId
 from datetime import datetime
 from typing import List, Optional
-from models.AlertasModel import AlertaInsert, AlertaUpdate, AlertaSalida, Salida
+from models.AlertasModel import AlertaInsert, AlertaUpdate, AlertaSalida, Salida, AlertasListaSalida, MotorAlertasSalida
+from dao.motorAlertas import MotorAlertas
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, limitar, filtroDesde, cortarPagina
+from comun.serializacion import proyector
+from comun.versiones import CAMPO_VERSION, conVersion, filtroSiCambia
+from comun.instrumentacion import medirMetodos
 
+logger = logging.getLogger(__name__)
+
+@medirMetodos
 class AlertasDAO:
     def __init__(self, db):
         self.db = db
         self.collection = self.db.alertas
 
-    def registrarAlerta(self, alerta: AlertaInsert) -> Salida:
+    async def registrarAlerta(self, alerta: AlertaInsert) -> Salida:
         try:
             doc = alerta.dict()
             doc["fechaGenerada"] = datetime.combine(doc["fechaGenerada"], datetime.min.time())
-            res = self.collection.insert_one(doc)
+            res = await self.collection.insert_one(doc)
             if res.inserted_id:
                 return Salida(estatus="OK", mensaje="Alerta registrada correctamente")
             else:
@@ -20,27 +29,31 @@ class AlertasDAO:
         except Exception as e:
             return Salida(estatus="ERROR", mensaje=f"Error interno: {str(e)}")
 
-    def actualizarAlerta(self, id_alerta: str, alerta_data: AlertaUpdate) -> Salida:
+    async def actualizarAlerta(self, id_alerta: str, alerta_data: AlertaUpdate) -> Salida:
         try:
             update_fields = {k: v for k, v in alerta_data.dict().items() if v is not None}
             if not update_fields:
                 return Salida(estatus="ERROR", mensaje="No hay campos para actualizar")
 
-            result = self.db.alertas.update_one(
-                {"_id": ObjectId(id_alerta)},
-                {"$set": update_fields}
+            # La versión sube en la misma escritura, solo si algún campo cambia
+            result = await self.db.alertas.update_one(
+                filtroSiCambia({"_id": ObjectId(id_alerta)}, update_fields),
+                conVersion({"$set": update_fields})
             )
 
-            if result.modified_count == 0:
-                return Salida(estatus="ERROR", mensaje="Alerta no encontrada o sin cambios")
+            if result.matched_count == 0:
+                # El filtro no coincide tanto si no existe como si los valores son los mismos
+                if await self.collection.find_one({"_id": ObjectId(id_alerta)}, {"_id": 1}) is None:
+                    return Salida(estatus="ERROR", mensaje="Alerta no encontrada")
+                return Salida(estatus="INFO", mensaje="La alerta ya tenía los valores enviados; no hubo cambios")
 
             return Salida(estatus="OK", mensaje="Alerta actualizada")
         except Exception as e:
             return Salida(estatus="ERROR", mensaje=str(e))
 
-    def eliminarAlerta(self, id_alerta: str) -> Salida:
+    async def eliminarAlerta(self, id_alerta: str) -> Salida:
         try:
-            res = self.collection.delete_one({"_id": ObjectId(id_alerta)})
+            res = await self.collection.delete_one({"_id": ObjectId(id_alerta)})
             if res.deleted_count == 1:
                 return Salida(estatus="OK", mensaje="Alerta eliminada correctamente")
             else:
@@ -48,9 +61,16 @@ class AlertasDAO:
         except Exception as e:
             return Salida(estatus="ERROR", mensaje=f"Error interno: {str(e)}")
 
-    def consultarAlertaPorId(self, id_alerta: str) -> Optional[AlertaSalida]:
+    async def versionAlerta(self, id_alerta: str) -> Optional[int]:
+        try:
+            doc = await self.collection.find_one({"_id": ObjectId(id_alerta)}, {CAMPO_VERSION: 1})
+        except Exception:
+            return None
+        return doc.get(CAMPO_VERSION, 0) if doc else None
+
+    async def consultarAlertaPorId(self, id_alerta: str) -> Optional[AlertaSalida]:
         try:
-            doc = self.collection.find_one({"_id": ObjectId(id_alerta)})
+            doc = await self.collection.find_one({"_id": ObjectId(id_alerta)})
             if doc:
                 doc["idAlerta"] = str(doc["_id"])
                 del doc["_id"]
@@ -59,14 +79,30 @@ class AlertasDAO:
         except Exception:
             return None
 
-    def listarAlertas(self) -> List[AlertaSalida]:
-        alertas = []
+    async def listarAlertas(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None,
+                            rapido: bool = False) -> AlertasListaSalida:
+        salida = AlertasListaSalida()
+        limite = limitar(limite)
         try:
-            cursor = self.collection.find()
-            for doc in cursor:
+            docs = await self.collection.find(filtroDesde(cursor)).sort("_id", 1).limit(limite + 1).to_list(length=None)
+            docs, salida.siguiente = cortarPagina(docs, limite)
+            for doc in docs:
                 doc["idAlerta"] = str(doc["_id"])
                 del doc["_id"]
-                alertas.append(AlertaSalida(**doc))
+                salida.alertas.append(proyector(AlertaSalida)(doc) if rapido else AlertaSalida(**doc))
+        except CursorInvalido:
+            raise
         except Exception:
             pass
-        return alertas
+        return salida
+
+    async def ejecutarMotor(self) -> MotorAlertasSalida:
+        try:
+            resultado = await MotorAlertas(self.db).ejecutar()
+            return MotorAlertasSalida(estatus="OK",
+                                      mensaje=f"Motor ejecutado: {resultado['alertasNuevas']} alerta(s) nueva(s)",
+                                      **resultado)
+        except Exception as e:
+            # Las marcas no avanzaron: la siguiente ejecución repite las mismas ventanas
+            logger.exception("Error en AlertasDAO.ejecutarMotor: el motor de alertas no terminó")
+            return MotorAlertasSalida(estatus="ERROR", mensaje=f"Error interno: {str(e)}")
@@ -0,0 +1,211 @@
+"""
+Alertas en vivo: cambios de la colección 'alertas' empujados por Server-Sent Events.
+- Un solo change stream por proceso (la central) reparte los cambios a la cola de cada suscriptor;
+  los suscriptores no ocupan cada uno una conexión del pool esperando cambios.
+- El id de cada evento es el token de reanudación. Al reconectar (Last-Event-ID) el suscriptor se pone
+  al día con un change stream propio desde ese token y después sigue con lo que entrega la central.
+- Un suscriptor que no consume a tiempo se desconecta; al reconectar recupera lo perdido con su token.
+- Si la central falla, cada suscriptor recibe un evento 'reconectar' cuyo id es el token hasta donde
+  se le entregó; el cliente reconecta con él (Last-Event-ID) aunque todavía no haya recibido alertas.
+"""
+import asyncio
+import logging
+import string
+
+import orjson
+from pymongo.errors import OperationFailure
+
+from models.AlertasModel import AlertaSalida
+from comun.serializacion import proyector, _porDefecto
+
+OPERACIONES = ("insert", "update", "replace")
+PIPELINE_CAMBIOS = [
+    {"$match": {"operationType": {"$in": list(OPERACIONES)}}},
+    {"$project": {"operationType": 1, "fullDocument": 1}},
+]
+ESPERA_CAMBIOS_MS = 10000
+ESPERA_PONERSE_AL_DIA_MS = 1000
+LATIDO_SEGUNDOS = 15
+REINTENTO_MS = 3000
+MAX_PENDIENTES = 1000
+
+logger = logging.getLogger(__name__)
+
+
+class TokenInvalido(ValueError):
+    pass
+
+
+class FlujoNoDisponible(RuntimeError):
+    pass
+
+
+def _evento(cambio) -> bytes:
+    doc = dict(cambio["fullDocument"])
+    doc["idAlerta"] = str(doc.pop("_id"))
+    datos = proyector(AlertaSalida)(doc)
+    datos["operacion"] = cambio["operationType"]
+    return (b"id: " + cambio["_id"]["_data"].encode("ascii") + b"\nevent: alerta\ndata: "
+            + orjson.dumps(datos, default=_porDefecto) + b"\n\n")
+
+
+class Suscriptor:
+    def __init__(self, tipo_alerta: str | None, estado_alerta: str | None, token: str | None = None):
+        self.tipo_alerta = tipo_alerta
+        self.estado_alerta = estado_alerta
+        self.token = token
+        self.cola = asyncio.Queue()
+        self.cerrado = False
+        self.pendientes = []  # Cambios del stream propio para ponerse al día tras reconectar
+        self.flujo_propio = None
+        self.token_cierre = None  # Token de la central al cerrarse, para el evento 'reconectar'
+
+    def acepta(self, cambio) -> bool:
+        doc = cambio.get("fullDocument")
+        if doc is None:  # Actualizada y borrada antes de que se leyera el documento completo
+            return False
+        return ((self.tipo_alerta is None or doc.get("tipoAlerta") == self.tipo_alerta)
+                and (self.estado_alerta is None or doc.get("estadoAlerta") == self.estado_alerta))
+
+    def entregar(self, cambio):
+        if self.cerrado or not self.acepta(cambio):
+            return
+        if self.cola.qsize() >= MAX_PENDIENTES:
+            self.cerrar()
+            return
+        self.cola.put_nowait(cambio)
+
+    def cerrar(self, token: str | None = None):
+        if not self.cerrado:
+            self.cerrado = True
+            self.token_cierre = token
+            self.cola.put_nowait(None)
+
+    def filtro(self) -> list:
+        # Los mismos filtros, del lado del servidor, para el stream propio
+        condiciones = {}
+        if self.tipo_alerta is not None:
+            condiciones["fullDocument.tipoAlerta"] = self.tipo_alerta
+        if self.estado_alerta is not None:
+            condiciones["fullDocument.estadoAlerta"] = self.estado_alerta
+        return PIPELINE_CAMBIOS + ([{"$match": condiciones}] if condiciones else [])
+
+    async def eventos(self, request, central):
+        try:
+            yield f"retry: {REINTENTO_MS}\n\n".encode("ascii")
+
+            # Primero lo ocurrido desde el token; lo que la central encoló mientras tanto se filtra abajo
+            ultimo = self.token
+            if self.flujo_propio is not None:
+                while self.pendientes:
+                    for cambio in self.pendientes:
+                        if self.acepta(cambio):
+                            yield _evento(cambio)
+                        ultimo = cambio["_id"]["_data"]
+                    cambio = await self.flujo_propio.try_next()
+                    self.pendientes = [cambio] if cambio is not None else []
+                await self.flujo_propio.close()
+                self.flujo_propio = None
+
+            while True:
+                try:
+                    cambio = await asyncio.wait_for(self.cola.get(), LATIDO_SEGUNDOS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        return
+                    yield b": latido\n\n"
+                    continue
+                if cambio is None:
+                    if self.token_cierre is not None:
+                        # Falló la central: lo encolado antes ya se entregó; se reanuda desde su token
+                        token = max(self.token_cierre, ultimo or "")
+                        yield b"id: " + token.encode("ascii") + b"\nevent: reconectar\ndata: {}\n\n"
+                    return
+                # Los tokens (_data) del mismo despliegue se ordenan igual que los cambios
+                if ultimo is not None and cambio["_id"]["_data"] <= ultimo:
+                    continue
+                yield _evento(cambio)
+                ultimo = cambio["_id"]["_data"]
+        finally:
+            central.quitar(self)
+            if self.flujo_propio is not None:
+                await self.flujo_propio.close()
+
+
+class CentralAlertas:
+    def __init__(self, db):
+        self.db = db
+        self._suscriptores = set()
+        self._tarea = None
+        self._disponible = None
+
+    async def _verificarDisponible(self) -> dict:
+        # Los change streams solo existen en réplicas y clústeres fragmentados
+        hola = await self.db.command("hello")
+        self._disponible = "setName" in hola or hola.get("msg") == "isdbgrid"
+        if not self._disponible:
+            raise FlujoNoDisponible("El flujo de alertas requiere que MongoDB corra como réplica (replica set).")
+        return hola
+
+    async def _escuchar(self, desde):
+        flujo = None
+        try:
+            async with self.db.alertas.watch(PIPELINE_CAMBIOS, full_document="updateLookup",
+                                             start_at_operation_time=desde,
+                                             max_await_time_ms=ESPERA_CAMBIOS_MS) as flujo:
+                while self._suscriptores:
+                    cambio = await flujo.try_next()
+                    if cambio is not None:
+                        for suscriptor in list(self._suscriptores):
+                            suscriptor.entregar(cambio)
+        except Exception:
+            logger.exception("Error en CentralAlertas._escuchar: se detuvo el change stream de alertas; "
+                             "se cierran %d suscriptor(es) para que reconecten", len(self._suscriptores))
+        finally:
+            # Sin central los suscriptores se cierran; al reconectar siguen desde el token de la central
+            # (todo lo anterior ya está en sus colas) o desde su último evento
+            token = (flujo.resume_token or {}).get("_data") if flujo is not None else None
+            for suscriptor in list(self._suscriptores):
+                suscriptor.cerrar(token)
+            self._suscriptores.clear()
+
+    async def suscribir(self, tipo_alerta: str | None = None, estado_alerta: str | None = None,
+                        token: str | None = None) -> Suscriptor:
+        if token is not None and (not token or any(c not in string.hexdigits for c in token)):
+            raise TokenInvalido("Token de reanudación inválido.")
+        arrancar = self._tarea is None or self._tarea.done()
+        if arrancar:
+            hola = await self._verificarDisponible()
+
+        suscriptor = Suscriptor(tipo_alerta, estado_alerta, token)
+        # Se registra antes de abrir el stream propio para no perder cambios entre ambos
+        self._suscriptores.add(suscriptor)
+        if self._tarea is None or self._tarea.done():
+            # La central arranca desde el tiempo de operación leído antes de registrar al suscriptor
+            self._tarea = asyncio.create_task(self._escuchar(hola.get("operationTime")))
+
+        if token is not None:
+            try:
+                suscriptor.flujo_propio = self.db.alertas.watch(
+                    suscriptor.filtro(), full_document="updateLookup", resume_after={"_data": token},
+                    max_await_time_ms=ESPERA_PONERSE_AL_DIA_MS)
+                cambio = await suscriptor.flujo_propio.try_next()
+            except OperationFailure:
+                self.quitar(suscriptor)
+                if suscriptor.flujo_propio is not None:
+                    await suscriptor.flujo_propio.close()
+                raise TokenInvalido("Token de reanudación inválido o fuera del historial disponible (oplog).")
+            suscriptor.pendientes = [cambio] if cambio is not None else []
+        return suscriptor
+
+    def quitar(self, suscriptor: Suscriptor):
+        self._suscriptores.discard(suscriptor)
+
+
+def obtenerCentral(app) -> CentralAlertas:
+    # Una central por aplicación, creada con la primera suscripción
+    central = getattr(app, "centralAlertas", None)
+    if central is None or central.db is not app.db:
+        central = CentralAlertas(app.db)
+        app.centralAlertas = central
+    return central
@@ -0,0 +1,18 @@
+from pymongo import ASCENDING
+
+from comun.indices import aplicarRegistro, imprimirReporte
+
+# Índices que necesita este servicio, por colección.
+# Cada uno lleva nombre fijo para poder verificarlo contra lo que ya existe en la base.
+INDICES = {
+    "alertas": [
+        # Upsert del motor de alertas; las alertas registradas a mano no llevan clave
+        {"nombre": "claveAlerta_unica", "llaves": [("claveAlerta", ASCENDING)],
+         "opciones": {"unique": True, "partialFilterExpression": {"claveAlerta": {"$exists": True}}}},
+    ],
+}
+
+
+async def asegurarIndices(db) -> list:
+    reporte = await aplicarRegistro(db, INDICES)
+    return imprimirReporte(reporte)
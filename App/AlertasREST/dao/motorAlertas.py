@@ -0,0 +1,205 @@
+"""
+Motor de reglas que genera alertas a partir de los datos de los otros servicios.
+- Cada regla es una agregación que evalúa por lotes solo lo nuevo desde sus marcas de agua:
+  lo que llegó a su fecha límite (riegos, cosechas) y lo que se escribió desde la última ejecución,
+  según la hora de escritura que los DAO guardan en actualizadoEn (comun/versiones.py).
+- Sin marca de escrituras (primera ejecución) la regla evalúa todo lo que cumple la condición.
+- Las marcas se guardan en la colección 'motor_alertas' y avanzan solo si la escritura salió bien.
+- Todas las alertas de una ejecución van en un solo bulk_write de upserts por 'claveAlerta';
+  volver a evaluar una ventana no duplica alertas ni reabre las ya atendidas.
+"""
+import asyncio
+import os
+from datetime import date, datetime, timedelta
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from comun.instrumentacion import medirMetodos
+from comun.versiones import CAMPO_ACTUALIZADO
+
+COLECCION_MARCAS = "motor_alertas"
+ID_MARCAS = "marcas"
+ESTADO_INICIAL = "Pendiente"
+
+# Banda aceptable de pH del suelo; fuera de ella se alerta
+PH_MINIMO = float(os.environ.get("AGRO_PH_MINIMO", "5.5"))
+PH_MAXIMO = float(os.environ.get("AGRO_PH_MAXIMO", "7.5"))
+
+# actualizadoEn se asigna en el cliente antes de escribir; se deja este margen para las escrituras en camino
+MARGEN_ESCRITURA_SEGUNDOS = 60
+# Sufijo de la marca de escrituras de cada regla en el documento de marcas
+SUFIJO_CAMBIOS = "Cambios"
+
+# Una sola ejecución a la vez por proceso; entre procesos los upserts por clave siguen siendo idempotentes
+_candado = asyncio.Lock()
+
+
+def _ventana(marca, corte) -> dict:
+    # Ventana semiabierta [marca, corte): la siguiente ejecución empieza justo donde terminó esta
+    rango = {"$lt": corte}
+    if marca is not None:
+        rango["$gte"] = marca
+    return rango
+
+
+def _vencidosOEscritos(campo: str, marca, corte, marca_cambios, corte_cambios, prefijo: str = "") -> dict:
+    """
+    Condición de una regla con fecha límite: 'campo' ya pasó el corte y además
+    llegó al corte en esta ventana o se escribió desde la última ejecución.
+    - Las escrituras cubren lo que se registró tarde o se editó hacia atrás (fecha, estado...).
+    - Sin alguna de las dos marcas se evalúa todo lo vencido.
+    """
+    condicion = {prefijo + campo: {"$lt": corte}}
+    if marca is not None and marca_cambios is not None:
+        condicion["$or"] = [
+            {prefijo + campo: {"$gte": marca}},
+            {prefijo + CAMPO_ACTUALIZADO: _ventana(marca_cambios, corte_cambios)},
+        ]
+    return condicion
+
+
+def _escritos(marca_cambios, corte_cambios) -> dict:
+    # Sin marca se evalúa todo; los documentos sin actualizadoEn (anteriores a la marca) solo entran así
+    if marca_cambios is None:
+        return {}
+    return {CAMPO_ACTUALIZADO: _ventana(marca_cambios, corte_cambios)}
+
+
+@medirMetodos
+class MotorAlertas:
+    def __init__(self, db, ph_minimo: float = PH_MINIMO, ph_maximo: float = PH_MAXIMO):
+        self.db = db
+        self.ph_minimo = ph_minimo
+        self.ph_maximo = ph_maximo
+
+    async def _riegosVencidos(self, marcas: dict, hoy: date, corte_cambios: datetime):
+        # Riegos que siguen Pendiente y cuyo día esperado ya terminó (fechaEsperada se guarda a medianoche)
+        corte = datetime.combine(hoy, datetime.min.time())
+        marca, marca_cambios = marcas.get("riegosVencidos"), marcas.get("riegosVencidos" + SUFIJO_CAMBIOS)
+        elemento = {"status": "Pendiente",
+                    **_vencidosOEscritos("fechaEsperada", marca, corte, marca_cambios, corte_cambios)}
+        pipeline = [
+            {"$match": {"riegos": {"$elemMatch": elemento}}},
+            {"$unwind": "$riegos"},
+            {"$match": {"riegos.status": "Pendiente",
+                        **_vencidosOEscritos("fechaEsperada", marca, corte, marca_cambios, corte_cambios, "riegos.")}},
+            {"$project": {"_id": 0, "idCultivo": 1, "idRiego": "$riegos.idRiego", "fechaEsperada": "$riegos.fechaEsperada"}},
+        ]
+        alertas = []
+        async for doc in self.db.riegos_buckets.aggregate(pipeline):
+            alertas.append((
+                f"riego:{doc['idRiego']}",
+                "Riego vencido",
+                f"El riego {doc['idRiego']} del cultivo {doc['idCultivo']} sigue Pendiente; "
+                f"se esperaba el {doc['fechaEsperada']:%Y-%m-%d}.",
+            ))
+        return alertas, {"riegosVencidos": corte, "riegosVencidos" + SUFIJO_CAMBIOS: corte_cambios}
+
+    async def _phFueraDeRango(self, marcas: dict, corte_cambios: datetime):
+        # Mediciones registradas o editadas desde la última ejecución fuera de la banda,
+        # agrupadas por cultivo y día de medición. Usa el índice de actualizadoEn, no un recorrido por _id
+        marca_cambios = marcas.get("phFueraDeRango" + SUFIJO_CAMBIOS)
+        pipeline = [
+            {"$match": {
+                **_escritos(marca_cambios, corte_cambios),
+                "eliminado": False,
+                "$or": [{"pH": {"$lt": self.ph_minimo}}, {"pH": {"$gt": self.ph_maximo}}],
+            }},
+            {"$group": {
+                "_id": {"idCultivo": "$idCultivo",
+                        "dia": {"$dateToString": {"format": "%Y-%m-%d", "date": "$fechaMedicion"}}},
+                "minimo": {"$min": "$pH"},
+                "maximo": {"$max": "$pH"},
+                "mediciones": {"$sum": 1},
+            }},
+        ]
+        alertas = []
+        async for doc in self.db.historial_suelo.aggregate(pipeline):
+            id_cultivo, dia = doc["_id"]["idCultivo"], doc["_id"]["dia"]
+            alertas.append((
+                f"ph:{id_cultivo}:{dia}",
+                "pH fuera de rango",
+                f"{doc['mediciones']} medición(es) del cultivo {id_cultivo} el {dia} con pH entre "
+                f"{doc['minimo']} y {doc['maximo']}; rango aceptable {self.ph_minimo}-{self.ph_maximo}.",
+            ))
+        return alertas, {"phFueraDeRango" + SUFIJO_CAMBIOS: corte_cambios}
+
+    async def _cosechasAtrasadas(self, marcas: dict, hoy: date, corte_cambios: datetime):
+        # fechaCosechaEst se guarda como texto ISO (AAAA-MM-DD), que se ordena igual que la fecha.
+        # Las escrituras cubren la fecha movida al pasado y el cultivo que deja de estar Cosechado
+        corte = hoy.isoformat()
+        marca, marca_cambios = marcas.get("cosechasAtrasadas"), marcas.get("cosechasAtrasadas" + SUFIJO_CAMBIOS)
+        pipeline = [
+            {"$match": {
+                "registroActivo": True,
+                "estadoActual": {"$ne": "Cosechado"},
+                **_vencidosOEscritos("fechaCosechaEst", marca, corte, marca_cambios, corte_cambios),
+            }},
+            {"$project": {"nomCultivo": 1, "fechaCosechaEst": 1}},
+        ]
+        alertas = []
+        async for doc in self.db.cultivos.aggregate(pipeline):
+            alertas.append((
+                f"cosecha:{doc['_id']}",
+                "Cosecha atrasada",
+                f"El cultivo {doc.get('nomCultivo')} ({doc['_id']}) tenía cosecha estimada el "
+                f"{doc['fechaCosechaEst']} y aún no está Cosechado.",
+            ))
+        return alertas, {"cosechasAtrasadas": corte, "cosechasAtrasadas" + SUFIJO_CAMBIOS: corte_cambios}
+
+    async def ejecutar(self) -> dict:
+        """
+        Evalúa todas las reglas desde sus marcas y escribe las alertas resultantes.
+        - Regresa, por regla, cuántas alertas produjo la ventana evaluada.
+        - Si la escritura falla, las marcas no se mueven y la siguiente ejecución repite la ventana.
+        """
+        async with _candado:
+            ahora = datetime.now()
+            hoy = ahora.date()
+            corte_cambios = ahora - timedelta(seconds=MARGEN_ESCRITURA_SEGUNDOS)
+            marcas = await self.db[COLECCION_MARCAS].find_one({"_id": ID_MARCAS}) or {}
+
+            reglas = {
+                "riegosVencidos": self._riegosVencidos(marcas, hoy, corte_cambios),
+                "phFueraDeRango": self._phFueraDeRango(marcas, corte_cambios),
+                "cosechasAtrasadas": self._cosechasAtrasadas(marcas, hoy, corte_cambios),
+            }
+            resultados = await asyncio.gather(*reglas.values())
+
+            fecha_generada = datetime.combine(hoy, datetime.min.time())
+            operaciones, por_regla, nuevas_marcas = [], {}, {}
+            for nombre, (alertas, cortes) in zip(reglas, resultados):
+                por_regla[nombre] = len(alertas)
+                nuevas_marcas.update(cortes)
+                for clave, tipo, descripcion in alertas:
+                    # $setOnInsert: una alerta ya existente (quizá atendida) no se reescribe
+                    operaciones.append(UpdateOne(
+                        {"claveAlerta": clave},
+                        {"$setOnInsert": {
+                            "tipoAlerta": tipo,
+                            "descripcion": descripcion,
+                            "fechaGenerada": fecha_generada,
+                            "estadoAlerta": ESTADO_INICIAL,
+                        }},
+                        upsert=True,
+                    ))
+
+            nuevas = 0
+            if operaciones:
+                try:
+                    resultado = await self.db.alertas.bulk_write(operaciones, ordered=False)
+                    nuevas = resultado.upserted_count
+                except BulkWriteError as ex:
+                    # Llave duplicada: otro proceso insertó la misma alerta al mismo tiempo; ya existe
+                    if any(error.get("code") != 11000 for error in ex.details.get("writeErrors", [])):
+                        raise
+                    nuevas = ex.details.get("nUpserted", 0)
+
+            # 'phFueraDeRango' era una marca por _id de versiones anteriores; la reemplaza la de escrituras
+            await self.db[COLECCION_MARCAS].update_one(
+                {"_id": ID_MARCAS},
+                {"$set": {**nuevas_marcas, "ultimaEjecucion": ahora}, "$unset": {"phFueraDeRango": ""}},
+                upsert=True,
+            )
+            return {"porRegla": por_regla, "alertasNuevas": nuevas}
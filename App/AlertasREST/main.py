@@ -0,0 +1,39 @@
+import sys
+from pathlib import Path
+
+# La carpeta App contiene el paquete compartido 'comun'
+RAIZ_APP = str(Path(__file__).resolve().parents[1])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
+
+import uvicorn
+from fastapi import FastAPI
+from mongo import Conexion
+from dao.indices import asegurarIndices
+from comun.instrumentacion import MedicionMiddleware
+from routers.AlertaRouter import alertaRouter
+
+app = FastAPI()
+app.add_middleware(MedicionMiddleware)
+
+app.include_router(alertaRouter)
+
+@app.get("/")
+async def home():
+    return {"mensaje": "Bienvenido a AgroApp - Alertas"}
+
+@app.on_event("startup")
+async def startup():
+    print("Conectando con MongoDB")
+    conexion = Conexion()
+    app.conexion = conexion
+    app.db = conexion.getDB()
+    await asegurarIndices(app.db)
+
+@app.on_event("shutdown")
+async def shutdown():
+    print("Cerrando la conexión con MongoDB")
+    app.conexion.cerrar()
+
+if __name__ == '__main__':
+    uvicorn.run("main:app", host='127.0.0.1', reload=True)
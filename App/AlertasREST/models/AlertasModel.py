@@ -23,3 +23,11 @@ class AlertaSalida(AlertaBase):
 class Salida(BaseModel):
     estatus: str
     mensaje: str
+
+class AlertasListaSalida(BaseModel):
+    alertas: list[AlertaSalida] = []
+    siguiente: Optional[str] = None
+
+class MotorAlertasSalida(Salida):
+    alertasNuevas: int = 0
+    porRegla: dict[str, int] = {}  # Alertas que produjo cada regla en la ventana evaluada
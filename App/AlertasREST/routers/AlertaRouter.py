@@ -1,41 +1,99 @@
-from fastapi import APIRouter, Request, HTTPException, Body
-from typing import List
-from models.AlertasModel import AlertaInsert, AlertaUpdate, AlertaSalida, Salida
+from fastapi import APIRouter, Request, Response, HTTPException, Body, Query, Header
+from fastapi.responses import StreamingResponse
+from typing import List, Optional
+from models.AlertasModel import AlertaInsert, AlertaUpdate, AlertaSalida, Salida, AlertasListaSalida, MotorAlertasSalida
 from dao.AlertasDAO import AlertasDAO
+from dao.flujoAlertas import TokenInvalido, FlujoNoDisponible, obtenerCentral
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, LIMITE_MAXIMO
+from comun.serializacion import respuestaRapida
+from comun.versiones import etiquetaFuerte, coincideEtiqueta, noModificado
 
 alertaRouter = APIRouter(prefix="/alertas", tags=["Alertas"])
 
 @alertaRouter.post("/registrar", response_model=Salida)
-def registrar_alerta(request: Request, alerta: AlertaInsert = Body(...)):
+async def registrar_alerta(request: Request, alerta: AlertaInsert = Body(...)):
     dao = AlertasDAO(request.app.db)
-    return dao.registrarAlerta(alerta)
+    return await dao.registrarAlerta(alerta)
 
 @alertaRouter.put("/actualizar/{id_alerta}", response_model=Salida)
-def actualizar_alerta(
+async def actualizar_alerta(
     request: Request,
     id_alerta: str,
     alerta_data: AlertaUpdate = Body(...)
 ):
     dao = AlertasDAO(request.app.db)
-    salida = dao.actualizarAlerta(id_alerta, alerta_data)
+    salida = await dao.actualizarAlerta(id_alerta, alerta_data)
     if salida.estatus == "ERROR":
         raise HTTPException(status_code=400, detail=salida.mensaje)
     return salida
 
 @alertaRouter.delete("/eliminar/{id_alerta}", response_model=Salida)
-def eliminar_alerta(request: Request, id_alerta: str):
+async def eliminar_alerta(request: Request, id_alerta: str):
     dao = AlertasDAO(request.app.db)
-    return dao.eliminarAlerta(id_alerta)
+    return await dao.eliminarAlerta(id_alerta)
 
 @alertaRouter.get("/detalle/{id_alerta}", response_model=AlertaSalida)
-def consultar_alerta_por_id(request: Request, id_alerta: str):
+async def consultar_alerta_por_id(request: Request, response: Response, id_alerta: str):
     dao = AlertasDAO(request.app.db)
-    alerta = dao.consultarAlertaPorId(id_alerta)
+    version = await dao.versionAlerta(id_alerta)
+    if version is not None:
+        etiqueta = etiquetaFuerte("alerta", id_alerta, version)
+        if coincideEtiqueta(request, etiqueta):
+            return noModificado(etiqueta)
+        response.headers["ETag"] = etiqueta
+    alerta = await dao.consultarAlertaPorId(id_alerta)
     if alerta is None:
         raise HTTPException(status_code=404, detail="Alerta no encontrada")
     return alerta
 
-@alertaRouter.get("/listar", response_model=List[AlertaSalida])
-def listar_alertas(request: Request):
+@alertaRouter.get("/listar", response_model=AlertasListaSalida)
+async def listar_alertas(
+    request: Request,
+    limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+    cursor: Optional[str] = None,
+    rapido: bool = Query(False, description="Omite la revalidación de pydantic y serializa con orjson; misma forma de respuesta")
+):
     dao = AlertasDAO(request.app.db)
-    return dao.listarAlertas()
+    try:
+        resultado = await dao.listarAlertas(limite, cursor, rapido)
+        return respuestaRapida(resultado) if rapido else resultado
+    except CursorInvalido as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+@alertaRouter.post("/motor/ejecutar", response_model=MotorAlertasSalida)
+async def ejecutar_motor_alertas(request: Request):
+    """
+    Evalúa las reglas del motor y genera las alertas nuevas.
+    - Riegos Pendiente con fechaEsperada vencida, pH fuera de la banda configurada y cosechas atrasadas.
+    - Solo revisa lo nuevo desde la ejecución anterior; repetirla no duplica alertas.
+    """
+    dao = AlertasDAO(request.app.db)
+    salida = await dao.ejecutarMotor()
+    if salida.estatus == "ERROR":
+        raise HTTPException(status_code=500, detail=salida.mensaje)
+    return salida
+
+@alertaRouter.get("/stream")
+async def stream_alertas(
+    request: Request,
+    tipoAlerta: Optional[str] = None,
+    estadoAlerta: Optional[str] = None,
+    reanudar: Optional[str] = Query(None, description="Id del último evento recibido, si el cliente no manda Last-Event-ID"),
+    last_event_id: Optional[str] = Header(None)
+):
+    """
+    Altas y cambios de alertas en vivo (Server-Sent Events) en lugar de consultar /listar.
+    - Filtros opcionales por tipoAlerta y estadoAlerta.
+    - Cada evento lleva como id su token de reanudación; al reconectar se continúa desde ahí.
+    - Si el servidor pierde el flujo manda el evento 'reconectar' (con id) y cierra; el cliente reconecta con ese id.
+    - Requiere MongoDB como réplica (replica set); un solo nodo basta.
+    """
+    central = obtenerCentral(request.app)
+    try:
+        suscriptor = await central.suscribir(tipoAlerta, estadoAlerta, last_event_id or reanudar)
+    except TokenInvalido as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+    except FlujoNoDisponible as ex:
+        raise HTTPException(status_code=503, detail=str(ex))
+    return StreamingResponse(suscriptor.eventos(request, central), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
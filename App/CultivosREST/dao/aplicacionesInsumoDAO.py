@@ -1,16 +1,32 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from bson import ObjectId
 from models.aplicacionesInsumoModel import AplicacionInsumoInsert, AplicacionInsumoUpdate, \
-    AplicacionInsumoSalidaIndividual, AplicacionInsumoSubConsulta, AplicacionInsumoListSalida, AplicacionInsumoDetalle
+    AplicacionInsumoSalidaIndividual, AplicacionInsumoSubConsulta, AplicacionInsumoListSalida, AplicacionInsumoDetalle, \
+    ConsumoInsumoPeriodo, ConsumoInsumosSalida
 from models.cultivosModel import Salida
 from fastapi.encoders import jsonable_encoder
 from pymongo.database import Database
-
+from dao.referencias import CargadorReferencias
+from comun.catalogoInsumos import catalogoInsumos
+from dao.movimientosInsumos import COLECCION_MOVIMIENTOS, CAMPO_DESCONTADO, moverExistencia, movimiento, \
+    registrarMovimientos
+from comun.paginacion import LIMITE_MAXIMO, limitar
+from comun.instrumentacion import medirMetodos
+
+@medirMetodos
 class AplicacionesInsumoDAO:
-    def __init__(self, db):
+    def __init__(self, db, cargador: CargadorReferencias | None = None):
         self.db = db
+        self.cargador = cargador or CargadorReferencias(db)
+
+    async def _cargarInsumos(self, ids, campos: tuple) -> dict:
+        # Catálogo de insumos en memoria (compartido con UsuariosREST); si no está disponible, por lotes
+        insumos = await catalogoInsumos.cargar(self.db, ids)
+        if insumos is None:
+            insumos = await self.cargador.cargar("insumos", ids, campos)
+        return insumos
 
-    def registrarAplicacionInsumo(self, id_cultivo: str, insumo_data: AplicacionInsumoInsert) -> Salida:
+    async def registrarAplicacionInsumo(self, id_cultivo: str, insumo_data: AplicacionInsumoInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Validar datos de entrada (tus validaciones existentes)
@@ -28,7 +44,7 @@ class AplicacionesInsumoDAO:
                 salida.mensaje = "El ID del cultivo proporcionado no tiene un formato válido."
                 return salida
 
-            cultivo_existente = self.db.cultivos.find_one(
+            cultivo_existente = await self.db.cultivos.find_one(
                 {"_id": obj_id_cultivo, "registroActivo": True}, {"_id": 1}
             )
             if not cultivo_existente:
@@ -47,7 +63,7 @@ class AplicacionesInsumoDAO:
                 salida.estatus = "ERROR"
                 salida.mensaje = "El formato del idUsuario proporcionado no es válido."
                 return salida
-            usuario_existente = self.db.usuarios.find_one({"_id": obj_id_usuario}, {"_id": 1})
+            usuario_existente = await self.db.usuarios.find_one({"_id": obj_id_usuario}, {"_id": 1})
             if not usuario_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"El usuario con ID '{insumo_data.idUsuario}' no existe."
@@ -65,7 +81,7 @@ class AplicacionesInsumoDAO:
                 salida.mensaje = "El formato del idInsumo proporcionado no es válido."
                 return salida
             # Verificar que el insumo exista en la colección 'insumos'
-            insumo_existente_ref = self.db.insumos.find_one({"_id": obj_id_insumo_ref}, {"_id": 1})
+            insumo_existente_ref = await self.db.insumos.find_one({"_id": obj_id_insumo_ref}, {"_id": 1})
             if not insumo_existente_ref:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"El insumo con ID '{insumo_data.idInsumo}' no existe en la base de datos."
@@ -76,16 +92,32 @@ class AplicacionesInsumoDAO:
             insumo_dict["_id"] = ObjectId()  # ID único para el subdocumento de aplicación
             insumo_dict["idUsuario"] = obj_id_usuario  # Guardar ObjectId validado
             insumo_dict["idInsumo"] = obj_id_insumo_ref  # Guardar ObjectId validado del insumo
+            insumo_dict[CAMPO_DESCONTADO] = True
 
+            # 6. Descontar la existencia; un solo $inc condicional rechaza la aplicación si no alcanza
+            if not await moverExistencia(self.db, obj_id_insumo_ref, insumo_data.cantidadAplicada):
+                salida.estatus = "ERROR"
+                salida.mensaje = (f"No hay existencia suficiente del insumo '{insumo_data.idInsumo}' "
+                                  f"para aplicar {insumo_data.cantidadAplicada}.")
+                return salida
 
-            # 6. Actualizar el cultivo, añadiendo la aplicación al array 'aplicacionesInsumos'
-            result = self.db.cultivos.update_one(
-                {"_id": obj_id_cultivo},
-                {"$push": {"aplicacionesInsumos": insumo_dict}}
-            )
+            # 7. Actualizar el cultivo, añadiendo la aplicación al array 'aplicacionesInsumos'
+            try:
+                result = await self.db.cultivos.update_one(
+                    {"_id": obj_id_cultivo},
+                    {"$push": {"aplicacionesInsumos": insumo_dict}}
+                )
+            except Exception:
+                await moverExistencia(self.db, obj_id_insumo_ref, -insumo_data.cantidadAplicada)
+                raise
+            if result.modified_count == 0:
+                # La aplicación no quedó registrada: se devuelve lo descontado
+                await moverExistencia(self.db, obj_id_insumo_ref, -insumo_data.cantidadAplicada)
 
-            # 7. Verificar resultado
+            # 8. Verificar resultado
             if result.modified_count > 0:
+                await registrarMovimientos(self.db, [
+                    movimiento("aplicacion", obj_id_cultivo, insumo_dict, -insumo_data.cantidadAplicada)])
                 salida.estatus = "OK"
                 salida.mensaje = f"Aplicación de insumo registrada con éxito."
             elif result.matched_count == 1 and result.modified_count == 0:
@@ -102,7 +134,7 @@ class AplicacionesInsumoDAO:
         return salida
 
 
-    def editarAplicacionInsumo(self, id_cultivo: str, id_insumo_aplicacion: str,
+    async def editarAplicacionInsumo(self, id_cultivo: str, id_insumo_aplicacion: str,
                                insumo_data: AplicacionInsumoUpdate) -> Salida:
 
         salida = Salida(estatus="", mensaje="")
@@ -141,7 +173,7 @@ class AplicacionesInsumoDAO:
                     salida.estatus = "ERROR"
                     salida.mensaje = "Formato del nuevo idUsuario no válido."
                     return salida
-                usuario_existente = self.db.usuarios.find_one({"_id": obj_id_usuario_update}, {"_id": 1})
+                usuario_existente = await self.db.usuarios.find_one({"_id": obj_id_usuario_update}, {"_id": 1})
                 if not usuario_existente:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"Nuevo usuario con ID '{insumo_update_dict['idUsuario']}' no existe."
@@ -158,7 +190,7 @@ class AplicacionesInsumoDAO:
                     salida.estatus = "ERROR"
                     salida.mensaje = "Formato del nuevo idInsumo no válido."
                     return salida
-                insumo_ref_existente = self.db.insumos.find_one({"_id": obj_id_insumo_ref_update}, {"_id": 1})
+                insumo_ref_existente = await self.db.insumos.find_one({"_id": obj_id_insumo_ref_update}, {"_id": 1})
                 if not insumo_ref_existente:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"Nuevo insumo con ID '{insumo_update_dict['idInsumo']}' no existe."
@@ -175,14 +207,53 @@ class AplicacionesInsumoDAO:
             for key, value in insumo_update_dict.items():
                 update_payload[f"aplicacionesInsumos.$.{key}"] = value
 
-            # 3. Realizar la actualización
-            result = self.db.cultivos.update_one(
-                {"_id": obj_id_cultivo, "aplicacionesInsumos._id": obj_id_insumo_app},
-                {"$set": update_payload}
-            )
-
-            # 4. Verificar resultado
+            # 3. Si cambia cantidad, insumo o fecha de una aplicación que descontó existencia,
+            #    se mueve la diferencia y la bitácora recibe un reverso de la anterior y la nueva aplicación
+            filtro_aplicacion = {"_id": obj_id_insumo_app}
+            cambios_existencia, movimientos = [], []
+            if {"cantidadAplicada", "idInsumo", "fechaAplicacion"} & insumo_update_dict.keys():
+                cultivo_doc = await self.db.cultivos.find_one(
+                    {"_id": obj_id_cultivo, "aplicacionesInsumos._id": obj_id_insumo_app},
+                    {"aplicacionesInsumos": {"$elemMatch": {"_id": obj_id_insumo_app}}})
+                anterior = cultivo_doc["aplicacionesInsumos"][0] if cultivo_doc and cultivo_doc.get("aplicacionesInsumos") else None
+                if anterior is not None and anterior.get(CAMPO_DESCONTADO):
+                    nueva = {**anterior, **insumo_update_dict}
+                    if nueva["idInsumo"] == anterior["idInsumo"]:
+                        pendientes = [(nueva["idInsumo"], nueva["cantidadAplicada"] - anterior["cantidadAplicada"])]
+                    else:
+                        pendientes = [(nueva["idInsumo"], nueva["cantidadAplicada"]),
+                                      (anterior["idInsumo"], -anterior["cantidadAplicada"])]
+                    for id_insumo_mov, cantidad in pendientes:
+                        if not await moverExistencia(self.db, id_insumo_mov, cantidad):
+                            for id_deshacer, cantidad_deshacer in cambios_existencia:
+                                await moverExistencia(self.db, id_deshacer, -cantidad_deshacer)
+                            salida.estatus = "ERROR"
+                            salida.mensaje = f"No hay existencia suficiente del insumo '{id_insumo_mov}' para este cambio."
+                            return salida
+                        cambios_existencia.append((id_insumo_mov, cantidad))
+                    movimientos = [movimiento("reverso", obj_id_cultivo, anterior, anterior["cantidadAplicada"]),
+                                   movimiento("aplicacion", obj_id_cultivo, nueva, -nueva["cantidadAplicada"])]
+                    # Solo si la aplicación sigue como se leyó; si otro la cambió, se deshace lo movido
+                    filtro_aplicacion.update({"idInsumo": anterior["idInsumo"],
+                                              "cantidadAplicada": anterior["cantidadAplicada"]})
+
+            # 4. Realizar la actualización
+            try:
+                result = await self.db.cultivos.update_one(
+                    {"_id": obj_id_cultivo, "aplicacionesInsumos": {"$elemMatch": filtro_aplicacion}},
+                    {"$set": update_payload}
+                )
+            except Exception:
+                for id_deshacer, cantidad_deshacer in cambios_existencia:
+                    await moverExistencia(self.db, id_deshacer, -cantidad_deshacer)
+                raise
+            if result.matched_count == 0:
+                for id_deshacer, cantidad_deshacer in cambios_existencia:
+                    await moverExistencia(self.db, id_deshacer, -cantidad_deshacer)
+
+            # 5. Verificar resultado
             if result.modified_count > 0:
+                await registrarMovimientos(self.db, movimientos)
                 salida.estatus = "OK"
                 salida.mensaje = "Aplicación del insumo actualizada con éxito."
             elif result.matched_count == 1 and result.modified_count == 0:
@@ -199,7 +270,7 @@ class AplicacionesInsumoDAO:
         return salida
 
 
-    def eliminarAplicacionInsumo(self, id_cultivo: str, id_insumo: str) -> Salida:
+    async def eliminarAplicacionInsumo(self, id_cultivo: str, id_insumo: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Validar los IDs
@@ -212,16 +283,23 @@ class AplicacionesInsumoDAO:
                 return salida
 
 
-            result = self.db.cultivos.update_one(
+            # 2. Quitar la aplicación; se regresa como estaba para devolver su existencia
+            cultivo_doc = await self.db.cultivos.find_one_and_update(
                 {"_id": obj_id_cultivo},
-                {"$pull": {"aplicacionesInsumos": {"_id": obj_id_insumo}}}
+                {"$pull": {"aplicacionesInsumos": {"_id": obj_id_insumo}}},
+                projection={"aplicacionesInsumos": {"$elemMatch": {"_id": obj_id_insumo}}}
             )
+            anterior = cultivo_doc["aplicacionesInsumos"][0] if cultivo_doc and cultivo_doc.get("aplicacionesInsumos") else None
 
             # 3. Verificar el resultado de la operación
-            if result.modified_count > 0:
+            if anterior is not None:
+                if anterior.get(CAMPO_DESCONTADO):
+                    await moverExistencia(self.db, anterior["idInsumo"], -anterior["cantidadAplicada"])
+                    await registrarMovimientos(self.db, [
+                        movimiento("reverso", obj_id_cultivo, anterior, anterior["cantidadAplicada"])])
                 salida.estatus = "OK"
                 salida.mensaje = "La aplicación del insumo fue eliminada con éxito."
-            elif result.matched_count == 1 and result.modified_count == 0:
+            elif cultivo_doc is not None:
                 salida.estatus = "ERROR"
                 salida.mensaje = (f"Se encontró el cultivo con ID '{id_cultivo}', pero no se encontró un registro "
                                   f"de insumo con ID '{id_insumo}' para eliminar.")
@@ -237,7 +315,7 @@ class AplicacionesInsumoDAO:
         return salida
 
 
-    def consultarAplicacionInsumo(self, id_cultivo: str, id_insumo_aplicacion: str) -> AplicacionInsumoSalidaIndividual:
+    async def consultarAplicacionInsumo(self, id_cultivo: str, id_insumo_aplicacion: str) -> AplicacionInsumoSalidaIndividual:
 
         salida = AplicacionInsumoSalidaIndividual(estatus="", mensaje="", insumo=None)
         try:
@@ -254,7 +332,7 @@ class AplicacionesInsumoDAO:
             filtro = {"_id": obj_id_cultivo, "aplicacionesInsumos._id": obj_id_insumo_app}
             proyeccion = {"aplicacionesInsumos.$": 1, "_id": 0}  # Get only the matching sub-document
 
-            cultivo_con_aplicacion = self.db.cultivos.find_one(filtro, proyeccion)
+            cultivo_con_aplicacion = await self.db.cultivos.find_one(filtro, proyeccion)
 
             # 3. Procesar el resultado
             if cultivo_con_aplicacion and "aplicacionesInsumos" in cultivo_con_aplicacion and cultivo_con_aplicacion[
@@ -264,7 +342,8 @@ class AplicacionesInsumoDAO:
                 nombre_usuario_str = "Usuario Desconocido"
                 id_usuario_obj = aplicacion_dict_db.get("idUsuario")
                 if isinstance(id_usuario_obj, ObjectId):
-                    usuario_doc = self.db.usuarios.find_one({"_id": id_usuario_obj}, {"nombre": 1})
+                    usuarios = await self.cargador.cargar("usuarios", [id_usuario_obj], ("nombre",))
+                    usuario_doc = usuarios.get(id_usuario_obj)
                     if usuario_doc and "nombre" in usuario_doc:
                         nombre_usuario_str = usuario_doc["nombre"]
                     elif usuario_doc:
@@ -277,10 +356,9 @@ class AplicacionesInsumoDAO:
                 id_insumo_ref_obj = aplicacion_dict_db.get("idInsumo")
                 if isinstance(id_insumo_ref_obj, ObjectId):
 
-                    insumo_ref_doc = self.db.insumos.find_one(
-                        {"_id": id_insumo_ref_obj},
-                        {"nombreInsumo": 1, "tipoInsumo": 1, "unidadMedida": 1}
-                    )
+                    insumos = await self._cargarInsumos(
+                        [id_insumo_ref_obj], ("nombreInsumo", "tipoInsumo", "unidadMedida"))
+                    insumo_ref_doc = insumos.get(id_insumo_ref_obj)
                     if insumo_ref_doc:
                         nombre_insumo_str = insumo_ref_doc.get("nombreInsumo", nombre_insumo_str)
                         tipo_insumo_str = insumo_ref_doc.get("tipoInsumo", tipo_insumo_str)
@@ -321,7 +399,7 @@ class AplicacionesInsumoDAO:
 
 
 
-    def consultarListaAplicacionInsumo(self, id_cultivo: str) -> AplicacionInsumoListSalida:
+    async def consultarListaAplicacionInsumo(self, id_cultivo: str) -> AplicacionInsumoListSalida:
         salida = AplicacionInsumoListSalida(estatus="", mensaje="", aplicaciones=[])  # Default to empty list
         try:
             # Convertir id_cultivo a ObjectId
@@ -333,7 +411,7 @@ class AplicacionesInsumoDAO:
                 return salida
 
             # Buscar el cultivo activo y proyectar el array 'aplicacionesInsumos' y 'nomCultivo'
-            cultivo_doc = self.db.cultivos.find_one(
+            cultivo_doc = await self.db.cultivos.find_one(
                 {"_id": obj_id_cultivo, "registroActivo": True},
                 {"aplicacionesInsumos": 1, "nomCultivo": 1, "_id": 0}
             )
@@ -354,13 +432,19 @@ class AplicacionesInsumoDAO:
                 salida.aplicaciones = []
                 return salida
 
+            # Resolver insumos (del catálogo en memoria) y usuarios referenciados con una consulta por colección
+            insumos = await self._cargarInsumos(
+                [a.get("idInsumo") for a in lista_aplicaciones_db], ("nombreInsumo",))
+            usuarios = await self.cargador.cargar(
+                "usuarios", [a.get("idUsuario") for a in lista_aplicaciones_db], ("nombre",))
+
             aplicaciones_procesadas_list = []
             for app_item_db in lista_aplicaciones_db:
 
                 nombre_del_insumo_str = "Insumo Desconocido"
                 id_insumo_ref_obj = app_item_db.get("idInsumo")
                 if isinstance(id_insumo_ref_obj, ObjectId):
-                    insumo_ref_doc = self.db.insumos.find_one({"_id": id_insumo_ref_obj}, {"nombreInsumo": 1})
+                    insumo_ref_doc = insumos.get(id_insumo_ref_obj)
                     if insumo_ref_doc and "nombreInsumo" in insumo_ref_doc:
                         nombre_del_insumo_str = insumo_ref_doc["nombreInsumo"]
                     elif insumo_ref_doc:
@@ -370,7 +454,7 @@ class AplicacionesInsumoDAO:
                 nombre_del_usuario_str = "Usuario Desconocido"
                 id_usuario_obj = app_item_db.get("idUsuario")
                 if isinstance(id_usuario_obj, ObjectId):
-                    usuario_doc = self.db.usuarios.find_one({"_id": id_usuario_obj}, {"nombre": 1})
+                    usuario_doc = usuarios.get(id_usuario_obj)
                     if usuario_doc and "nombre" in usuario_doc:
                         nombre_del_usuario_str = usuario_doc["nombre"]
                     elif usuario_doc:
@@ -414,3 +498,52 @@ class AplicacionesInsumoDAO:
 
 
 
+
+
+    async def consultarConsumoInsumos(self, periodo: str = "mes", desde: date | None = None, hasta: date | None = None,
+                                      id_insumo: str | None = None, limite: int = LIMITE_MAXIMO) -> ConsumoInsumosSalida:
+        salida = ConsumoInsumosSalida(estatus="", mensaje="", periodo=periodo, consumos=[])
+        try:
+            filtro = {}
+            if id_insumo is not None:
+                try:
+                    filtro["idInsumo"] = ObjectId(id_insumo)
+                except Exception:
+                    salida.estatus = "ERROR"
+                    salida.mensaje = "El formato del idInsumo proporcionado no es válido."
+                    return salida
+            rango = {}
+            if desde is not None:
+                rango["$gte"] = datetime.combine(desde, datetime.min.time())
+            if hasta is not None:
+                rango["$lt"] = datetime.combine(hasta + timedelta(days=1), datetime.min.time())
+            if rango:
+                filtro["fecha"] = rango
+
+            # Suma de la bitácora por insumo y periodo; los movimientos negativos son consumo
+            unidad = {"dia": "day", "mes": "month"}[periodo]
+            pipeline = [
+                {"$match": filtro},
+                {"$group": {"_id": {"idInsumo": "$idInsumo", "inicio": {"$dateTrunc": {"date": "$fecha", "unit": unidad}}},
+                            "consumo": {"$sum": {"$multiply": ["$cantidad", -1]}},
+                            "movimientos": {"$sum": 1}}},
+                {"$sort": {"_id.inicio": 1, "_id.idInsumo": 1}},
+                {"$limit": limitar(limite)},
+            ]
+            grupos = await self.db[COLECCION_MOVIMIENTOS].aggregate(pipeline).to_list(length=None)
+            insumos = await self._cargarInsumos([g["_id"]["idInsumo"] for g in grupos], ("nombreInsumo", "unidadMedida"))
+
+            for grupo in grupos:
+                insumo = insumos.get(grupo["_id"]["idInsumo"]) or {}
+                salida.consumos.append(ConsumoInsumoPeriodo(
+                    idInsumo=str(grupo["_id"]["idInsumo"]), nombreInsumo=insumo.get("nombreInsumo"),
+                    unidadMedida=insumo.get("unidadMedida"), inicio=grupo["_id"]["inicio"].date(),
+                    consumo=grupo["consumo"], movimientos=grupo["movimientos"]))
+
+            salida.estatus = "OK"
+            salida.mensaje = f"Se encontraron {len(salida.consumos)} periodos con consumo."
+        except Exception as ex:
+            print(f"Error en AplicacionesInsumoDAO.consultarConsumoInsumos: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al consultar el consumo de insumos. Consulte al administrador."
+        return salida
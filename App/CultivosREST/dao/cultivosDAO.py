@@ -1,17 +1,84 @@
-from datetime import datetime
+import json
+from datetime import datetime, date
 from bson import ObjectId
 from models.cultivosModel import CultivoInsert, Salida, CultivoUpdate, CultivoSalidaIndividual, CultivoSelect, \
     CultivosListSalida, UbicacionInsert, UbicacionUpdate, UbicacionSalidaIndividual, UbicacionSubConsulta, \
     SeguimientoInsert, SeguimientoUpdate, SeguimientoSelect, SeguimientoSalidaIndividual, SeguimientoListSalida, \
-    SeguimientoSubConsulta
+    SeguimientoSubConsulta, Coordenadas, CultivoUbicado, CultivosUbicadosSalida
 from fastapi.encoders import jsonable_encoder
 from pymongo.database import Database
-
+from pymongo.errors import OperationFailure
+from dao.referencias import CargadorReferencias
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, limitar, filtroDesde, cortarPagina
+from comun.serializacion import proyector
+from dao.movimientosInsumos import CAMPO_DESCONTADO
+from dao.riegosDAO import CAMPO_LOTE
+from comun.versiones import CAMPO_ACTUALIZADO, CAMPO_VERSION, conActualizacion, conVersion, filtroSiCambia
+from comun.instrumentacion import medirMetodos
+
+TAMANO_LOTE_EXPORTACION = 500
+METROS_POR_KM = 1000
+
+# Lo que necesitan las búsquedas geográficas; el resto del cultivo no se lee
+PROYECCION_UBICADO = {"nomCultivo": 1, "estadoActual": 1, "ubicacion.nombreUbicacion": 1, "ubicacion.coordenadas": 1}
+
+# Campos internos (versiones, marcas de escritura, punto GeoJSON, bitácora de insumos) que no salen en la exportación
+CAMPOS_INTERNOS_EXPORTACION = [CAMPO_VERSION, "versionSeguimientos", CAMPO_ACTUALIZADO, "ubicacion.geo",
+                               f"aplicacionesInsumos.{CAMPO_DESCONTADO}"]
+CAMPOS_INTERNOS_RIEGO = [f"riegos.{CAMPO_LOTE}", f"riegos.{CAMPO_ACTUALIZADO}"]
+
+
+def puntoGeo(coordenadas: Coordenadas) -> dict | None:
+    # GeoJSON guarda [longitud, latitud]; None si las coordenadas están fuera de rango
+    if not (-90 <= coordenadas.latitud <= 90 and -180 <= coordenadas.longitud <= 180):
+        return None
+    return {"type": "Point", "coordinates": [coordenadas.longitud, coordenadas.latitud]}
+
+
+def _cultivoUbicado(doc: dict) -> CultivoUbicado:
+    ubicacion = doc.get("ubicacion") or {}
+    distancia = doc.get("distancia")
+    return CultivoUbicado(
+        idCultivo=str(doc["_id"]),
+        nomCultivo=doc.get("nomCultivo", ""),
+        estadoActual=doc.get("estadoActual"),
+        nombreUbicacion=ubicacion.get("nombreUbicacion"),
+        coordenadas=ubicacion.get("coordenadas"),
+        distanciaKm=round(distancia / METROS_POR_KM, 3) if distancia is not None else None)
+
+
+def _serializarExportacion(valor):
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+@medirMetodos
 class CultivoDAO:
-    def __init__(self, db):
+    def __init__(self, db, cargador: CargadorReferencias | None = None):
         self.db = db
+        self.cargador = cargador or CargadorReferencias(db)
 
-    def agregarCultivo(self, cultivo: CultivoInsert) -> Salida:
+    async def versionCultivo(self, id_cultivo: str, *campos: str) -> tuple | None:
+        # Solo los contadores del cultivo activo, para responder 304 sin armar la respuesta
+        campos = campos or (CAMPO_VERSION,)
+        try:
+            obj_id_cultivo = ObjectId(id_cultivo)
+        except Exception:
+            return None
+        cultivo_doc = await self.db.cultivos.find_one({"_id": obj_id_cultivo, "registroActivo": True},
+                                                      {campo: 1 for campo in campos})
+        if not cultivo_doc:
+            return None
+        return tuple(cultivo_doc.get(campo, 0) for campo in campos)
+
+    async def _incrementarVersion(self, obj_id_cultivo: ObjectId, campo: str = CAMPO_VERSION):
+        # Solo para los seguimientos: viven en otra colección y su listado se versiona en el cultivo
+        # (versionSeguimientos). Los cambios al propio cultivo llevan el $inc en la misma escritura.
+        await self.db.cultivos.update_one({"_id": obj_id_cultivo}, {"$inc": {campo: 1}})
+
+    async def agregarCultivo(self, cultivo: CultivoInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # Validar que areaCultivo sea un valor numérico mayor a cero
@@ -45,7 +112,7 @@ class CultivoDAO:
                 return salida
 
             # Verificar que el idUsuario exista en la colección usuarios
-            usuario_existente = self.db.usuarios.find_one({"_id": obj_id_usuario})
+            usuario_existente = await self.db.usuarios.find_one({"_id": obj_id_usuario}, {"_id": 1})
             if not usuario_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"El usuario con ID '{cultivo.idUsuario}' no existe en la base de datos."
@@ -58,7 +125,7 @@ class CultivoDAO:
             cultivo_dict["registroActivo"] = True
             cultivo_dict["estadoActual"] = "Sembrado"
 
-            result = self.db.cultivos.insert_one(cultivo_dict)
+            result = await self.db.cultivos.insert_one(conActualizacion(cultivo_dict))
 
             if result.inserted_id:
                 salida.estatus = "OK"
@@ -73,7 +140,7 @@ class CultivoDAO:
         return salida
 
 
-    def actualizarCultivo(self, id_cultivo: str, cultivo_data: CultivoUpdate) -> Salida:
+    async def actualizarCultivo(self, id_cultivo: str, cultivo_data: CultivoUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             #Convertir id_cultivo a ObjectId y verificar existencia del cultivo
@@ -84,7 +151,7 @@ class CultivoDAO:
                 salida.mensaje = "El ID del cultivo proporcionado no tiene un formato válido."
                 return salida
 
-            cultivo_existente_doc = self.db.cultivos.find_one({"_id": obj_id_cultivo})
+            cultivo_existente_doc = await self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"_id": 1})
             if not cultivo_existente_doc:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un cultivo con el ID: {id_cultivo}."
@@ -127,7 +194,7 @@ class CultivoDAO:
                     return salida
 
                 # Validar existencia del nuevo idUsuario
-                usuario_para_actualizar_existe = self.db.usuarios.find_one({"_id": obj_id_usuario_update})
+                usuario_para_actualizar_existe = await self.db.usuarios.find_one({"_id": obj_id_usuario_update}, {"_id": 1})
                 if not usuario_para_actualizar_existe:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"El nuevo usuario con ID '{cultivo_data.idUsuario}' no existe en la base de datos."
@@ -149,6 +216,10 @@ class CultivoDAO:
             update_fields["fechaCosechaEst"] = cultivo_data.fechaCosechaEst
             if cultivo_data.fechaCosechaReal is not None:
                 update_fields["fechaCosechaReal"] = cultivo_data.fechaCosechaReal
+            # Las fechas se guardan como texto ISO, igual que al agregar; el motor de alertas compara fechaCosechaEst así
+            for campo in ("fechaSiembra", "fechaCosechaEst", "fechaCosechaReal"):
+                if isinstance(update_fields.get(campo), date):
+                    update_fields[campo] = update_fields[campo].isoformat()
 
             # Si no hay campos para actualizar, informar
             if not update_fields:
@@ -157,9 +228,10 @@ class CultivoDAO:
                 return salida
 
             # Realizar la actualización
-            result = self.db.cultivos.update_one({"_id": obj_id_cultivo}, {"$set": update_fields})
+            result = await self.db.cultivos.update_one(filtroSiCambia({"_id": obj_id_cultivo}, update_fields),
+                                                       conVersion({"$set": conActualizacion(update_fields)}))
 
-            if result.modified_count > 0:
+            if result.matched_count > 0:
                 salida.estatus = "OK"
                 salida.mensaje = f"Cultivo con ID '{id_cultivo}' actualizado con éxito."
             else:
@@ -176,7 +248,7 @@ class CultivoDAO:
 
 
 
-    def borrarCultivo(self, id_cultivo: str) -> Salida:
+    async def borrarCultivo(self, id_cultivo: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         campo_estado_logico = "registroActivo"
 
@@ -190,7 +262,7 @@ class CultivoDAO:
                 return salida
 
             #Verificar si el cultivo existe y cuál es su estado actual
-            cultivo_existente = self.db.cultivos.find_one({"_id": obj_id_cultivo}, {campo_estado_logico: 1})
+            cultivo_existente = await self.db.cultivos.find_one({"_id": obj_id_cultivo}, {campo_estado_logico: 1})
 
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -204,17 +276,17 @@ class CultivoDAO:
                 return salida
 
             #Intentar la eliminación lógica (actualizar el estado)
-            result = self.db.cultivos.update_one({"_id": obj_id_cultivo}, {"$set": {campo_estado_logico: False}})
+            cambios = {campo_estado_logico: False}
+            result = await self.db.cultivos.update_one(filtroSiCambia({"_id": obj_id_cultivo}, cambios),
+                                                       conVersion({"$set": conActualizacion(cambios)}))
 
-            if result.modified_count == 1:
+            if result.matched_count == 1:
                 salida.estatus = "OK"
                 salida.mensaje = f"Cultivo con ID '{id_cultivo}' eliminado con éxito."
-            elif result.matched_count == 1 and result.modified_count == 0:
+            else:
+                # Ya se revisó que existe: otra petición lo eliminó antes que esta
                 salida.estatus = "INFO"
                 salida.mensaje = f"El cultivo con ID '{id_cultivo}' ya se habia eliminado"
-            else:
-                salida.estatus = "ERROR"
-                salida.mensaje = f"No se pudo marcar como eliminado el cultivo con ID: {id_cultivo}. Es posible que no se haya encontrado."
         except Exception as ex:
             print(f"Error en CultivoDAO.borrarCultivo: {ex}")
             salida.estatus = "ERROR"
@@ -224,7 +296,7 @@ class CultivoDAO:
 
 
 
-    def consultarCultivoPorId(self, id_cultivo: str) -> CultivoSalidaIndividual:
+    async def consultarCultivoPorId(self, id_cultivo: str) -> CultivoSalidaIndividual:
         salida = CultivoSalidaIndividual(estatus="", mensaje="", cultivo=None)
         try:
             #Convertir id_cultivo a ObjectId
@@ -236,7 +308,7 @@ class CultivoDAO:
                 return salida
 
             #Buscar el cultivo en la base de datos
-            cultivo_db = self.db.cultivos.find_one({"_id": obj_id_cultivo, "registroActivo": True})
+            cultivo_db = await self.db.cultivos.find_one({"_id": obj_id_cultivo, "registroActivo": True})
 
             if cultivo_db:
                 cultivo_db["_id"] = str(cultivo_db["_id"])
@@ -244,7 +316,8 @@ class CultivoDAO:
                     id_usuario_a_buscar = cultivo_db["idUsuario"]
                     nombre_del_usuario = "Usuario Desconocido"
 
-                    usuario_encontrado = self.db.usuarios.find_one({"_id": id_usuario_a_buscar}, {"nombre": 1})
+                    usuarios = await self.cargador.cargar("usuarios", [id_usuario_a_buscar], ("nombre",))
+                    usuario_encontrado = usuarios.get(id_usuario_a_buscar)
 
                     if usuario_encontrado and "nombre" in usuario_encontrado:
                         nombre_del_usuario = usuario_encontrado["nombre"]
@@ -270,17 +343,25 @@ class CultivoDAO:
         return salida
 
 
-    def consultarListaDeCultivos(self) -> CultivosListSalida:
+    async def consultarListaDeCultivos(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None,
+                                       rapido: bool = False) -> CultivosListSalida:
         salida = CultivosListSalida(estatus="", mensaje="", cultivos=[])
         try:
-
-            lista_cultivos_db = list(self.db.cultivos.find({"registroActivo": True}))
+            limite = limitar(limite)
+            filtro = filtroDesde(cursor, {"registroActivo": True})
+            # Una página por _id, pidiendo un documento de más para saber si hay siguiente
+            lista_cultivos_db = await self.db.cultivos.find(filtro).sort("_id", 1).limit(limite + 1).to_list(length=None)
+            lista_cultivos_db, salida.siguiente = cortarPagina(lista_cultivos_db, limite)
             if not lista_cultivos_db:
                 salida.estatus = "OK"
                 salida.mensaje = "No se encontraron cultivos registrados."
                 salida.cultivos = []
                 return salida
 
+            # Resolver los nombres de todos los usuarios referenciados en una sola consulta
+            usuarios = await self.cargador.cargar(
+                "usuarios", [c.get("idUsuario") for c in lista_cultivos_db], ("nombre",))
+
             cultivos_con_nombre_usuario_list = []
             for cultivo_item_db in lista_cultivos_db:
                 cultivo_item_db["_id"] = str(cultivo_item_db["_id"])
@@ -293,7 +374,7 @@ class CultivoDAO:
                 nombre_del_usuario_str = "Usuario no especificado"
 
                 if id_usuario_obj:
-                    usuario_doc = self.db.usuarios.find_one({"_id": id_usuario_obj}, {"nombre": 1})
+                    usuario_doc = usuarios.get(id_usuario_obj)
                     if usuario_doc and "nombre" in usuario_doc:
                         nombre_del_usuario_str = usuario_doc["nombre"]
                     elif usuario_doc:
@@ -302,12 +383,19 @@ class CultivoDAO:
                         nombre_del_usuario_str = f"Usuario (ID: {str(id_usuario_obj)}) no encontrado"
 
                 cultivo_item_db["nombreUsuario"] = nombre_del_usuario_str
-                cultivo_procesado = CultivoSelect(**cultivo_item_db)
+                # En modo rápido la fila se pasa tal cual, solo con los campos y tipos de CultivoSelect
+                if rapido:
+                    cultivo_procesado = proyector(CultivoSelect)(cultivo_item_db)
+                else:
+                    cultivo_procesado = CultivoSelect(**cultivo_item_db)
                 cultivos_con_nombre_usuario_list.append(cultivo_procesado)
                 salida.cultivos = cultivos_con_nombre_usuario_list
                 salida.estatus = "OK"
                 salida.mensaje = f"Se encontraron {len(cultivos_con_nombre_usuario_list)} cultivos."
 
+        except CursorInvalido as ex:
+            salida.estatus = "ERROR"
+            salida.mensaje = str(ex)
         except Exception as ex:
             print(f"Error en CultivoDAO.consultarListaDeCultivos: {ex}")
             salida.estatus = "ERROR"
@@ -316,9 +404,49 @@ class CultivoDAO:
 
         return salida
 
+    async def exportarCultivos(self, tamano_lote: int = TAMANO_LOTE_EXPORTACION):
+        # Genera los cultivos activos como NDJSON, un lote del cursor a la vez, sin armar la lista completa
+        pipeline = [
+            {"$match": {"registroActivo": True}},
+            {"$sort": {"_id": 1}},
+            # Los riegos están en riegos_buckets; se vuelven a juntar en el arreglo riegos del cultivo
+            {"$lookup": {
+                "from": "riegos_buckets",
+                "let": {"idCultivo": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$idCultivo", "$$idCultivo"]}}},
+                    {"$sort": {"_id": 1}},
+                    {"$project": {"_id": 0, "riegos": 1}},
+                    {"$unset": CAMPOS_INTERNOS_RIEGO},
+                ],
+                "as": "_buckets",
+            }},
+            {"$set": {"riegos": {"$reduce": {
+                "input": "$_buckets.riegos",
+                "initialValue": [],
+                "in": {"$concatArrays": ["$$value", "$$this"]},
+            }}}},
+            {"$unset": ["_buckets", *CAMPOS_INTERNOS_EXPORTACION]},
+        ]
+        cursor = self.db.cultivos.aggregate(pipeline, batchSize=tamano_lote)
+        lineas = []
+        try:
+            async for cultivo in cursor:
+                lineas.append(json.dumps(cultivo, default=_serializarExportacion, ensure_ascii=False))
+                if len(lineas) >= tamano_lote:
+                    yield ("\n".join(lineas) + "\n").encode("utf-8")
+                    lineas = []
+            if lineas:
+                yield ("\n".join(lineas) + "\n").encode("utf-8")
+        except Exception as ex:
+            # La respuesta ya empezó: solo se puede cortar el flujo y dejar registro
+            print(f"Error en CultivoDAO.exportarCultivos: {ex}")
+        finally:
+            await cursor.close()
+
 
 
-    def registrarNuevaUbicacion(self, id_cultivo: str, ubicacion_data: UbicacionInsert) -> Salida:
+    async def registrarNuevaUbicacion(self, id_cultivo: str, ubicacion_data: UbicacionInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             #Validar y convertir id_cultivo
@@ -331,7 +459,7 @@ class CultivoDAO:
 
             # Verificar que el cultivo exista
             # Y verificar si ya tiene una ubicación asignada
-            cultivo_existente = self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"ubicacion": 1, "areaCultivo":1})
+            cultivo_existente = await self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"ubicacion": 1, "areaCultivo":1})
 
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -400,22 +528,29 @@ class CultivoDAO:
                 salida.mensaje = "La localidad o ciudad no puede estar vacío."
                 return salida
 
+            # El punto GeoJSON va junto a las coordenadas y es lo que indexa 2dsphere
+            punto = puntoGeo(ubicacion_data.coordenadas)
+            if punto is None:
+                salida.estatus = "ERROR"
+                salida.mensaje = "Las coordenadas están fuera de rango (latitud de -90 a 90, longitud de -180 a 180)."
+                return salida
+
             # Preparar el documento de la nueva ubicación
             nueva_ubicacion_dict = jsonable_encoder(ubicacion_data)
+            nueva_ubicacion_dict["geo"] = punto
 
             # Establecer la ubicación para el cultivo usando $set
-            result = self.db.cultivos.update_one({"_id": obj_id_cultivo}, {"$set": {"ubicacion": nueva_ubicacion_dict}})
+            cambios = {"ubicacion": nueva_ubicacion_dict}
+            result = await self.db.cultivos.update_one(filtroSiCambia({"_id": obj_id_cultivo}, cambios),
+                                                       conVersion({"$set": conActualizacion(cambios)}))
 
-            if result.modified_count == 1:
+            if result.matched_count == 1:
                 salida.estatus = "OK"
                 salida.mensaje = (f"Ubicación '{ubicacion_data.nombreUbicacion}' registrada con éxito para el "
                                   f"cultivo ID '{id_cultivo}'.")
-            elif result.matched_count == 1 and result.modified_count == 0:
+            else:
                 salida.estatus = "INFO"
                 salida.mensaje = "La ubicación ya estaba asignada con los mismos datos o no se requirió modificación."
-            else:
-                salida.estatus = "ERROR"
-                salida.mensaje = "No se pudo registrar la ubicación. El cultivo podría no existir."
 
         except Exception as ex:
             print(f"Error en CultivoDAO.registrarNuevaUbicacion: {ex}")
@@ -426,7 +561,7 @@ class CultivoDAO:
 
 
 
-    def actualizarUbicacionCultivo(self, id_cultivo: str, ubicacion_data: UbicacionUpdate) -> Salida:
+    async def actualizarUbicacionCultivo(self, id_cultivo: str, ubicacion_data: UbicacionUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             #Validar y convertir id_cultivo
@@ -438,7 +573,7 @@ class CultivoDAO:
                 return salida
 
             #Verificar que el cultivo exista y que tenga una ubicación para actualizar
-            cultivo_existente = self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"ubicacion": 1, "areaCultivo": 1})
+            cultivo_existente = await self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"ubicacion": 1, "areaCultivo": 1})
 
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -526,9 +661,15 @@ class CultivoDAO:
                 update_payload_for_set["ubicacion.superficie"] = ubicacion_data.superficie
 
             if ubicacion_data.coordenadas is not None:
+                punto = puntoGeo(ubicacion_data.coordenadas)
+                if punto is None:
+                    salida.estatus = "ERROR"
+                    salida.mensaje = "Las coordenadas están fuera de rango (latitud de -90 a 90, longitud de -180 a 180)."
+                    return salida
                 update_payload_for_set["ubicacion.coordenadas"] = {
                     "latitud": ubicacion_data.coordenadas.latitud,
                     "longitud": ubicacion_data.coordenadas.longitud }
+                update_payload_for_set["ubicacion.geo"] = punto
 
             if ubicacion_data.tipoSuelo is not None:
                 if not ubicacion_data.tipoSuelo.strip():
@@ -549,18 +690,16 @@ class CultivoDAO:
                 return salida
 
             # Realizar la actualización en la base de datos
-            result = self.db.cultivos.update_one(
-                {"_id": obj_id_cultivo, "ubicacion": {"$exists": True}},{"$set": update_payload_for_set})
+            result = await self.db.cultivos.update_one(
+                filtroSiCambia({"_id": obj_id_cultivo, "ubicacion": {"$exists": True}}, update_payload_for_set),
+                conVersion({"$set": conActualizacion(update_payload_for_set)}))
 
-            if result.modified_count > 0:
+            if result.matched_count > 0:
                 salida.estatus = "OK"
                 salida.mensaje = f"Ubicación del cultivo ID '{id_cultivo}' actualizada con éxito."
-            elif result.matched_count == 1 and result.modified_count == 0:
+            else:
                 salida.estatus = "INFO"
                 salida.mensaje = "La ubicación fue encontrada, pero los datos proporcionados no produjeron cambios (o eran idénticos)."
-            else:
-                salida.estatus = "ERROR"
-                salida.mensaje = "No se encontró el cultivo o su ubicación para actualizar (verificación post-actualización)."
 
         except Exception as ex:
             print(f"Error en CultivoDAO.actualizarUbicacionCultivo: {ex}")
@@ -570,7 +709,7 @@ class CultivoDAO:
         return salida
 
 
-    def consultarUbicacionDeCultivo(self, id_cultivo: str) -> UbicacionSalidaIndividual:
+    async def consultarUbicacionDeCultivo(self, id_cultivo: str) -> UbicacionSalidaIndividual:
         salida = UbicacionSalidaIndividual(estatus="", mensaje="", ubicacion=None)
         campo_estado_logico_cultivo = "registroActivo"
         try:
@@ -583,7 +722,7 @@ class CultivoDAO:
                 return salida
 
             #Buscar el cultivo activo y obtener su 'nomCultivo' y su objeto 'ubicacion'.
-            cultivo_doc = self.db.cultivos.find_one(
+            cultivo_doc = await self.db.cultivos.find_one(
                 {"_id": obj_id_cultivo,
                     campo_estado_logico_cultivo: True},{"nomCultivo": 1, "ubicacion": 1})
 
@@ -616,7 +755,82 @@ class CultivoDAO:
         return salida
 
 
-    def agregar_seguimiento(self, id_cultivo: str, seguimiento_data: SeguimientoInsert) -> Salida:
+    async def consultarCultivosCercanos(self, latitud: float, longitud: float, km: float,
+                                        limite: int = LIMITE_DEFECTO) -> CultivosUbicadosSalida:
+        salida = CultivosUbicadosSalida(estatus="", mensaje="", cultivos=[])
+        try:
+            punto = puntoGeo(Coordenadas(latitud=latitud, longitud=longitud))
+            if punto is None:
+                salida.estatus = "ERROR"
+                salida.mensaje = "Las coordenadas están fuera de rango (latitud de -90 a 90, longitud de -180 a 180)."
+                return salida
+
+            # $geoNear usa el índice 2dsphere y entrega ordenado del más cercano al más lejano
+            pipeline = [
+                {"$geoNear": {"near": punto, "key": "ubicacion.geo", "distanceField": "distancia",
+                              "maxDistance": km * METROS_POR_KM, "spherical": True,
+                              "query": {"registroActivo": True}}},
+                {"$limit": limitar(limite)},
+                {"$project": {**PROYECCION_UBICADO, "distancia": 1}},
+            ]
+            docs = await self.db.cultivos.aggregate(pipeline).to_list(length=None)
+            salida.cultivos = [_cultivoUbicado(doc) for doc in docs]
+            salida.estatus = "OK"
+            salida.mensaje = f"Se encontraron {len(salida.cultivos)} cultivos a menos de {km} km."
+
+        except Exception as ex:
+            print(f"Error en CultivoDAO.consultarCultivosCercanos: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al buscar cultivos cercanos. Consulte al administrador."
+            salida.cultivos = []
+
+        return salida
+
+    async def consultarCultivosEnPoligono(self, vertices: list[Coordenadas], limite: int = LIMITE_DEFECTO,
+                                          cursor: str | None = None) -> CultivosUbicadosSalida:
+        salida = CultivosUbicadosSalida(estatus="", mensaje="", cultivos=[])
+        try:
+            puntos = [puntoGeo(vertice) for vertice in vertices]
+            if any(punto is None for punto in puntos):
+                salida.estatus = "ERROR"
+                salida.mensaje = "Hay vértices con coordenadas fuera de rango (latitud de -90 a 90, longitud de -180 a 180)."
+                return salida
+            anillo = [punto["coordinates"] for punto in puntos]
+            if len({tuple(posicion) for posicion in anillo}) < 3:
+                salida.estatus = "ERROR"
+                salida.mensaje = "El polígono necesita al menos 3 vértices distintos."
+                return salida
+            if anillo[0] != anillo[-1]:
+                anillo.append(anillo[0])
+
+            limite = limitar(limite)
+            filtro = filtroDesde(cursor, {
+                "registroActivo": True,
+                "ubicacion.geo": {"$geoWithin": {"$geometry": {"type": "Polygon", "coordinates": [anillo]}}},
+            })
+            docs = await self.db.cultivos.find(filtro, PROYECCION_UBICADO).sort("_id", 1).limit(limite + 1).to_list(length=None)
+            docs, salida.siguiente = cortarPagina(docs, limite)
+            salida.cultivos = [_cultivoUbicado(doc) for doc in docs]
+            salida.estatus = "OK"
+            salida.mensaje = f"Se encontraron {len(salida.cultivos)} cultivos dentro del polígono."
+
+        except CursorInvalido as ex:
+            salida.estatus = "ERROR"
+            salida.mensaje = str(ex)
+        except OperationFailure as ex:
+            # Polígono que Mongo no acepta (lados que se cruzan, vértices repetidos seguidos...)
+            salida.estatus = "ERROR"
+            salida.mensaje = f"El polígono no es válido: {(ex.details or {}).get('errmsg', str(ex))}"
+        except Exception as ex:
+            print(f"Error en CultivoDAO.consultarCultivosEnPoligono: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al buscar cultivos dentro del polígono. Consulte al administrador."
+            salida.cultivos = []
+
+        return salida
+
+
+    async def agregar_seguimiento(self, id_cultivo: str, seguimiento_data: SeguimientoInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Validar id_cultivo
@@ -628,8 +842,8 @@ class CultivoDAO:
                 return salida
 
             # Verificar que el cultivo exista y esté activo
-            cultivo_existente = self.db.cultivos.find_one(
-                {"_id": obj_id_cultivo, "registroActivo": True}
+            cultivo_existente = await self.db.cultivos.find_one(
+                {"_id": obj_id_cultivo, "registroActivo": True}, {"_id": 1}
             )
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -649,7 +863,7 @@ class CultivoDAO:
                 return salida
 
             # Verificar que el usuario exista
-            usuario_existente = self.db.usuarios.find_one({"_id": obj_id_usuario})
+            usuario_existente = await self.db.usuarios.find_one({"_id": obj_id_usuario}, {"_id": 1})
             if not usuario_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"El usuario con ID '{seguimiento_data.idUsuario}' no existe en la base de datos."
@@ -682,9 +896,10 @@ class CultivoDAO:
                 "recomendaciones"] = seguimiento_data.recomendaciones if seguimiento_data.recomendaciones is not None else []
 
             # 5. Insertar en la colección seguimiento_cultivo
-            result = self.db.seguimiento_cultivo.insert_one(seguimiento_dict)
+            result = await self.db.seguimiento_cultivo.insert_one(seguimiento_dict)
 
             if result.inserted_id:
+                await self._incrementarVersion(obj_id_cultivo, "versionSeguimientos")
                 salida.estatus = "OK"
                 salida.mensaje = (f"Seguimiento agregado con éxito al cultivo ID '{id_cultivo}' "
                                   f"con ID de seguimiento: {str(result.inserted_id)}.")
@@ -701,7 +916,7 @@ class CultivoDAO:
 
 
 
-    def editar_seguimiento(self, id_cultivo: str, id_seguimiento: str, seguimiento_data: SeguimientoUpdate) -> Salida:
+    async def editar_seguimiento(self, id_cultivo: str, id_seguimiento: str, seguimiento_data: SeguimientoUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Validar id_cultivo
@@ -713,8 +928,8 @@ class CultivoDAO:
                 return salida
 
             # Verificar que el cultivo exista y esté activo
-            cultivo_existente = self.db.cultivos.find_one(
-                {"_id": obj_id_cultivo, "registroActivo": True}
+            cultivo_existente = await self.db.cultivos.find_one(
+                {"_id": obj_id_cultivo, "registroActivo": True}, {"_id": 1}
             )
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -730,7 +945,7 @@ class CultivoDAO:
                 return salida
 
             # 3. Verificar que el seguimiento exista y pertenezca al cultivo especificado
-            seguimiento_existente_doc = self.db.seguimiento_cultivo.find_one(
+            seguimiento_existente_doc = await self.db.seguimiento_cultivo.find_one(
                 {"_id": obj_id_seguimiento, "idCultivo": obj_id_cultivo}
             )
             if not seguimiento_existente_doc:
@@ -773,7 +988,7 @@ class CultivoDAO:
                     salida.mensaje = "El formato del idUsuario para la actualización no es válido."
                     return salida
 
-                usuario_para_actualizar_existe = self.db.usuarios.find_one({"_id": obj_id_usuario_update})
+                usuario_para_actualizar_existe = await self.db.usuarios.find_one({"_id": obj_id_usuario_update}, {"_id": 1})
                 if not usuario_para_actualizar_existe:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"El nuevo usuario con ID '{seguimiento_data.idUsuario}' no existe en la base de datos."
@@ -789,12 +1004,13 @@ class CultivoDAO:
             # 5. Realizar la actualización
             update_payload_encoded = jsonable_encoder(update_fields, exclude_none=True)
 
-            result = self.db.seguimiento_cultivo.update_one(
+            result = await self.db.seguimiento_cultivo.update_one(
                 {"_id": obj_id_seguimiento, "idCultivo": obj_id_cultivo},
                 {"$set": update_payload_encoded}
             )
 
             if result.modified_count > 0:
+                await self._incrementarVersion(obj_id_cultivo, "versionSeguimientos")
                 salida.estatus = "OK"
                 salida.mensaje = f"Seguimiento con ID '{id_seguimiento}' actualizado con éxito."
             elif result.matched_count == 1 and result.modified_count == 0:
@@ -816,7 +1032,7 @@ class CultivoDAO:
         return salida
 
 
-    def eliminar_seguimiento(self, id_cultivo: str, id_seguimiento: str) -> Salida:
+    async def eliminar_seguimiento(self, id_cultivo: str, id_seguimiento: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Validar id_cultivo
@@ -828,8 +1044,8 @@ class CultivoDAO:
                 return salida
 
 
-            cultivo_existente = self.db.cultivos.find_one(
-                {"_id": obj_id_cultivo, "registroActivo": True}
+            cultivo_existente = await self.db.cultivos.find_one(
+                {"_id": obj_id_cultivo, "registroActivo": True}, {"_id": 1}
             )
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -845,11 +1061,12 @@ class CultivoDAO:
                 return salida
 
             # 3. Intentar la eliminación física del seguimiento
-            result = self.db.seguimiento_cultivo.delete_one(
+            result = await self.db.seguimiento_cultivo.delete_one(
                 {"_id": obj_id_seguimiento, "idCultivo": obj_id_cultivo}
             )
 
             if result.deleted_count == 1:
+                await self._incrementarVersion(obj_id_cultivo, "versionSeguimientos")
                 salida.estatus = "OK"
                 salida.mensaje = f"Seguimiento con ID '{id_seguimiento}' eliminado con éxito del cultivo ID '{id_cultivo}'."
             elif result.deleted_count == 0:
@@ -869,7 +1086,7 @@ class CultivoDAO:
 
 
 
-    def consultar_seguimiento_por_id(self, id_cultivo: str, id_seguimiento: str) -> SeguimientoSalidaIndividual:
+    async def consultar_seguimiento_por_id(self, id_cultivo: str, id_seguimiento: str) -> SeguimientoSalidaIndividual:
         salida = SeguimientoSalidaIndividual(estatus="", mensaje="", seguimiento=None)
         try:
             # 1. Validar id_cultivo
@@ -881,8 +1098,8 @@ class CultivoDAO:
                 return salida
 
             # Verificar que el cultivo exista y esté activo (contextual validation)
-            cultivo_existente = self.db.cultivos.find_one(
-                {"_id": obj_id_cultivo, "registroActivo": True}
+            cultivo_existente = await self.db.cultivos.find_one(
+                {"_id": obj_id_cultivo, "registroActivo": True}, {"_id": 1}
             )
             if not cultivo_existente:
                 salida.estatus = "ERROR"
@@ -898,7 +1115,7 @@ class CultivoDAO:
                 return salida
 
             # 3. Buscar el seguimiento en la base de datos
-            seguimiento_doc = self.db.seguimiento_cultivo.find_one(
+            seguimiento_doc = await self.db.seguimiento_cultivo.find_one(
                 {"_id": obj_id_seguimiento, "idCultivo": obj_id_cultivo}
             )
 
@@ -908,9 +1125,8 @@ class CultivoDAO:
                 nombre_del_usuario_seguimiento = "Usuario Desconocido"
 
                 if isinstance(id_usuario_seguimiento, ObjectId):
-                    usuario_encontrado = self.db.usuarios.find_one(
-                        {"_id": id_usuario_seguimiento}, {"nombre": 1}
-                    )
+                    usuarios = await self.cargador.cargar("usuarios", [id_usuario_seguimiento], ("nombre",))
+                    usuario_encontrado = usuarios.get(id_usuario_seguimiento)
                     if usuario_encontrado and "nombre" in usuario_encontrado:
                         nombre_del_usuario_seguimiento = usuario_encontrado["nombre"]
                     elif usuario_encontrado:  # Usuario existe pero sin nombre
@@ -949,7 +1165,7 @@ class CultivoDAO:
         return salida
 
 
-    def consultarListaSeguimiento(self, id_cultivo: str) -> SeguimientoListSalida:
+    async def consultarListaSeguimiento(self, id_cultivo: str) -> SeguimientoListSalida:
         global obj_id_cultivo
         salida = SeguimientoListSalida(estatus="", mensaje="", seguimientos=[])
         try:
@@ -962,7 +1178,7 @@ class CultivoDAO:
                 return salida
 
             # 2. Verificar que el cultivo exista y esté activo para obtener su nombre
-            cultivo_doc_for_name = self.db.cultivos.find_one(
+            cultivo_doc_for_name = await self.db.cultivos.find_one(
                 {"_id": obj_id_cultivo, "registroActivo": True},
                 {"nomCultivo": 1}
             )
@@ -975,19 +1191,21 @@ class CultivoDAO:
             salida.nombreCultivo = cultivo_doc_for_name.get("nomCultivo", "Nombre no disponible")
 
             # 3. Consultar la colección 'seguimiento_cultivo'
-            lista_seguimientos_cursor = self.db.seguimiento_cultivo.find(
+            lista_seguimientos_db = await self.db.seguimiento_cultivo.find(
                 {"idCultivo": obj_id_cultivo}
-            )
+            ).to_list(length=None)
+
+            # Resolver los nombres de todos los usuarios referenciados en una sola consulta
+            usuarios = await self.cargador.cargar(
+                "usuarios", [s.get("idUsuario") for s in lista_seguimientos_db], ("nombre",))
 
             seguimientos_procesados_list = []
-            for seguimiento_item_db in lista_seguimientos_cursor:
+            for seguimiento_item_db in lista_seguimientos_db:
                 id_usuario_seguimiento = seguimiento_item_db.get("idUsuario")
                 nombre_del_usuario_seguimiento = "Usuario Desconocido"
 
                 if isinstance(id_usuario_seguimiento, ObjectId):
-                    usuario_encontrado = self.db.usuarios.find_one(
-                        {"_id": id_usuario_seguimiento}, {"nombre": 1}
-                    )
+                    usuario_encontrado = usuarios.get(id_usuario_seguimiento)
                     if usuario_encontrado and "nombre" in usuario_encontrado:
                         nombre_del_usuario_seguimiento = usuario_encontrado["nombre"]
                     elif usuario_encontrado:
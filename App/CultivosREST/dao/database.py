@@ -1,11 +1,12 @@
-from pymongo import MongoClient
+from motor.motor_asyncio import AsyncIOMotorClient
+from comun.instrumentacion import monitorComandos
 
 DATABASE_URL='mongodb://localhost:27017'
 DATABASE_NAME='sistemagestionagricola'
 
 class Conexion:
     def __init__(self):
-        self.cliente=MongoClient(DATABASE_URL)
+        self.cliente=AsyncIOMotorClient(DATABASE_URL, event_listeners=[monitorComandos])
         self.db=self.cliente[DATABASE_NAME]
 
     def cerrar(self):
@@ -0,0 +1,51 @@
+from pymongo import ASCENDING, GEOSPHERE
+
+from comun.indices import aplicarRegistro, imprimirReporte
+
+# Índices que necesita este servicio, por colección.
+# Cada uno lleva nombre fijo para poder verificarlo contra lo que ya existe en la base.
+INDICES = {
+    "cultivos": [
+        # Listado y exportación: solo activos, en orden de _id
+        {"nombre": "activos_por_id", "llaves": [("registroActivo", ASCENDING), ("_id", ASCENDING)],
+         "opciones": {"partialFilterExpression": {"registroActivo": True}}},
+        # Multillave sobre los ids de los subdocumentos embebidos
+        {"nombre": "aplicacionesInsumos_id", "llaves": [("aplicacionesInsumos._id", ASCENDING)]},
+        # Motor de alertas (AlertasREST): cosechas estimadas vencidas entre los activos
+        {"nombre": "activos_por_cosechaEst", "llaves": [("fechaCosechaEst", ASCENDING)],
+         "opciones": {"partialFilterExpression": {"registroActivo": True}}},
+        # Motor de alertas: cultivos escritos desde su última ejecución
+        {"nombre": "actualizadoEn", "llaves": [("actualizadoEn", ASCENDING)]},
+        # Búsquedas por cercanía y por polígono; 2dsphere omite los cultivos sin ubicacion.geo
+        {"nombre": "ubicacion_geo", "llaves": [("ubicacion.geo", GEOSPHERE)]},
+    ],
+    "riegos_buckets": [
+        # Buscar el bucket con espacio al registrar un riego
+        {"nombre": "cultivo_conteo", "llaves": [("idCultivo", ASCENDING), ("conteo", ASCENDING)]},
+        # Multillave: localizar un riego dentro de los buckets de su cultivo
+        {"nombre": "cultivo_idRiego", "llaves": [("idCultivo", ASCENDING), ("riegos.idRiego", ASCENDING)]},
+        # Motor de alertas (AlertasREST): riegos Pendiente por fecha esperada
+        {"nombre": "riegos_status_fechaEsperada", "llaves": [("riegos.status", ASCENDING), ("riegos.fechaEsperada", ASCENDING)]},
+        {"nombre": "riegos_actualizadoEn", "llaves": [("riegos.actualizadoEn", ASCENDING)]},
+    ],
+    "riegos_resumen": [
+        # Upsert de los totales ($inc) y $merge de la reconstrucción; consulta de un cultivo por rango
+        {"nombre": "cultivo_periodo_inicio", "llaves": [("idCultivo", ASCENDING), ("periodo", ASCENDING), ("inicio", ASCENDING)],
+         "opciones": {"unique": True}},
+        # Totales de todos los cultivos en un rango
+        {"nombre": "periodo_inicio", "llaves": [("periodo", ASCENDING), ("inicio", ASCENDING)]},
+    ],
+    "insumos_movimientos": [
+        # Consumo por periodo: de todos los insumos o de uno
+        {"nombre": "fecha_insumo", "llaves": [("fecha", ASCENDING), ("idInsumo", ASCENDING)]},
+        {"nombre": "insumo_fecha", "llaves": [("idInsumo", ASCENDING), ("fecha", ASCENDING)]},
+    ],
+    "seguimiento_cultivo": [
+        {"nombre": "idCultivo", "llaves": [("idCultivo", ASCENDING)]},
+    ],
+}
+
+
+async def asegurarIndices(db) -> list:
+    reporte = await aplicarRegistro(db, INDICES)
+    return imprimirReporte(reporte)
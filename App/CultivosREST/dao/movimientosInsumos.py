@@ -0,0 +1,71 @@
+"""
+Existencia de insumos y bitácora de consumo (colección insumos_movimientos, solo se agrega).
+- Cada aplicación descuenta cantDisponible con un solo $inc condicional: si no alcanza, no se aplica.
+- Cada movimiento queda en la bitácora con signo: negativo consume, positivo devuelve.
+  Editar o eliminar una aplicación no borra movimientos; agrega los que la compensan.
+- Las aplicaciones que ya descontaron llevan 'descontado'; las anteriores a la bitácora no mueven existencia.
+"""
+from datetime import date, datetime
+
+from comun.versiones import incrementarVersionGlobal
+from comun.catalogoInsumos import CLAVE_VERSION as CLAVE_VERSION_INSUMOS, catalogoInsumos
+
+COLECCION_MOVIMIENTOS = "insumos_movimientos"
+CAMPO_DESCONTADO = "descontado"
+
+
+async def moverExistencia(db, id_insumo, cantidad: float) -> bool:
+    """
+    Descuenta 'cantidad' de cantDisponible (o la devuelve si es negativa).
+    - El descuento solo se aplica si hay existencia suficiente; filtro y $inc van en la misma escritura.
+    """
+    if not cantidad:
+        return True
+    filtro = {"_id": id_insumo}
+    if cantidad > 0:
+        filtro["cantDisponible"] = {"$gte": cantidad}
+    result = await db.insumos.update_one(filtro, {"$inc": {"cantDisponible": -cantidad}})
+    if result.modified_count != 1:
+        return False
+    # El listado de insumos (ETag y catálogo en memoria) muestra cantDisponible
+    await incrementarVersionGlobal(db, CLAVE_VERSION_INSUMOS)
+    catalogoInsumos.invalidar()
+    return True
+
+
+def _fechaMovimiento(aplicacion: dict) -> datetime:
+    # El consumo se asigna a la fecha de la aplicación; sin ella, al momento del registro
+    fecha = aplicacion.get("fechaAplicacion")
+    if isinstance(fecha, datetime):
+        return fecha
+    if isinstance(fecha, date):
+        return datetime.combine(fecha, datetime.min.time())
+    if isinstance(fecha, str):
+        try:
+            return datetime.combine(date.fromisoformat(fecha[:10]), datetime.min.time())
+        except ValueError:
+            pass
+    return datetime.now()
+
+
+def movimiento(tipo: str, id_cultivo, aplicacion: dict, cantidad: float) -> dict:
+    """tipo: 'aplicacion' (consume, cantidad negativa) o 'reverso' (compensa una anterior, positiva)."""
+    return {
+        "tipo": tipo,
+        "idInsumo": aplicacion["idInsumo"],
+        "idCultivo": id_cultivo,
+        "idAplicacion": aplicacion["_id"],
+        "cantidad": cantidad,
+        "fecha": _fechaMovimiento(aplicacion),
+        "registrado": datetime.now(),
+    }
+
+
+async def registrarMovimientos(db, movimientos: list):
+    # La existencia ya se movió; si la bitácora falla se reporta para conciliarla
+    if not movimientos:
+        return
+    try:
+        await db[COLECCION_MOVIMIENTOS].insert_many(movimientos, ordered=True)
+    except Exception as ex:
+        print(f"Error al registrar en {COLECCION_MOVIMIENTOS}: {ex}; movimientos: {movimientos}")
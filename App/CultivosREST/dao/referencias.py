@@ -0,0 +1,39 @@
+from bson import ObjectId
+from comun.instrumentacion import medirMetodos
+
+
+@medirMetodos
+class CargadorReferencias:
+    """
+    Resuelve referencias (usuarios, insumos, cultivos...) por lotes.
+    - Junta los ObjectId pedidos, quita repetidos y los consulta con un solo $in por colección.
+    - Lo que ya se cargó se reutiliza durante el resto de la petición.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self._cargados = {}
+
+    async def cargar(self, coleccion: str, ids, campos: tuple = ()) -> dict:
+        clave = (coleccion, tuple(sorted(campos)))
+        cargados = self._cargados.setdefault(clave, {})
+
+        ids_validos = [oid for oid in ids if isinstance(oid, ObjectId)]
+        faltantes = list({oid for oid in ids_validos if oid not in cargados})
+        if faltantes:
+            proyeccion = {campo: 1 for campo in campos} or None
+            async for doc in self.db[coleccion].find({"_id": {"$in": faltantes}}, proyeccion):
+                cargados[doc["_id"]] = doc
+            for oid in faltantes:
+                cargados.setdefault(oid, None)
+
+        return {oid: cargados[oid] for oid in ids_validos}
+
+
+def obtenerCargador(request) -> CargadorReferencias:
+    # Un solo cargador por petición, compartido por todos los DAO que la atienden
+    cargador = getattr(request.state, "cargador", None)
+    if cargador is None:
+        cargador = CargadorReferencias(request.app.db)
+        request.state.cargador = cargador
+    return cargador
@@ -0,0 +1,117 @@
+"""
+Totales de agua por cultivo y periodo (día y mes) en la colección riegos_resumen.
+- Solo cuentan los riegos con status Aplicado, fechados por fechaAplicada (o fechaEsperada si no la tienen).
+- RiegosDAO mantiene los totales con $inc de la diferencia entre el riego antes y después de cada escritura.
+- reconstruirResumen vuelve a calcular todo desde riegos_buckets (recuperación o primera carga).
+"""
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from dao.indices import INDICES
+
+COLECCION_RESUMEN = "riegos_resumen"
+PERIODOS = ("dia", "mes")
+CAMPOS_APORTE = ("status", "fechaAplicada", "fechaEsperada", "cantAgua", "duracionRiego")
+
+
+def inicioPeriodo(fecha: datetime, periodo: str) -> datetime:
+    inicio = datetime(fecha.year, fecha.month, fecha.day)
+    return inicio.replace(day=1) if periodo == "mes" else inicio
+
+
+def _aporte(riego: dict | None) -> tuple | None:
+    # (fecha, agua, duración) con que el riego entra al resumen, o None si no cuenta
+    if not riego or riego.get("status") != "Aplicado":
+        return None
+    fecha = riego.get("fechaAplicada") or riego.get("fechaEsperada")
+    if not isinstance(fecha, datetime):
+        return None
+    return fecha, float(riego.get("cantAgua") or 0), float(riego.get("duracionRiego") or 0)
+
+
+def operacionesResumen(id_cultivo, anterior: dict | None, nuevo: dict | None) -> list:
+    """
+    Upserts con $inc para pasar del riego 'anterior' al 'nuevo' (None = no existía / ya no existe).
+    - Alta: anterior None. Baja: nuevo None. Cambio de fecha o de status: resta en un periodo y suma en otro.
+    """
+    deltas = {}
+    for riego, signo in ((anterior, -1), (nuevo, 1)):
+        aporte = _aporte(riego)
+        if aporte is None:
+            continue
+        fecha, agua, duracion = aporte
+        for periodo in PERIODOS:
+            delta = deltas.setdefault((periodo, inicioPeriodo(fecha, periodo)), [0.0, 0.0, 0])
+            delta[0] += signo * agua
+            delta[1] += signo * duracion
+            delta[2] += signo
+
+    return [
+        UpdateOne({"idCultivo": id_cultivo, "periodo": periodo, "inicio": inicio},
+                  {"$inc": {"cantAgua": agua, "duracionRiego": duracion, "riegos": riegos}},
+                  upsert=True)
+        for (periodo, inicio), (agua, duracion, riegos) in deltas.items()
+        if agua or duracion or riegos
+    ]
+
+
+async def aplicarResumen(db, operaciones: list):
+    # Si falla, el riego ya quedó escrito: se reporta y reconstruirResumen corrige la diferencia
+    if not operaciones:
+        return
+    try:
+        await db[COLECCION_RESUMEN].bulk_write(operaciones, ordered=False)
+    except Exception as ex:
+        print(f"Error al actualizar {COLECCION_RESUMEN}: {ex}")
+
+
+def _pipelinePeriodo(periodo: str, destino: str) -> list:
+    unidad = {"dia": "day", "mes": "month"}[periodo]
+    return [
+        {"$unwind": "$riegos"},
+        {"$match": {"riegos.status": "Aplicado"}},
+        {"$project": {
+            "_id": 0,
+            "idCultivo": 1,
+            "fecha": {"$ifNull": ["$riegos.fechaAplicada", "$riegos.fechaEsperada"]},
+            "cantAgua": {"$ifNull": ["$riegos.cantAgua", 0]},
+            "duracionRiego": {"$ifNull": ["$riegos.duracionRiego", 0]},
+        }},
+        {"$match": {"fecha": {"$type": "date"}}},
+        {"$group": {
+            "_id": {"idCultivo": "$idCultivo", "inicio": {"$dateTrunc": {"date": "$fecha", "unit": unidad}}},
+            "cantAgua": {"$sum": {"$toDouble": "$cantAgua"}},
+            "duracionRiego": {"$sum": {"$toDouble": "$duracionRiego"}},
+            "riegos": {"$sum": 1},
+        }},
+        {"$project": {
+            "_id": 0,
+            "idCultivo": "$_id.idCultivo",
+            "periodo": {"$literal": periodo},
+            "inicio": "$_id.inicio",
+            "cantAgua": 1,
+            "duracionRiego": 1,
+            "riegos": 1,
+        }},
+        {"$merge": {"into": destino, "on": ["idCultivo", "periodo", "inicio"],
+                    "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+
+
+async def reconstruirResumen(db) -> int:
+    """
+    Calcula el resumen completo en una colección aparte y la cambia por riegos_resumen de una vez.
+    - Las escrituras de riegos hechas mientras corre se aplican a la colección vieja y se pierden;
+      conviene ejecutarlo sin escrituras o volver a ejecutarlo después.
+    """
+    temporal = f"{COLECCION_RESUMEN}_reconstruccion"
+    await db[temporal].drop()
+    # Los índices del registro se crean antes: $merge necesita el único y rename los conserva
+    for spec in INDICES[COLECCION_RESUMEN]:
+        await db[temporal].create_index(spec["llaves"], name=spec["nombre"], **spec.get("opciones", {}))
+    for periodo in PERIODOS:
+        await db.riegos_buckets.aggregate(_pipelinePeriodo(periodo, temporal)).to_list(length=None)
+    total = await db[temporal].count_documents({})
+    await db[temporal].rename(COLECCION_RESUMEN, dropTarget=True)
+    return total
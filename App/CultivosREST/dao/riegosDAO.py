@@ -1,16 +1,123 @@
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
 from models.riegosModel import  RiegoConsulta, \
-    RiegoConsultaIndividual, RiegoInsert, RiegosSalida, RiegoParcialUpdate, Salida
+    RiegoConsultaIndividual, RiegoInsert, RiegosSalida, RiegoParcialUpdate, Salida, \
+    RiegosLoteInsert, RiegosLoteSalida, ResultadoLoteRiego, ResumenRiegoPeriodo, ResumenRiegosCultivoSalida, \
+    TotalRiegoCultivo, ResumenRiegosSalida
 from fastapi.encoders import jsonable_encoder
 from pymongo.database import Database
-from datetime import datetime   
-
-
+from datetime import date, datetime
+from dao.referencias import CargadorReferencias
+from dao.resumenRiegos import COLECCION_RESUMEN, CAMPOS_APORTE, inicioPeriodo, operacionesResumen, aplicarResumen
+from comun.paginacion import LIMITE_DEFECTO, limitar
+from comun.versiones import conActualizacion
+from comun.instrumentacion import medirMetodos
+
+# Máximo de riegos por documento de riegos_buckets
+RIEGOS_POR_BUCKET = 200
+# Máximo de elementos (nuevos + actualizaciones) por petición de lote
+MAX_RIEGOS_POR_LOTE = 1000
+# Marca del último lote que actualizó el riego; identifica qué actualizaciones del bulk_write coincidieron
+CAMPO_LOTE = "lote"
+
+
+def _filtroResumen(periodo: str, desde: date | None, hasta: date | None) -> dict:
+    # desde y hasta se llevan al inicio de su periodo; los periodos que quedaron en cero no se muestran
+    filtro = {"periodo": periodo, "riegos": {"$gt": 0}}
+    rango = {}
+    if desde is not None:
+        rango["$gte"] = inicioPeriodo(datetime.combine(desde, datetime.min.time()), periodo)
+    if hasta is not None:
+        rango["$lte"] = inicioPeriodo(datetime.combine(hasta, datetime.min.time()), periodo)
+    if rango:
+        filtro["inicio"] = rango
+    return filtro
+
+
+def _porHectarea(agua: float, area) -> float | None:
+    return round(agua / area, 4) if isinstance(area, (int, float)) and area > 0 else None
+
+
+@medirMetodos
 class RiegosDAO:
-    def __init__(self, db):
+    """
+    Los riegos viven en la colección riegos_buckets, no dentro del cultivo.
+    - Cada bucket guarda hasta RIEGOS_POR_BUCKET riegos de un solo cultivo: {idCultivo, conteo, riegos[]}.
+    - Un riego nuevo entra al primer bucket con espacio; si no hay, el upsert crea uno.
+    - Cada escritura ajusta los totales de riegos_resumen (dao/resumenRiegos.py) con la diferencia.
+    - Cada riego guarda la hora de su última escritura (actualizadoEn) para el motor de alertas.
+    """
+
+    def __init__(self, db, cargador: CargadorReferencias | None = None):
         self.db = db
+        self.cargador = cargador or CargadorReferencias(db)
+
+    @staticmethod
+    def _documentoRiego(riego_data: RiegoInsert) -> dict:
+        # Solo los campos de RiegoInsert (en el lote el riego trae además idCultivo)
+        nuevo_riego_dict = riego_data.model_dump(include=set(RiegoInsert.model_fields))
+        nuevo_riego_dict["idRiego"] = str(ObjectId())
+        nuevo_riego_dict["idUsuario"] = ObjectId(nuevo_riego_dict["idUsuario"])
+
+        # Convertir fechas a datetime.datetime con tiempo mínimo para MongoDB
+        nuevo_riego_dict["fechaEsperada"] = datetime.combine(riego_data.fechaEsperada, datetime.min.time())
+        if riego_data.fechaAplicada:
+            nuevo_riego_dict["fechaAplicada"] = datetime.combine(riego_data.fechaAplicada, datetime.min.time())
+        else:
+            nuevo_riego_dict["fechaAplicada"] = None
+        return conActualizacion(nuevo_riego_dict)
+
+    @staticmethod
+    def _camposActualizacion(riego_data: RiegoParcialUpdate) -> tuple:
+        # (campos para $set sobre riegos.$, ObjectId del usuario a verificar o None, mensaje de error o None)
+        campos_actualizar = {}
+        id_usuario_obj = None
+
+        # Actualizar fechas con nueva estructura
+        if riego_data.fechaEsperada is not None:
+            campos_actualizar["riegos.$.fechaEsperada"] = datetime.combine(riego_data.fechaEsperada, datetime.min.time())
+
+        if riego_data.fechaAplicada is not None:
+            campos_actualizar["riegos.$.fechaAplicada"] = datetime.combine(riego_data.fechaAplicada, datetime.min.time())
+
+        if riego_data.cantAgua is not None:
+            if riego_data.cantAgua <= 0:
+                return {}, None, "La cantidad de agua debe ser mayor a cero."
+            campos_actualizar["riegos.$.cantAgua"] = riego_data.cantAgua
+
+        if riego_data.metodoRiego is not None:
+            if not riego_data.metodoRiego.strip():
+                return {}, None, "El método de riego no puede estar vacío."
+            campos_actualizar["riegos.$.metodoRiego"] = riego_data.metodoRiego
+
+        if riego_data.duracionRiego is not None:
+            if riego_data.duracionRiego <= 0:
+                return {}, None, "La duración debe ser mayor a cero."
+            campos_actualizar["riegos.$.duracionRiego"] = riego_data.duracionRiego
+
+        if riego_data.idUsuario is not None:
+            try:
+                id_usuario_obj = ObjectId(riego_data.idUsuario)
+            except Exception:
+                return {}, None, "ID de usuario no válido."
+            campos_actualizar["riegos.$.idUsuario"] = id_usuario_obj
+
+        if riego_data.status is not None:
+            if riego_data.status not in ["Pendiente", "Aplicado", "Cancelado"]:
+                return {}, None, "Estado (status) inválido."
+            campos_actualizar["riegos.$.status"] = riego_data.status
+
+        if not campos_actualizar:
+            return {}, None, "No se proporcionaron campos para actualizar."
+        return campos_actualizar, id_usuario_obj, None
+
+    @staticmethod
+    def _riegoActualizado(anterior: dict, campos_actualizar: dict) -> dict:
+        # El riego como queda después del $set sobre riegos.$
+        return {**anterior, **{campo.removeprefix("riegos.$."): valor for campo, valor in campos_actualizar.items()}}
     
-    def registrarNuevoRiego(self, id_cultivo: str, riego_data: RiegoInsert) -> Salida:
+    async def registrarNuevoRiego(self, id_cultivo: str, riego_data: RiegoInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             try:
@@ -20,14 +127,14 @@ class RiegosDAO:
                 salida.mensaje = "El ID del cultivo proporcionado no tiene un formato válido."
                 return salida
 
-            cultivo_existente = self.db.cultivos.find_one({"_id": obj_id_cultivo})
+            cultivo_existente = await self.db.cultivos.find_one({"_id": obj_id_cultivo}, {"_id": 1})
             if not cultivo_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un cultivo con el ID: {id_cultivo}."
                 return salida
 
             try:
-                usuario_existente = self.db.usuarios.find_one({"_id": ObjectId(riego_data.idUsuario)})
+                usuario_existente = await self.db.usuarios.find_one({"_id": ObjectId(riego_data.idUsuario)}, {"_id": 1})
             except Exception:
                 salida.estatus = "ERROR"
                 salida.mensaje = "El ID del usuario proporcionado no tiene un formato válido."
@@ -38,24 +145,17 @@ class RiegosDAO:
                 salida.mensaje = f"No se encontró un usuario con el ID: {riego_data.idUsuario}."
                 return salida
 
-            nuevo_riego_dict = riego_data.model_dump()
-            nuevo_riego_dict["idRiego"] = str(ObjectId())
-            nuevo_riego_dict["idUsuario"] = ObjectId(nuevo_riego_dict["idUsuario"])
-            
-            # Convertir fechas a datetime.datetime con tiempo mínimo para MongoDB
-            nuevo_riego_dict["fechaEsperada"] = datetime.combine(riego_data.fechaEsperada, datetime.min.time())
-            if riego_data.fechaAplicada:
-                nuevo_riego_dict["fechaAplicada"] = datetime.combine(riego_data.fechaAplicada, datetime.min.time())
-            else:
-                nuevo_riego_dict["fechaAplicada"] = None
+            nuevo_riego_dict = self._documentoRiego(riego_data)
 
-            # Insertar en el array riegos sin campo eliminado ni filtros de status
-            result = self.db.cultivos.update_one(
-                {"_id": obj_id_cultivo},
-                {"$push": {"riegos": nuevo_riego_dict}}
+            # Insertar en un bucket del cultivo con espacio disponible (o crear uno nuevo)
+            result = await self.db.riegos_buckets.update_one(
+                {"idCultivo": obj_id_cultivo, "conteo": {"$lt": RIEGOS_POR_BUCKET}},
+                {"$push": {"riegos": nuevo_riego_dict}, "$inc": {"conteo": 1}},
+                upsert=True
             )
 
-            if result.modified_count == 1:
+            if result.modified_count == 1 or result.upserted_id is not None:
+                await aplicarResumen(self.db, operacionesResumen(obj_id_cultivo, None, nuevo_riego_dict))
                 salida.estatus = "OK"
                 salida.mensaje = f"Riego agregado exitosamente al cultivo con ID '{id_cultivo}'. ID del riego: {nuevo_riego_dict['idRiego']}."
             else:
@@ -69,7 +169,7 @@ class RiegosDAO:
         return salida
 
 
-    def actualizarRiegoDeCultivo(self, id_cultivo: str, id_riego: str, riego_data: RiegoParcialUpdate) -> Salida:
+    async def actualizarRiegoDeCultivo(self, id_cultivo: str, id_riego: str, riego_data: RiegoParcialUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             try:
@@ -79,75 +179,36 @@ class RiegosDAO:
                 salida.mensaje = "ID del cultivo no válido."
                 return salida
 
-            campos_actualizar = {}
-
-            # Actualizar fechas con nueva estructura
-            if riego_data.fechaEsperada is not None:
-                campos_actualizar["riegos.$.fechaEsperada"] = datetime.combine(riego_data.fechaEsperada, datetime.min.time())
-
-            if riego_data.fechaAplicada is not None:
-                campos_actualizar["riegos.$.fechaAplicada"] = datetime.combine(riego_data.fechaAplicada, datetime.min.time())
-
-            if riego_data.cantAgua is not None:
-                if riego_data.cantAgua <= 0:
-                    salida.estatus = "ERROR"
-                    salida.mensaje = "La cantidad de agua debe ser mayor a cero."
-                    return salida
-                campos_actualizar["riegos.$.cantAgua"] = riego_data.cantAgua
-
-            if riego_data.metodoRiego is not None:
-                if not riego_data.metodoRiego.strip():
-                    salida.estatus = "ERROR"
-                    salida.mensaje = "El método de riego no puede estar vacío."
-                    return salida
-                campos_actualizar["riegos.$.metodoRiego"] = riego_data.metodoRiego
-
-            if riego_data.duracionRiego is not None:
-                if riego_data.duracionRiego <= 0:
-                    salida.estatus = "ERROR"
-                    salida.mensaje = "La duración debe ser mayor a cero."
-                    return salida
-                campos_actualizar["riegos.$.duracionRiego"] = riego_data.duracionRiego
-
-            if riego_data.idUsuario is not None:
-                try:
-                    id_usuario_obj = ObjectId(riego_data.idUsuario)
-                except Exception:
-                    salida.estatus = "ERROR"
-                    salida.mensaje = "ID de usuario no válido."
-                    return salida
+            campos_actualizar, id_usuario_obj, error = self._camposActualizacion(riego_data)
+            if error:
+                salida.estatus = "ERROR"
+                salida.mensaje = error
+                return salida
 
-                usuario_existente = self.db.usuarios.find_one({"_id": id_usuario_obj})
+            if id_usuario_obj is not None:
+                usuario_existente = await self.db.usuarios.find_one({"_id": id_usuario_obj}, {"_id": 1})
                 if not usuario_existente:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"No se encontró un usuario con el ID: {riego_data.idUsuario}."
                     return salida
-                campos_actualizar["riegos.$.idUsuario"] = id_usuario_obj
 
-            if riego_data.status is not None:
-                if riego_data.status not in ["Pendiente", "Aplicado", "Cancelado"]:
-                    salida.estatus = "ERROR"
-                    salida.mensaje = "Estado (status) inválido."
-                    return salida
-                campos_actualizar["riegos.$.status"] = riego_data.status
-
-            if not campos_actualizar:
-                salida.estatus = "ERROR"
-                salida.mensaje = "No se proporcionaron campos para actualizar."
-                return salida
-
-            result = self.db.cultivos.update_one(
+            # Regresa el riego como estaba antes del $set, para ajustar el resumen con la diferencia
+            anterior_doc = await self.db.riegos_buckets.find_one_and_update(
                 {
-                    "_id": obj_id_cultivo,
+                    "idCultivo": obj_id_cultivo,
                     "riegos.idRiego": id_riego
                 },
-                {"$set": campos_actualizar}
+                {"$set": conActualizacion(campos_actualizar, "riegos.$.")},
+                projection={"_id": 0, "riegos": {"$elemMatch": {"idRiego": id_riego}}}
             )
 
-            if result.matched_count == 0:
+            anterior = anterior_doc["riegos"][0] if anterior_doc and anterior_doc.get("riegos") else None
+            nuevo = self._riegoActualizado(anterior, campos_actualizar) if anterior is not None else None
+            if anterior is None:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró el cultivo con ID '{id_cultivo}' o el riego con ID '{id_riego}'."
-            elif result.modified_count > 0:
+            elif nuevo != anterior:
+                await aplicarResumen(self.db, operacionesResumen(obj_id_cultivo, anterior, nuevo))
                 salida.estatus = "OK"
                 salida.mensaje = f"Riego con ID '{id_riego}' actualizado exitosamente."
             else:
@@ -161,7 +222,173 @@ class RiegosDAO:
         return salida
 
 
-    def consultarRiegoDeCultivoPorId(self, id_cultivo: str, id_riego: str) -> RiegoConsultaIndividual:
+    async def registrarLote(self, lote: RiegosLoteInsert) -> RiegosLoteSalida:
+        """
+        Riegos nuevos y actualizaciones de varios cultivos en un solo bulk_write sin orden.
+        - Cultivos y usuarios referenciados se validan con un $in por colección.
+        - Los riegos nuevos de un mismo cultivo entran juntos ($push $each) a un bucket con espacio.
+        - Cada elemento tiene su propio resultado; uno inválido no detiene a los demás.
+        """
+        salida = RiegosLoteSalida(estatus="", mensaje="", resultados=[])
+        total = len(lote.nuevos) + len(lote.actualizaciones)
+        if total == 0 or total > MAX_RIEGOS_POR_LOTE:
+            salida.estatus = "ERROR"
+            salida.mensaje = f"El lote debe tener entre 1 y {MAX_RIEGOS_POR_LOTE} elementos."
+            return salida
+
+        def fallo(resultado: ResultadoLoteRiego, mensaje: str):
+            resultado.estatus = "ERROR"
+            resultado.mensaje = mensaje
+
+        try:
+            # 1. Formato de los IDs y validaciones que no necesitan la base
+            nuevos = []
+            for indice, riego in enumerate(lote.nuevos):
+                resultado = ResultadoLoteRiego(indice=indice, operacion="nuevo", idCultivo=riego.idCultivo,
+                                               estatus="", mensaje="")
+                salida.resultados.append(resultado)
+                try:
+                    nuevos.append((resultado, ObjectId(riego.idCultivo), ObjectId(riego.idUsuario), riego))
+                except Exception:
+                    fallo(resultado, "El ID del cultivo o del usuario no tiene un formato válido.")
+
+            actualizaciones = []
+            for indice, riego in enumerate(lote.actualizaciones):
+                resultado = ResultadoLoteRiego(indice=indice, operacion="actualizacion", idCultivo=riego.idCultivo,
+                                               idRiego=riego.idRiego, estatus="", mensaje="")
+                salida.resultados.append(resultado)
+                try:
+                    obj_id_cultivo = ObjectId(riego.idCultivo)
+                except Exception:
+                    fallo(resultado, "ID del cultivo no válido.")
+                    continue
+                campos_actualizar, id_usuario_obj, error = self._camposActualizacion(riego)
+                if error:
+                    fallo(resultado, error)
+                    continue
+                actualizaciones.append((resultado, obj_id_cultivo, id_usuario_obj, riego, campos_actualizar))
+
+            # 2. Cultivos, usuarios y riegos a actualizar: una consulta por colección
+            pendientes = nuevos + [a[:4] for a in actualizaciones]
+            cultivos = await self.cargador.cargar("cultivos", [p[1] for p in pendientes], ("_id",))
+            usuarios = await self.cargador.cargar("usuarios", [p[2] for p in pendientes if p[2] is not None], ("_id",))
+            # Con los campos que usa el resumen, para calcular la diferencia de cada actualización
+            riegos_existentes = {}
+            if actualizaciones:
+                async for bucket in self.db.riegos_buckets.find(
+                        {"idCultivo": {"$in": list({a[1] for a in actualizaciones})},
+                         "riegos.idRiego": {"$in": list({a[3].idRiego for a in actualizaciones})}},
+                        {"idCultivo": 1, "riegos.idRiego": 1, **{f"riegos.{campo}": 1 for campo in CAMPOS_APORTE}}):
+                    for r in bucket.get("riegos", []):
+                        riegos_existentes[(bucket["idCultivo"], r.get("idRiego"))] = r
+
+            def referenciasValidas(resultado, obj_id_cultivo, id_usuario_obj) -> bool:
+                if not cultivos.get(obj_id_cultivo):
+                    fallo(resultado, f"No se encontró un cultivo con el ID: {resultado.idCultivo}.")
+                    return False
+                if id_usuario_obj is not None and not usuarios.get(id_usuario_obj):
+                    fallo(resultado, f"No se encontró un usuario con el ID: {id_usuario_obj}.")
+                    return False
+                return True
+
+            # 3. Operaciones; 'afectados' guarda qué resultados dependen de cada operación y 'resumenes' su ajuste
+            operaciones, afectados, resumenes = [], [], []
+            por_cultivo = {}
+            for resultado, obj_id_cultivo, id_usuario_obj, riego in nuevos:
+                if referenciasValidas(resultado, obj_id_cultivo, id_usuario_obj):
+                    nuevo_riego_dict = self._documentoRiego(riego)
+                    resultado.idRiego = nuevo_riego_dict["idRiego"]
+                    por_cultivo.setdefault(obj_id_cultivo, []).append((resultado, nuevo_riego_dict))
+
+            for obj_id_cultivo, elementos in por_cultivo.items():
+                for inicio in range(0, len(elementos), RIEGOS_POR_BUCKET):
+                    tramo = elementos[inicio:inicio + RIEGOS_POR_BUCKET]
+                    # Solo un bucket donde quepa el tramo completo; si no hay, el upsert crea uno
+                    operaciones.append(UpdateOne(
+                        {"idCultivo": obj_id_cultivo, "conteo": {"$lte": RIEGOS_POR_BUCKET - len(tramo)}},
+                        {"$push": {"riegos": {"$each": [r for _, r in tramo]}}, "$inc": {"conteo": len(tramo)}},
+                        upsert=True))
+                    afectados.append([resultado for resultado, _ in tramo])
+                    resumenes.append([op for _, r in tramo for op in operacionesResumen(obj_id_cultivo, None, r)])
+
+            # Un riego que viene varias veces en el lote se junta en una sola operación
+            por_riego = {}
+            for resultado, obj_id_cultivo, id_usuario_obj, riego, campos_actualizar in actualizaciones:
+                if not referenciasValidas(resultado, obj_id_cultivo, id_usuario_obj):
+                    continue
+                llave = (obj_id_cultivo, riego.idRiego)
+                anterior = riegos_existentes.get(llave)
+                if anterior is None:
+                    fallo(resultado, f"No se encontró el riego con ID '{riego.idRiego}' en el cultivo '{riego.idCultivo}'.")
+                    continue
+                pendiente = por_riego.setdefault(llave, {"anterior": anterior, "campos": {}, "resultados": []})
+                pendiente["campos"].update(campos_actualizar)
+                pendiente["resultados"].append(resultado)
+
+            marca = ObjectId()
+            actualizadas = {}  # índice de operación -> (idCultivo, idRiego)
+            for (obj_id_cultivo, id_riego), pendiente in por_riego.items():
+                anterior = pendiente["anterior"]
+                # Solo coincide si el riego sigue como se leyó: la diferencia del resumen parte de ese estado
+                elemento = {"idRiego": id_riego, **{campo: anterior.get(campo) for campo in CAMPOS_APORTE}}
+                actualizadas[len(operaciones)] = (obj_id_cultivo, id_riego)
+                operaciones.append(UpdateOne({"idCultivo": obj_id_cultivo, "riegos": {"$elemMatch": elemento}},
+                                             {"$set": conActualizacion({**pendiente["campos"], f"riegos.$.{CAMPO_LOTE}": marca}, "riegos.$.")}))
+                afectados.append(pendiente["resultados"])
+                resumenes.append(operacionesResumen(obj_id_cultivo, anterior,
+                                                    self._riegoActualizado(anterior, pendiente["campos"])))
+
+            # 4. Todo en un solo bulk_write; con ordered=False un error no detiene el resto
+            errores, sin_coincidencia = {}, set()
+            if operaciones:
+                try:
+                    resultado_bulk = (await self.db.riegos_buckets.bulk_write(operaciones, ordered=False)).bulk_api_result
+                except BulkWriteError as ex:
+                    resultado_bulk = ex.details
+                    errores = {e["index"]: e.get("errmsg", "") for e in ex.details.get("writeErrors", [])}
+                    print(f"Error en RiegosDAO.registrarLote: {len(errores)} operaciones fallaron")
+                # Los nuevos siempre coinciden o crean un bucket; si faltan coincidencias, fue alguna actualización
+                if resultado_bulk.get("nMatched", 0) + resultado_bulk.get("nUpserted", 0) < len(operaciones) - len(errores):
+                    sin_coincidencia = await self._actualizacionesSinCoincidencia(
+                        marca, {i: llave for i, llave in actualizadas.items() if i not in errores})
+            await aplicarResumen(self.db, [op for indice_operacion, ops in enumerate(resumenes)
+                                           if indice_operacion not in errores and indice_operacion not in sin_coincidencia
+                                           for op in ops])
+
+            for indice_operacion, grupo in enumerate(afectados):
+                for resultado in grupo:
+                    if indice_operacion in errores:
+                        fallo(resultado, "No se pudo escribir el riego. Consulte al administrador.")
+                    elif indice_operacion in sin_coincidencia:
+                        fallo(resultado, f"El riego '{resultado.idRiego}' cambió o se eliminó durante el lote; "
+                                         f"no se actualizó.")
+                    else:
+                        resultado.estatus = "OK"
+                        resultado.mensaje = ("Riego agregado exitosamente." if resultado.operacion == "nuevo"
+                                             else "Riego actualizado exitosamente.")
+
+            correctos = sum(1 for r in salida.resultados if r.estatus == "OK")
+            salida.estatus = "OK" if correctos == total else ("PARCIAL" if correctos else "ERROR")
+            salida.mensaje = f"Se aplicaron {correctos} de {total} elementos del lote."
+
+        except Exception as ex:
+            print(f"Error en RiegosDAO.registrarLote: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al registrar el lote de riegos. Consulte al administrador."
+        return salida
+
+
+    async def _actualizacionesSinCoincidencia(self, marca: ObjectId, actualizadas: dict) -> set:
+        # Índices de las actualizaciones que no coincidieron: sus riegos no quedaron con la marca del lote
+        con_marca = set()
+        async for bucket in self.db.riegos_buckets.find(
+                {"idCultivo": {"$in": list({c for c, _ in actualizadas.values()})}, f"riegos.{CAMPO_LOTE}": marca},
+                {"idCultivo": 1, "riegos.idRiego": 1, f"riegos.{CAMPO_LOTE}": 1}):
+            con_marca.update((bucket["idCultivo"], r.get("idRiego")) for r in bucket.get("riegos", [])
+                             if r.get(CAMPO_LOTE) == marca)
+        return {indice for indice, llave in actualizadas.items() if llave not in con_marca}
+
+    async def consultarRiegoDeCultivoPorId(self, id_cultivo: str, id_riego: str) -> RiegoConsultaIndividual:
         salida = RiegoConsultaIndividual(estatus="", mensaje="", riego=None)
         try:
             try:
@@ -172,9 +399,9 @@ class RiegosDAO:
                 return salida
 
             # Ya no filtramos por status o eliminado, solo por idRiego
-            cultivo_doc = self.db.cultivos.find_one(
+            cultivo_doc = await self.db.riegos_buckets.find_one(
                 {
-                    "_id": obj_id_cultivo,
+                    "idCultivo": obj_id_cultivo,
                     "riegos.idRiego": id_riego
                 },
                 {
@@ -191,7 +418,9 @@ class RiegosDAO:
                     id_usuario = str(id_usuario)
                 
                 try:
-                    usuario_doc = self.db.usuarios.find_one({"_id": ObjectId(id_usuario)}, {"nombre": 1})
+                    oid_usuario = ObjectId(id_usuario)
+                    usuarios = await self.cargador.cargar("usuarios", [oid_usuario], ("nombre",))
+                    usuario_doc = usuarios.get(oid_usuario)
                     nombre_usuario = usuario_doc["nombre"] if usuario_doc else "Desconocido"
                 except:
                     nombre_usuario = "Desconocido"
@@ -216,7 +445,7 @@ class RiegosDAO:
         return salida
 
 
-    def consultarRiegosDeCultivo(self, id_cultivo: str) -> RiegosSalida:
+    async def consultarRiegosDeCultivo(self, id_cultivo: str) -> RiegosSalida:
         salida = RiegosSalida(estatus="OK", mensaje="Consulta correcta", riegos=[])
         try:
             try:
@@ -226,16 +455,20 @@ class RiegosDAO:
                 salida.mensaje = "ID de cultivo inválido"
                 return salida
 
-            cultivo_doc = self.db.cultivos.find_one(
-                {"_id": obj_id_cultivo},
-                {"_id": 0, "riegos": 1}
-            )
+            # Los buckets del cultivo en orden de creación, concatenados
+            riegos_db = []
+            async for bucket in self.db.riegos_buckets.find(
+                    {"idCultivo": obj_id_cultivo}, {"_id": 0, "riegos": 1}).sort("_id", 1):
+                riegos_db.extend(bucket.get("riegos", []))
+
+            if riegos_db:
+                # Resolver los nombres de todos los usuarios referenciados en una sola consulta
+                ids_usuarios = [ObjectId(r["idUsuario"]) for r in riegos_db]
+                usuarios = await self.cargador.cargar("usuarios", ids_usuarios, ("nombre",))
 
-            if cultivo_doc and "riegos" in cultivo_doc:
                 riegos_lista = []
-                for r in cultivo_doc["riegos"]:
-                    id_usuario = str(r["idUsuario"]) if isinstance(r["idUsuario"], ObjectId) else r["idUsuario"]
-                    usuario_doc = self.db.usuarios.find_one({"_id": ObjectId(id_usuario)}, {"nombre": 1})
+                for r, id_usuario in zip(riegos_db, ids_usuarios):
+                    usuario_doc = usuarios.get(id_usuario)
                     nombre_usuario = usuario_doc["nombre"] if usuario_doc else "Desconocido"
 
                     r_copy = r.copy()
@@ -256,7 +489,7 @@ class RiegosDAO:
         return salida
 
 
-    def eliminarRiegoDeCultivo(self, id_cultivo: str, id_riego: str) -> Salida:
+    async def eliminarRiegoDeCultivo(self, id_cultivo: str, id_riego: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             try:
@@ -266,12 +499,15 @@ class RiegosDAO:
                 salida.mensaje = "ID del cultivo no válido."
                 return salida
 
-            result = self.db.cultivos.update_one(
-                {"_id": obj_id_cultivo},
-                {"$pull": {"riegos": {"idRiego": id_riego}}}
+            # El bucket queda con espacio y se vuelve a llenar con los siguientes riegos
+            anterior_doc = await self.db.riegos_buckets.find_one_and_update(
+                {"idCultivo": obj_id_cultivo, "riegos.idRiego": id_riego},
+                {"$pull": {"riegos": {"idRiego": id_riego}}, "$inc": {"conteo": -1}},
+                projection={"_id": 0, "riegos": {"$elemMatch": {"idRiego": id_riego}}}
             )
 
-            if result.modified_count == 1:
+            if anterior_doc and anterior_doc.get("riegos"):
+                await aplicarResumen(self.db, operacionesResumen(obj_id_cultivo, anterior_doc["riegos"][0], None))
                 salida.estatus = "OK"
                 salida.mensaje = f"Riego con ID '{id_riego}' eliminado físicamente del cultivo."
             else:
@@ -283,3 +519,71 @@ class RiegosDAO:
             salida.estatus = "ERROR"
             salida.mensaje = "Error interno al eliminar el riego."
         return salida
+
+
+    async def consultarResumenDeCultivo(self, id_cultivo: str, periodo: str = "mes", desde: date | None = None,
+                                        hasta: date | None = None) -> ResumenRiegosCultivoSalida:
+        salida = ResumenRiegosCultivoSalida(estatus="", mensaje="", idCultivo=id_cultivo, periodo=periodo)
+        try:
+            try:
+                obj_id_cultivo = ObjectId(id_cultivo)
+            except Exception:
+                salida.estatus = "ERROR"
+                salida.mensaje = "ID de cultivo inválido"
+                return salida
+
+            cultivos = await self.cargador.cargar("cultivos", [obj_id_cultivo], ("areaCultivo",))
+            cultivo = cultivos.get(obj_id_cultivo)
+            if not cultivo:
+                salida.estatus = "ERROR"
+                salida.mensaje = f"No se encontró un cultivo con el ID: {id_cultivo}."
+                return salida
+            salida.areaCultivo = cultivo.get("areaCultivo")
+
+            # Totales ya calculados: una lectura por índice, sin recorrer los riegos
+            filtro = {"idCultivo": obj_id_cultivo, **_filtroResumen(periodo, desde, hasta)}
+            async for doc in self.db[COLECCION_RESUMEN].find(
+                    filtro, {"_id": 0, "inicio": 1, "cantAgua": 1, "duracionRiego": 1, "riegos": 1}).sort("inicio", 1):
+                salida.periodos.append(ResumenRiegoPeriodo(
+                    inicio=doc["inicio"].date(), cantAgua=doc["cantAgua"], duracionRiego=doc["duracionRiego"],
+                    riegos=doc["riegos"], aguaPorHectarea=_porHectarea(doc["cantAgua"], salida.areaCultivo)))
+
+            salida.estatus = "OK"
+            salida.mensaje = f"Se encontraron {len(salida.periodos)} periodos con riegos aplicados."
+        except Exception as ex:
+            print(f"Error en RiegosDAO.consultarResumenDeCultivo: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al consultar el resumen de riegos."
+        return salida
+
+
+    async def consultarResumenGeneral(self, periodo: str = "mes", desde: date | None = None,
+                                      hasta: date | None = None, limite: int = LIMITE_DEFECTO) -> ResumenRiegosSalida:
+        salida = ResumenRiegosSalida(estatus="", mensaje="", periodo=periodo)
+        try:
+            # Suma por cultivo de los periodos en el rango; los de más agua primero
+            pipeline = [
+                {"$match": _filtroResumen(periodo, desde, hasta)},
+                {"$group": {"_id": "$idCultivo", "cantAgua": {"$sum": "$cantAgua"},
+                            "duracionRiego": {"$sum": "$duracionRiego"}, "riegos": {"$sum": "$riegos"}}},
+                {"$sort": {"cantAgua": -1, "_id": 1}},
+                {"$limit": limitar(limite)},
+            ]
+            totales = await self.db[COLECCION_RESUMEN].aggregate(pipeline).to_list(length=None)
+            cultivos = await self.cargador.cargar("cultivos", [t["_id"] for t in totales], ("nomCultivo", "areaCultivo"))
+
+            for total in totales:
+                cultivo = cultivos.get(total["_id"]) or {}
+                salida.cultivos.append(TotalRiegoCultivo(
+                    idCultivo=str(total["_id"]), nomCultivo=cultivo.get("nomCultivo"),
+                    areaCultivo=cultivo.get("areaCultivo"), cantAgua=total["cantAgua"],
+                    duracionRiego=total["duracionRiego"], riegos=total["riegos"],
+                    aguaPorHectarea=_porHectarea(total["cantAgua"], cultivo.get("areaCultivo"))))
+
+            salida.estatus = "OK"
+            salida.mensaje = f"Se encontraron {len(salida.cultivos)} cultivos con riegos aplicados."
+        except Exception as ex:
+            print(f"Error en RiegosDAO.consultarResumenGeneral: {ex}")
+            salida.estatus = "ERROR"
+            salida.mensaje = "Error interno al consultar el resumen de riegos."
+        return salida
@@ -1,13 +1,22 @@
+import sys
+from pathlib import Path
+
+# La carpeta App contiene el paquete compartido 'comun'
+RAIZ_APP = str(Path(__file__).resolve().parents[1])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
+
 import uvicorn
 from fastapi import FastAPI
 from dao.database import Conexion
-from rooters import cultivosRouter, usuariosRouter, riegosRouter, historial_sueloRouter, aplicacionesInsumoRouter
+from dao.indices import asegurarIndices
+from comun.instrumentacion import MedicionMiddleware
+from rooters import cultivosRouter, riegosRouters, aplicacionesInsumoRouter
 
 app=FastAPI()
+app.add_middleware(MedicionMiddleware)
 app.include_router(cultivosRouter.router)
-app.include_router(usuariosRouter.router)
-app.include_router(riegosRouter.router)
-app.include_router(historial_sueloRouter.router)
+app.include_router(riegosRouters.router)
 app.include_router(aplicacionesInsumoRouter.router)
 
 
@@ -22,6 +31,7 @@ async def startup():
     conexion=Conexion()
     app.conexion=conexion
     app.db=conexion.getDB()
+    await asegurarIndices(app.db)
 
 @app.on_event("shutdown")
 async def shutdown():
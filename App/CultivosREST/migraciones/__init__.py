@@ -0,0 +1,7 @@
+import sys
+from pathlib import Path
+
+# Las migraciones se ejecutan con 'python -m' desde la carpeta del servicio; 'comun' está en App
+RAIZ_APP = str(Path(__file__).resolve().parents[2])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
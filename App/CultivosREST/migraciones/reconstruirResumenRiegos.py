@@ -0,0 +1,27 @@
+"""
+Reconstruye por completo la colección riegos_resumen a partir de riegos_buckets.
+
+Uso (desde CultivosREST):  python -m migraciones.reconstruirResumenRiegos
+
+- Primera carga del resumen y recuperación si quedó desfasado (escrituras hechas fuera de RiegosDAO,
+  restauraciones, cargas masivas como BD/generarDatos.py).
+- El cambio de colección es atómico; las escrituras de riegos hechas mientras corre no quedan
+  reflejadas, así que conviene ejecutarlo sin escrituras.
+"""
+import asyncio
+
+from dao.database import Conexion
+from dao.resumenRiegos import reconstruirResumen
+
+
+async def main():
+    conexion = Conexion()
+    try:
+        total = await reconstruirResumen(conexion.getDB())
+        print(f"Resumen de riegos reconstruido: {total} periodos.")
+    finally:
+        conexion.cerrar()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
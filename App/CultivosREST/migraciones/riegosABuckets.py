@@ -0,0 +1,60 @@
+"""
+Mueve los riegos embebidos en cultivos.riegos a la colección riegos_buckets.
+
+Uso (desde CultivosREST):  python -m migraciones.riegosABuckets
+
+- Por cada cultivo con arreglo riegos se crean buckets de hasta RIEGOS_POR_BUCKET riegos
+  y después se quita el campo riegos del cultivo.
+- Se puede volver a ejecutar: si un cultivo quedó a medias (buckets creados pero el campo
+  riegos sigue en el cultivo), sus buckets de migración se reemplazan.
+"""
+import asyncio
+
+from bson import ObjectId
+
+from dao.database import Conexion
+from dao.riegosDAO import RIEGOS_POR_BUCKET
+
+
+async def migrar(db) -> dict:
+    resumen = {"cultivos": 0, "riegos": 0, "buckets": 0}
+    cursor = db.cultivos.find({"riegos": {"$exists": True}}, {"riegos": 1})
+    async for cultivo in cursor:
+        riegos = cultivo.get("riegos") or []
+        for riego in riegos:
+            # Los riegos de los datos de ejemplo no traen idRiego
+            riego.setdefault("idRiego", str(ObjectId()))
+
+        buckets = [
+            {
+                "idCultivo": cultivo["_id"],
+                "conteo": len(riegos[inicio:inicio + RIEGOS_POR_BUCKET]),
+                "riegos": riegos[inicio:inicio + RIEGOS_POR_BUCKET],
+                "migrado": True,
+            }
+            for inicio in range(0, len(riegos), RIEGOS_POR_BUCKET)
+        ]
+
+        await db.riegos_buckets.delete_many({"idCultivo": cultivo["_id"], "migrado": True})
+        if buckets:
+            await db.riegos_buckets.insert_many(buckets)
+        await db.cultivos.update_one({"_id": cultivo["_id"]}, {"$unset": {"riegos": ""}})
+
+        resumen["cultivos"] += 1
+        resumen["riegos"] += len(riegos)
+        resumen["buckets"] += len(buckets)
+    return resumen
+
+
+async def main():
+    conexion = Conexion()
+    try:
+        resumen = await migrar(conexion.getDB())
+        print(f"Migración completa: {resumen['riegos']} riegos de {resumen['cultivos']} cultivos "
+              f"en {resumen['buckets']} buckets.")
+    finally:
+        conexion.cerrar()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,47 @@
+"""
+Agrega ubicacion.geo (punto GeoJSON) a los cultivos que solo tienen ubicacion.coordenadas.
+
+Uso (desde CultivosREST):  python -m migraciones.ubicacionesGeo
+
+- Una sola actualización en el servidor: el punto se arma con las mismas coordenadas del documento.
+- Los cultivos con coordenadas fuera de rango no se tocan; se reportan para corregirlos a mano.
+- Se puede volver a ejecutar: solo toca los cultivos que aún no tienen ubicacion.geo.
+- Al final crea el índice 2dsphere si falta.
+"""
+import asyncio
+
+from dao.database import Conexion
+from dao.indices import asegurarIndices
+
+SIN_PUNTO = {"ubicacion.coordenadas.latitud": {"$type": "number"},
+             "ubicacion.coordenadas.longitud": {"$type": "number"},
+             "ubicacion.geo": {"$exists": False}}
+EN_RANGO = {"ubicacion.coordenadas.latitud": {"$gte": -90, "$lte": 90},
+            "ubicacion.coordenadas.longitud": {"$gte": -180, "$lte": 180}}
+
+
+async def migrar(db) -> dict:
+    resultado = await db.cultivos.update_many(
+        {"$and": [SIN_PUNTO, EN_RANGO]},
+        [{"$set": {"ubicacion.geo": {
+            "type": "Point",
+            "coordinates": ["$ubicacion.coordenadas.longitud", "$ubicacion.coordenadas.latitud"],
+        }}}],
+    )
+    fuera_de_rango = await db.cultivos.count_documents(SIN_PUNTO)
+    await asegurarIndices(db)
+    return {"actualizados": resultado.modified_count, "fueraDeRango": fuera_de_rango}
+
+
+async def main():
+    conexion = Conexion()
+    try:
+        resumen = await migrar(conexion.getDB())
+        print(f"Migración completa: {resumen['actualizados']} cultivos con ubicacion.geo; "
+              f"{resumen['fueraDeRango']} con coordenadas fuera de rango sin migrar.")
+    finally:
+        conexion.cerrar()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
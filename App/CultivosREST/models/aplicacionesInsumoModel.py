@@ -47,3 +47,16 @@ class AplicacionInsumoDetalle(BaseModel):
 
 class AplicacionInsumoListSalida(Salida):
     aplicaciones: list[AplicacionInsumoDetalle] | None = None
+
+#------------------------------------------------------
+class ConsumoInsumoPeriodo(BaseModel):
+    idInsumo: str
+    nombreInsumo: str | None = None
+    unidadMedida: str | None = None
+    inicio: date                    # primer día del periodo
+    consumo: float                  # aplicado menos lo compensado (ediciones y eliminaciones)
+    movimientos: int
+
+class ConsumoInsumosSalida(Salida):
+    periodo: str
+    consumos: list[ConsumoInsumoPeriodo] = []
@@ -40,6 +40,7 @@ class CultivoSalidaIndividual(Salida):
 #--------------------------------------------------
 class CultivosListSalida(Salida):
     cultivos: list[CultivoSelect] = []
+    siguiente: str | None = None
 
 #--------------------------------------------------
 class Coordenadas(BaseModel):
@@ -79,6 +80,22 @@ class UbicacionSubConsulta(UbicacionInsert):
 class UbicacionSalidaIndividual(Salida):
     ubicacion: UbicacionSubConsulta | None = None
 
+#-------------------------------------------------
+class PoligonoConsulta(BaseModel):
+    vertices: list[Coordenadas]  # Al menos 3; el anillo se cierra solo si el último no repite al primero
+
+class CultivoUbicado(BaseModel):
+    idCultivo: str
+    nomCultivo: str
+    estadoActual: str | None = None
+    nombreUbicacion: str | None = None
+    coordenadas: Coordenadas
+    distanciaKm: float | None = None  # Solo en la búsqueda por cercanía
+
+class CultivosUbicadosSalida(Salida):
+    cultivos: list[CultivoUbicado] = []
+    siguiente: str | None = None
+
 #-------------------------------------------------
 class SeguimientoInsert(BaseModel):
     fechaRevision: date
@@ -36,3 +36,53 @@ class RiegosSalida(BaseModel):
     estatus: str
     mensaje: str
     riegos: List[RiegoConsulta]
+
+# Modelos para el registro por lote (varios cultivos en una sola petición)
+class RiegoLoteNuevo(RiegoInsert):
+    idCultivo: str
+
+class RiegoLoteActualizacion(RiegoParcialUpdate):
+    idCultivo: str
+    idRiego: str
+
+class RiegosLoteInsert(BaseModel):
+    nuevos: List[RiegoLoteNuevo] = []
+    actualizaciones: List[RiegoLoteActualizacion] = []
+
+class ResultadoLoteRiego(BaseModel):
+    indice: int                                     # posición dentro de 'nuevos' o 'actualizaciones'
+    operacion: Literal["nuevo", "actualizacion"]
+    idCultivo: str
+    idRiego: Optional[str] = None
+    estatus: str
+    mensaje: str
+
+class RiegosLoteSalida(Salida):
+    resultados: List[ResultadoLoteRiego] = []
+
+# Modelos del resumen de agua (colección riegos_resumen)
+class ResumenRiegoPeriodo(BaseModel):
+    inicio: date                            # primer día del periodo
+    cantAgua: float
+    duracionRiego: float
+    riegos: int
+    aguaPorHectarea: Optional[float] = None
+
+class ResumenRiegosCultivoSalida(Salida):
+    idCultivo: str
+    periodo: Literal["dia", "mes"]
+    areaCultivo: Optional[float] = None
+    periodos: List[ResumenRiegoPeriodo] = []
+
+class TotalRiegoCultivo(BaseModel):
+    idCultivo: str
+    nomCultivo: Optional[str] = None
+    areaCultivo: Optional[float] = None
+    cantAgua: float
+    duracionRiego: float
+    riegos: int
+    aguaPorHectarea: Optional[float] = None
+
+class ResumenRiegosSalida(Salida):
+    periodo: Literal["dia", "mes"]
+    cultivos: List[TotalRiegoCultivo] = []
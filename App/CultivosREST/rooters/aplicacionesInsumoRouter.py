@@ -1,33 +1,15 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
 from bson import ObjectId
 from models.aplicacionesInsumoModel import (
     AplicacionInsumoInsert, AplicacionInsumoUpdate,
-    AplicacionInsumoSalidaIndividual, AplicacionInsumoListSalida)
+    AplicacionInsumoSalidaIndividual, AplicacionInsumoListSalida, ConsumoInsumosSalida)
 from models.cultivosModel import Salida
 from dao.aplicacionesInsumoDAO import AplicacionesInsumoDAO
-
-# Importaciones para la seguridad
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from models.usuariosModel import UsuarioDetalleSalida
-from dao.usuariosDAO import UsuarioDAO as UsuarioAuthDAO
-
-security = HTTPBasic()
-
-async def validarUsuario(request: Request,
-                         credenciales: HTTPBasicCredentials = Depends(security)) -> UsuarioDetalleSalida:
-    usuario_dao = UsuarioAuthDAO(request.app.db)
-    resultado_login = usuario_dao.iniciar_sesion(credenciales.username, credenciales.password)
-    if resultado_login.estatus != "OK" or not resultado_login.usuario:
-        raise HTTPException(
-            status_code=401,
-            detail="Credenciales incorrectas o usuario no encontrado",
-            headers={"WWW-Authenticate": "Basic"},)
-    if not isinstance(resultado_login.usuario, dict):
-        pass
-    return resultado_login
-
-
-# --- Fin de la sección de Seguridad ---
+from dao.referencias import obtenerCargador
+from comun.paginacion import LIMITE_MAXIMO
+from comun.seguridad.autenticacion import SesionUsuario, validarUsuario
 
 router = APIRouter(prefix="/aplicacionInsumos", tags=["Aplicaciones de Insumo"])
 
@@ -36,12 +18,12 @@ async def registrar_aplicacion_insumo(
         id_cultivo: str,
         insumo_data: AplicacionInsumoInsert,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para registrar esta aplicación de insumo.")
-    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db)
-    resultado = aplicacion_insumo_dao.registrarAplicacionInsumo(id_cultivo, insumo_data)
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.registrarAplicacionInsumo(id_cultivo, insumo_data)
     return resultado
 
 
@@ -52,12 +34,12 @@ async def editar_aplicacion_insumo(
         id_aplicacionInsumo: str,
         insumo_data: AplicacionInsumoUpdate,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para editar esta aplicación de insumo.")
-    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db)
-    resultado = aplicacion_insumo_dao.editarAplicacionInsumo(id_cultivo, id_aplicacionInsumo, insumo_data)
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.editarAplicacionInsumo(id_cultivo, id_aplicacionInsumo, insumo_data)
     return resultado
 
 
@@ -67,12 +49,12 @@ async def eliminar_aplicacion_insumo(
         id_cultivo: str,
         id_aplicacionInsumo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario != "Administrador":
         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar esta aplicación de insumo.")
-    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db)
-    resultado = aplicacion_insumo_dao.eliminarAplicacionInsumo(id_cultivo, id_aplicacionInsumo)
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.eliminarAplicacionInsumo(id_cultivo, id_aplicacionInsumo)
     return resultado
 
 
@@ -82,12 +64,12 @@ async def consultar_aplicacion_insumo(
         id_cultivo: str,
         id_aplicacionInsumo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> AplicacionInsumoSalidaIndividual:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> AplicacionInsumoSalidaIndividual:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Agricultor", "Agricultor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para consultar esta aplicación de insumo.")
-    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db)
-    resultado = aplicacion_insumo_dao.consultarAplicacionInsumo(id_cultivo, id_aplicacionInsumo)
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.consultarAplicacionInsumo(id_cultivo, id_aplicacionInsumo)
     return resultado
 
 
@@ -96,11 +78,33 @@ async def consultar_aplicacion_insumo(
 async def get_lista_aplicacion_insumo_cultivo(
         id_cultivo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> AplicacionInsumoListSalida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> AplicacionInsumoListSalida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Agricultor", "Supervisor"]:
         raise HTTPException(status_code=403,
                             detail="No tiene permisos para consultar esta lista de aplicaciones de insumo.")
-    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db)
-    resultado = aplicacion_insumo_dao.consultarListaAplicacionInsumo(id_cultivo)
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.consultarListaAplicacionInsumo(id_cultivo)
+    return resultado
+
+
+@router.get("/consumo", response_model=ConsumoInsumosSalida,
+            summary="Consumo de insumos por día o por mes")
+async def consultar_consumo_insumos(
+        request: Request,
+        periodo: Literal["dia", "mes"] = "mes",
+        desde: Optional[date] = None,
+        hasta: Optional[date] = None,
+        idInsumo: Optional[str] = None,
+        limite: int = Query(LIMITE_MAXIMO, ge=1, le=LIMITE_MAXIMO),
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> ConsumoInsumosSalida:
+    """
+    - Sale de la bitácora insumos_movimientos; las ediciones y eliminaciones ya vienen compensadas.
+    - El consumo se asigna a la fecha de cada aplicación.
+    """
+    rol_usuario = usuario_actual.usuario['rol']
+    if rol_usuario not in ["Administrador", "Supervisor"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para consultar el consumo de insumos.")
+    aplicacion_insumo_dao = AplicacionesInsumoDAO(request.app.db, obtenerCargador(request))
+    resultado = await aplicacion_insumo_dao.consultarConsumoInsumos(periodo, desde, hasta, idInsumo, limite)
     return resultado
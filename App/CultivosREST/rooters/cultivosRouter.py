@@ -1,30 +1,17 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
+import asyncio
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Optional
 from bson import ObjectId
 from models.cultivosModel import (CultivoInsert, Salida, CultivoUpdate, CultivoSalidaIndividual, CultivosListSalida,
-    UbicacionInsert, UbicacionUpdate, UbicacionSalidaIndividual,
+    UbicacionInsert, UbicacionUpdate, UbicacionSalidaIndividual, PoligonoConsulta, CultivosUbicadosSalida,
     SeguimientoInsert, SeguimientoUpdate, SeguimientoSalidaIndividual, SeguimientoListSalida)
 from dao.cultivosDAO import CultivoDAO
-
-# Importaciones para la seguridad
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from models.usuariosModel import UsuarioDetalleSalida
-from dao.usuariosDAO import UsuarioDAO as UsuarioAuthDAO
-
-security = HTTPBasic()
-
-async def validarUsuario(request: Request,
-                         credenciales: HTTPBasicCredentials = Depends(security)) -> UsuarioDetalleSalida:
-    usuario_dao = UsuarioAuthDAO(request.app.db)
-    resultado_login = usuario_dao.iniciar_sesion(credenciales.username, credenciales.password)
-    if resultado_login.estatus != "OK" or not resultado_login.usuario:
-        raise HTTPException(
-            status_code=401,
-            detail="Credenciales incorrectas o usuario no encontrado",
-            headers={"WWW-Authenticate": "Basic"},)
-    return resultado_login
-
-
-# --- Fin de la sección de Seguridad ---
+from dao.referencias import obtenerCargador
+from comun.paginacion import LIMITE_DEFECTO, LIMITE_MAXIMO
+from comun.serializacion import respuestaRapida
+from comun.versiones import CLAVE_USUARIOS, etiquetaFuerte, coincideEtiqueta, noModificado, versionGlobal
+from comun.seguridad.autenticacion import SesionUsuario, validarUsuario
 
 router = APIRouter(prefix="/cultivos")
 
@@ -36,9 +23,9 @@ router = APIRouter(prefix="/cultivos")
 async def registrar_cultivo(
         cultivo_data: CultivoInsert,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.agregarCultivo(cultivo_data)
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.agregarCultivo(cultivo_data)
     return resultado
 
 
@@ -47,12 +34,12 @@ async def editar_cultivo(
         id_cultivo: str,
         cultivo_update_data: CultivoUpdate,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para editar este cultivo.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.actualizarCultivo(id_cultivo, cultivo_update_data)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.actualizarCultivo(id_cultivo, cultivo_update_data)
     return resultado
 
 
@@ -60,11 +47,11 @@ async def editar_cultivo(
 async def eliminar_cultivo(
         id_cultivo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     if usuario_actual.usuario['rol'] != "Administrador":
         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar cultivos.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.borrarCultivo(id_cultivo)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.borrarCultivo(id_cultivo)
     return resultado
 
 
@@ -72,25 +59,94 @@ async def eliminar_cultivo(
 async def consultar_cultivo(
         id_cultivo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> CultivoSalidaIndividual:
+        response: Response,
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> CultivoSalidaIndividual:
     # Todos los roles permitidos, no se necesita chequeo específico de rol.
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.consultarCultivoPorId(id_cultivo)
+    # ETag por versión del cultivo: con If-None-Match igual se responde 304 sin armar la respuesta.
+    # La respuesta trae nombreUsuario, así que también depende de la versión de usuarios
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    version, version_usuarios = await asyncio.gather(cultivo_dao.versionCultivo(id_cultivo),
+                                                     versionGlobal(request.app.db, CLAVE_USUARIOS))
+    if version is not None:
+        etiqueta = etiquetaFuerte("cultivo", id_cultivo, *version, version_usuarios)
+        if coincideEtiqueta(request, etiqueta):
+            return noModificado(etiqueta)
+        response.headers["ETag"] = etiqueta
+    resultado = await cultivo_dao.consultarCultivoPorId(id_cultivo)
     return resultado
 
 
 @router.get("/", response_model=CultivosListSalida, summary="Consultar lista de todos los cultivos", tags=["Cultivos"])
 async def consultar_lista_cultivos(
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> CultivosListSalida:
+        limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+        cursor: Optional[str] = None,
+        rapido: bool = Query(False, description="Omite la revalidación de pydantic y serializa con orjson; misma forma de respuesta"),
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> CultivosListSalida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para ver la lista de todos los cultivos.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.consultarListaDeCultivos()
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.consultarListaDeCultivos(limite, cursor, rapido)
+    if rapido:
+        return respuestaRapida(resultado)
     return resultado
 
 
+@router.get("/exportar", summary="Exportar todos los cultivos activos en NDJSON", tags=["Cultivos"])
+async def exportar_cultivos(
+        request: Request,
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> StreamingResponse:
+    """
+    - Un cultivo activo por línea, con sus riegos, aplicaciones de insumo y ubicación.
+    - Se transmite directamente desde el cursor de MongoDB por lotes.
+    """
+    rol_usuario = usuario_actual.usuario['rol']
+    if rol_usuario not in ["Administrador", "Supervisor"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para exportar los cultivos.")
+    cultivo_dao = CultivoDAO(request.app.db)
+    return StreamingResponse(cultivo_dao.exportarCultivos(), media_type="application/x-ndjson")
+
+
+@router.get("/cercanos", response_model=CultivosUbicadosSalida, summary="Cultivos a menos de N km de un punto",
+            tags=["Ubicacion Cultivos"])
+async def consultar_cultivos_cercanos(
+        request: Request,
+        latitud: float = Query(..., ge=-90, le=90),
+        longitud: float = Query(..., ge=-180, le=180),
+        km: float = Query(..., gt=0, le=20000, description="Radio de búsqueda en kilómetros"),
+        limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> CultivosUbicadosSalida:
+    """
+    - Ordenados del más cercano al más lejano, con la distancia en km.
+    - Usa el índice 2dsphere de ubicacion.geo; los cultivos sin ubicación no aparecen.
+    """
+    rol_usuario = usuario_actual.usuario['rol']
+    if rol_usuario not in ["Administrador", "Supervisor"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para buscar cultivos por ubicación.")
+    cultivo_dao = CultivoDAO(request.app.db)
+    return await cultivo_dao.consultarCultivosCercanos(latitud, longitud, km, limite)
+
+
+@router.post("/poligono", response_model=CultivosUbicadosSalida, summary="Cultivos dentro de un polígono",
+             tags=["Ubicacion Cultivos"])
+async def consultar_cultivos_en_poligono(
+        poligono: PoligonoConsulta,
+        request: Request,
+        limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+        cursor: Optional[str] = None,
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> CultivosUbicadosSalida:
+    """
+    - Los vértices van en orden (latitud, longitud); el polígono se cierra solo.
+    - Paginado por cursor, en orden de _id.
+    """
+    rol_usuario = usuario_actual.usuario['rol']
+    if rol_usuario not in ["Administrador", "Supervisor"]:
+        raise HTTPException(status_code=403, detail="No tiene permisos para buscar cultivos por ubicación.")
+    cultivo_dao = CultivoDAO(request.app.db)
+    return await cultivo_dao.consultarCultivosEnPoligono(poligono.vertices, limite, cursor)
+
+
 # --- Endpoints para Ubicación de Cultivos ---
 
 @router.post("/{id_cultivo}/ubicacion/agregar", response_model=Salida, tags=["Ubicacion Cultivos"],
@@ -99,12 +155,12 @@ async def registrar_ubicacion_cultivo(
         id_cultivo: str,
         ubicacion_data: UbicacionInsert,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para editar la ubicación del cultivo.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.registrarNuevaUbicacion(id_cultivo, ubicacion_data)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.registrarNuevaUbicacion(id_cultivo, ubicacion_data)
     return resultado
 
 
@@ -114,12 +170,12 @@ async def editar_ubicacion_cultivo(
         id_cultivo: str,
         ubicacion_data: UbicacionUpdate,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para editar la ubicación del cultivo.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.actualizarUbicacionCultivo(id_cultivo, ubicacion_data)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.actualizarUbicacionCultivo(id_cultivo, ubicacion_data)
     return resultado
 
 
@@ -128,10 +184,17 @@ async def editar_ubicacion_cultivo(
 async def consultar_ubicacion_cultivo(
         id_cultivo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> UbicacionSalidaIndividual:
+        response: Response,
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> UbicacionSalidaIndividual:
     # Todos los roles permitidos.
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.consultarUbicacionDeCultivo(id_cultivo)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    version = await cultivo_dao.versionCultivo(id_cultivo)
+    if version is not None:
+        etiqueta = etiquetaFuerte("ubicacion", id_cultivo, *version)
+        if coincideEtiqueta(request, etiqueta):
+            return noModificado(etiqueta)
+        response.headers["ETag"] = etiqueta
+    resultado = await cultivo_dao.consultarUbicacionDeCultivo(id_cultivo)
     return resultado
 
 
@@ -143,9 +206,9 @@ async def registrar_seguimiento_cultivo(
         id_cultivo: str,
         seguimiento_data: SeguimientoInsert,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.agregar_seguimiento(id_cultivo, seguimiento_data)
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.agregar_seguimiento(id_cultivo, seguimiento_data)
     return resultado
 
 
@@ -156,9 +219,9 @@ async def editar_seguimiento_cultivo(
         id_seguimiento: str,
         seguimiento_data: SeguimientoUpdate,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.editar_seguimiento(id_cultivo, id_seguimiento, seguimiento_data)
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.editar_seguimiento(id_cultivo, id_seguimiento, seguimiento_data)
     return resultado
 
 
@@ -168,12 +231,12 @@ async def eliminar_seguimiento_cultivo(
         id_cultivo: str,
         id_seguimiento: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> Salida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para eliminar este seguimiento.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.eliminar_seguimiento(id_cultivo, id_seguimiento)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.eliminar_seguimiento(id_cultivo, id_seguimiento)
     return resultado
 
 
@@ -183,10 +246,10 @@ async def consultar_seguimiento_especifico_cultivo(
         id_cultivo: str,
         id_seguimiento: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> SeguimientoSalidaIndividual:
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> SeguimientoSalidaIndividual:
     # Todos los roles permitidos.
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.consultar_seguimiento_por_id(id_cultivo, id_seguimiento)
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    resultado = await cultivo_dao.consultar_seguimiento_por_id(id_cultivo, id_seguimiento)
     return resultado
 
 
@@ -195,10 +258,21 @@ async def consultar_seguimiento_especifico_cultivo(
 async def consultar_lista_seguimiento(
         id_cultivo: str,
         request: Request,
-        usuario_actual: UsuarioDetalleSalida = Depends(validarUsuario)) -> SeguimientoListSalida:
+        response: Response,
+        usuario_actual: SesionUsuario = Depends(validarUsuario)) -> SeguimientoListSalida:
     rol_usuario = usuario_actual.usuario['rol']
     if rol_usuario not in ["Administrador", "Supervisor"]:
         raise HTTPException(status_code=403, detail="No tiene permisos para ver esta lista de seguimientos.")
-    cultivo_dao = CultivoDAO(request.app.db)
-    resultado = cultivo_dao.consultarListaSeguimiento(id_cultivo)
+    # El listado incluye el nombre del cultivo y el de quien registró cada seguimiento:
+    # depende de ambas versiones del cultivo y de la de usuarios
+    cultivo_dao = CultivoDAO(request.app.db, obtenerCargador(request))
+    version, version_usuarios = await asyncio.gather(
+        cultivo_dao.versionCultivo(id_cultivo, "version", "versionSeguimientos"),
+        versionGlobal(request.app.db, CLAVE_USUARIOS))
+    if version is not None:
+        etiqueta = etiquetaFuerte("seguimientos", id_cultivo, *version, version_usuarios)
+        if coincideEtiqueta(request, etiqueta):
+            return noModificado(etiqueta)
+        response.headers["ETag"] = etiqueta
+    resultado = await cultivo_dao.consultarListaSeguimiento(id_cultivo)
     return resultado
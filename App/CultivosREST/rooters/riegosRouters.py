@@ -1,75 +1,137 @@
-from fastapi import APIRouter, HTTPException, Body, Request
+from datetime import date
+from typing import Literal, Optional
+from fastapi import APIRouter, HTTPException, Body, Request, Query
 from dao.riegosDAO import RiegosDAO
+from dao.referencias import obtenerCargador
+from comun.paginacion import LIMITE_DEFECTO, LIMITE_MAXIMO
 from models.riegosModel import (
     RiegoConsulta,
     RiegoConsultaIndividual,
     RiegoInsert,
     RiegoParcialUpdate,
     RiegosSalida,
+    RiegosLoteInsert,
+    RiegosLoteSalida,
+    ResumenRiegosCultivoSalida,
+    ResumenRiegosSalida,
     Salida
 )
 
 router = APIRouter(prefix="/riegos", tags=["Riegos"])
 
 @router.post("/registrar/{id_cultivo}", response_model=Salida)
-def registrar_riego(
+async def registrar_riego(
     request: Request,
     id_cultivo: str,
     riego: RiegoInsert = Body(...)
 ):
-    dao = RiegosDAO(request.app.db)
-    salida = dao.registrarNuevoRiego(id_cultivo, riego)
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.registrarNuevoRiego(id_cultivo, riego)
     if salida.estatus == "ERROR":
         raise HTTPException(status_code=400, detail=salida.mensaje)
     return salida
 
 
 @router.put("/actualizar/{id_cultivo}/{id_riego}", response_model=Salida)
-def actualizar_riego(
+async def actualizar_riego(
     request: Request,
     id_cultivo: str,
     id_riego: str,
     riego_data: RiegoParcialUpdate = Body(...)
 ):
-    dao = RiegosDAO(request.app.db)
-    salida = dao.actualizarRiegoDeCultivo(id_cultivo, id_riego, riego_data)
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.actualizarRiegoDeCultivo(id_cultivo, id_riego, riego_data)
     if salida.estatus == "ERROR":
         raise HTTPException(status_code=400, detail=salida.mensaje)
     return salida
 
 
+@router.post("/lote", response_model=RiegosLoteSalida)
+async def registrar_lote_riegos(
+    request: Request,
+    lote: RiegosLoteInsert = Body(...)
+):
+    """
+    - Riegos nuevos y cambios (p. ej. status Pendiente -> Aplicado) de varios cultivos en una sola petición.
+    - Se aplican todos los elementos válidos; 'resultados' indica el estado de cada uno.
+    """
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.registrarLote(lote)
+    if salida.estatus == "ERROR" and not salida.resultados:
+        raise HTTPException(status_code=400, detail=salida.mensaje)
+    return salida
+
+
 # Cambié el endpoint a DELETE y llamo a eliminación física
 @router.delete("/eliminar/{id_cultivo}/{id_riego}", response_model=Salida)
-def eliminar_riego(
+async def eliminar_riego(
     request: Request,
     id_cultivo: str,
     id_riego: str
 ):
-    dao = RiegosDAO(request.app.db)
-    salida = dao.eliminarRiegoDeCultivo(id_cultivo, id_riego)
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.eliminarRiegoDeCultivo(id_cultivo, id_riego)
     if salida.estatus == "ERROR":
         raise HTTPException(status_code=400, detail=salida.mensaje)
     return salida
 
 
 @router.get("/detalle/{id_cultivo}/{id_riego}", response_model=RiegoConsultaIndividual)
-def obtener_riego_por_id(
+async def obtener_riego_por_id(
     request: Request,
     id_cultivo: str,
     id_riego: str
 ):
-    dao = RiegosDAO(request.app.db)
-    salida = dao.consultarRiegoDeCultivoPorId(id_cultivo, id_riego)
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.consultarRiegoDeCultivoPorId(id_cultivo, id_riego)
     if salida.estatus == "ERROR":
         raise HTTPException(status_code=404, detail=salida.mensaje)
     return salida
 
 
 @router.get("/listar/{id_cultivo}", response_model=RiegosSalida)
-def obtener_riegos_activos(
+async def obtener_riegos_activos(
     request: Request,
     id_cultivo: str
 ):
-    dao = RiegosDAO(request.app.db)
-    salida = dao.consultarRiegosDeCultivo(id_cultivo)
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.consultarRiegosDeCultivo(id_cultivo)
+    return salida
+
+
+@router.get("/resumen", response_model=ResumenRiegosSalida)
+async def resumen_riegos_general(
+    request: Request,
+    periodo: Literal["dia", "mes"] = "mes",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO)
+):
+    """
+    - Agua aplicada por cultivo en el rango, con agua por hectárea (areaCultivo); los de más agua primero.
+    - desde y hasta se redondean al inicio de su periodo.
+    """
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.consultarResumenGeneral(periodo, desde, hasta, limite)
+    if salida.estatus == "ERROR":
+        raise HTTPException(status_code=400, detail=salida.mensaje)
+    return salida
+
+
+@router.get("/resumen/{id_cultivo}", response_model=ResumenRiegosCultivoSalida)
+async def resumen_riegos_cultivo(
+    request: Request,
+    id_cultivo: str,
+    periodo: Literal["dia", "mes"] = "mes",
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None
+):
+    """
+    - Agua y duración aplicadas por día o por mes, con agua por hectárea (areaCultivo).
+    - Sale de riegos_resumen, que se mantiene en cada escritura de riegos.
+    """
+    dao = RiegosDAO(request.app.db, obtenerCargador(request))
+    salida = await dao.consultarResumenDeCultivo(id_cultivo, periodo, desde, hasta)
+    if salida.estatus == "ERROR":
+        raise HTTPException(status_code=404, detail=salida.mensaje)
     return salida
@@ -1,23 +1,125 @@
 from bson import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
 from models.historial_sueloModels import *
 from datetime import datetime, date
+from comun.paginacion import LIMITE_DEFECTO, limitar, filtroDesdeClave, cortarPagina
+from comun.serializacion import filasConfiables
+from comun.versiones import conActualizacion
+from comun.instrumentacion import medirMetodos
 
+# Unidades aceptadas por la tendencia -> unidad de $dateTrunc
+UNIDADES_TENDENCIA = {"dia": "day", "semana": "week", "mes": "month"}
+
+# Carga por lote (NDJSON)
+TAMANO_LOTE_INSERCION = 1000
+MAX_BYTES_LINEA = 64 * 1024
+MAX_RECHAZOS_REPORTADOS = 1000
+
+
+async def _lineasNDJSON(flujo):
+    # (número de línea, bytes) a partir de los trozos del cuerpo; solo se guarda la línea incompleta
+    pendiente = b""
+    numero = 0
+    descartando = False
+    async for trozo in flujo:
+        pendiente += trozo
+        *completas, pendiente = pendiente.split(b"\n")
+        for linea in completas:
+            numero += 1
+            if descartando or len(linea) > MAX_BYTES_LINEA:
+                # También si la línea completa llegó en un solo trozo
+                descartando = False
+                yield numero, None
+            else:
+                yield numero, linea
+        if len(pendiente) > MAX_BYTES_LINEA:
+            # Línea demasiado larga: se descarta lo acumulado hasta el siguiente salto de línea
+            descartando = True
+            pendiente = b""
+    if pendiente or descartando:
+        yield numero + 1, None if descartando else pendiente
+
+@medirMetodos
 class HistorialSueloDAO:
+    """
+    historial_suelo es una colección de series de tiempo (timeField fechaMedicion, metaField idCultivo).
+    Editar y borrar mediciones sobre campos que no son el metaField requiere MongoDB 7.0 o superior;
+    con servidores anteriores dao/indices.py la deja como colección normal y estas operaciones funcionan igual.
+    """
     def __init__(self, db):
         self.db = db
         self.coleccion = db["historial_suelo"]
 
-    def registrar(self, historial_suelo: HistorialSueloInsert) -> Salida:
-        nuevo = historial_suelo.dict()
-        nuevo["fechaMedicion"] = datetime.combine(historial_suelo.fechaMedicion, datetime.min.time())
-        resultado = self.coleccion.insert_one(nuevo)
+    async def registrar(self, historial_suelo: HistorialSueloInsert) -> Salida:
+        nuevo = self._documento(historial_suelo)
+        resultado = await self.coleccion.insert_one(nuevo)
 
         if not resultado.inserted_id:
             return Salida(mensaje="Error al registrar historial de suelo", success=False, estatus=400)
 
         return Salida(mensaje="Historial de suelo registrado exitosamente", success=True, estatus=201)
 
-    def editar(self, idHistorial: str, datos: HistorialSueloUpdate) -> Salida:
+    @staticmethod
+    def _documento(historial_suelo: HistorialSueloInsert) -> dict:
+        nuevo = historial_suelo.dict()
+        nuevo["fechaMedicion"] = datetime.combine(historial_suelo.fechaMedicion, datetime.min.time())
+        return conActualizacion(nuevo)
+
+    async def registrarLote(self, flujo) -> LoteHistorialSalida:
+        """
+        Inserta mediciones recibidas como NDJSON (un HistorialSueloInsert por línea).
+        - Cada línea se valida al llegar; las válidas se insertan por tramos con insert_many(ordered=False).
+        - En memoria solo queda un tramo pendiente y la línea incompleta, nunca el cuerpo completo.
+        - Las líneas rechazadas se reportan con su número (las vacías se ignoran).
+        """
+        salida = LoteHistorialSalida(mensaje="", success=True, estatus=200)
+
+        def rechazar(numero: int, error: str):
+            salida.totalRechazadas += 1
+            if len(salida.rechazadas) < MAX_RECHAZOS_REPORTADOS:
+                salida.rechazadas.append(LineaRechazada(linea=numero, error=error))
+
+        async def insertar(tramo: list):
+            documentos = [doc for _, doc in tramo]
+            try:
+                resultado = await self.coleccion.insert_many(documentos, ordered=False)
+                salida.insertadas += len(resultado.inserted_ids)
+            except BulkWriteError as ex:
+                errores = ex.details.get("writeErrors", [])
+                salida.insertadas += ex.details.get("nInserted", 0)
+                for error in errores:
+                    rechazar(tramo[error["index"]][0], f"No se pudo insertar: {error.get('errmsg', '')}")
+            tramo.clear()
+
+        tramo = []
+        async for numero, linea in _lineasNDJSON(flujo):
+            salida.lineas = numero
+            if linea is None:
+                rechazar(numero, f"La línea excede {MAX_BYTES_LINEA} bytes.")
+                continue
+            if not linea.strip():
+                continue
+            try:
+                historial_suelo = HistorialSueloInsert.model_validate_json(linea)
+            except ValidationError as ex:
+                primero = ex.errors()[0]
+                campo = ".".join(str(p) for p in primero.get("loc", ())) or "línea"
+                rechazar(numero, f"{campo}: {primero.get('msg', 'inválido')}")
+                continue
+            tramo.append((numero, self._documento(historial_suelo)))
+            if len(tramo) >= TAMANO_LOTE_INSERCION:
+                await insertar(tramo)
+        if tramo:
+            await insertar(tramo)
+
+        salida.mensaje = f"Se insertaron {salida.insertadas} mediciones; {salida.totalRechazadas} líneas rechazadas."
+        if salida.insertadas == 0 and salida.totalRechazadas:
+            salida.success = False
+            salida.estatus = 400
+        return salida
+
+    async def editar(self, idHistorial: str, datos: HistorialSueloUpdate) -> Salida:
         try:
             filtro = {"_id": ObjectId(idHistorial)}
         except Exception:
@@ -30,54 +132,81 @@ class HistorialSueloDAO:
                     v = datetime.combine(v, datetime.min.time())
                 datos_actualizados[k] = v
 
-        resultado = self.coleccion.update_one(filtro, {"$set": datos_actualizados})
+        resultado = await self.coleccion.update_one(filtro, {"$set": conActualizacion(datos_actualizados)})
         if resultado.matched_count == 0:
             return Salida(mensaje="Historial no encontrado", success=False, estatus=404)
 
         return Salida(mensaje="Actualizado correctamente", success=True, estatus=200)
 
-    def borrar(self, idHistorial: str) -> Salida:
+    async def borrar(self, idHistorial: str) -> Salida:
         try:
             filtro = {"_id": ObjectId(idHistorial)}
         except Exception:
             return Salida(mensaje="ID inválido", success=False, estatus=400)
 
-        resultado = self.coleccion.update_one(filtro, {"$set": {"eliminado": True}})
+        resultado = await self.coleccion.update_one(filtro, {"$set": conActualizacion({"eliminado": True})})
         if resultado.matched_count == 0:
             return Salida(mensaje="Historial no encontrado", success=False, estatus=404)
 
         return Salida(mensaje="Historial eliminado lógicamente", success=True, estatus=200)
 
-    def consultar_lista(self) -> HistorialSueloSalida:
-        lista = []
-        for h in self.coleccion.find({"eliminado": False}):
-            nombre_cultivo = self.db.cultivos.find_one({"_id": ObjectId(h["idCultivo"])}, {"nomCultivo": 1})
-            nombre_usuario = self.db.usuarios.find_one({"_id": ObjectId(h["idUsuario"])}, {"nombre": 1})
-
-            historial_detalle = HistorialSueloDetalle(
-                idHistorial=str(h["_id"]),
-                fechaMedicion=h["fechaMedicion"],
-                pH=h["pH"],
-                nutrientes=h["nutrientes"],
-                observaciones=h["observaciones"],
-                idCultivo=nombre_cultivo.get("nomCultivo", "Desconocido") if nombre_cultivo else "Desconocido",
-                idUsuario=nombre_usuario.get("nombre", "Desconocido") if nombre_usuario else "Desconocido"
-            )
-            lista.append(historial_detalle)
-        return HistorialSueloSalida(historiales=lista)
+    @staticmethod
+    def _lookupNombre(coleccion: str, campo_id: str, campo_nombre: str, alias: str) -> dict:
+        # Une el documento referenciado por campo_id (string con ObjectId) y trae solo su nombre
+        return {
+            "$lookup": {
+                "from": coleccion,
+                "let": {"ref": {"$convert": {"input": f"${campo_id}", "to": "objectId",
+                                             "onError": None, "onNull": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$ref"]}}},
+                    {"$project": {"_id": 0, campo_nombre: 1}},
+                ],
+                "as": alias,
+            }
+        }
+
+    async def consultar_lista(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None,
+                              rapido: bool = False) -> HistorialSueloSalida:
+        # Una sola agregación: se corta la página por (fechaMedicion, _id) y los nombres se unen en el servidor
+        limite = limitar(limite)
+        pipeline = [
+            {"$match": filtroDesdeClave(cursor, ("fechaMedicion", "_id"), {"eliminado": False})},
+            {"$sort": {"fechaMedicion": 1, "_id": 1}},
+            {"$limit": limite + 1},
+            self._lookupNombre("cultivos", "idCultivo", "nomCultivo", "cultivo"),
+            self._lookupNombre("usuarios", "idUsuario", "nombre", "usuario"),
+            {"$project": {
+                "_id": 0,
+                "idHistorial": {"$toString": "$_id"},
+                "fechaMedicion": 1,
+                "pH": 1,
+                "nutrientes": 1,
+                "observaciones": 1,
+                "idCultivo": {"$ifNull": [{"$first": "$cultivo.nomCultivo"}, "Desconocido"]},
+                "idUsuario": {"$ifNull": [{"$first": "$usuario.nombre"}, "Desconocido"]},
+            }},
+        ]
+        docs = await self.coleccion.aggregate(pipeline).to_list(length=None)
+        docs, siguiente = cortarPagina(docs, limite, lambda h: (h["fechaMedicion"], ObjectId(h["idHistorial"])))
+        if rapido:
+            # Filas de la agregación sin revalidar; model_construct tampoco valida el sobre
+            return HistorialSueloSalida.model_construct(historiales=filasConfiables(HistorialSueloDetalle, docs),
+                                                        siguiente=siguiente)
+        return HistorialSueloSalida(historiales=[HistorialSueloDetalle(**h) for h in docs], siguiente=siguiente)
 
-    def consultar(self, idHistorial: str) -> HistorialSueloDetalleSalida:
+    async def consultar(self, idHistorial: str) -> HistorialSueloDetalleSalida:
         try:
             filtro = {"_id": ObjectId(idHistorial), "eliminado": False}
         except Exception:
             return Salida(mensaje="ID inválido", success=False, estatus=400)
 
-        historial = self.coleccion.find_one(filtro)
+        historial = await self.coleccion.find_one(filtro)
         if not historial:
             return Salida(mensaje="No encontrado", success=False, estatus=404)
 
-        nombre_cultivo = self.db.cultivos.find_one({"_id": ObjectId(historial["idCultivo"])}, {"nomCultivo": 1})
-        nombre_usuario = self.db.usuarios.find_one({"_id": ObjectId(historial["idUsuario"])}, {"nombre": 1})
+        nombre_cultivo = await self.db.cultivos.find_one({"_id": ObjectId(historial["idCultivo"])}, {"nomCultivo": 1})
+        nombre_usuario = await self.db.usuarios.find_one({"_id": ObjectId(historial["idUsuario"])}, {"nombre": 1})
 
         return HistorialSueloDetalleSalida(
             historial=HistorialSueloDetalle(
@@ -93,3 +222,63 @@ class HistorialSueloDAO:
             success=True,
             estatus=200
         )
+
+    async def consultar_tendencia(self, idCultivo: str, unidad: str = "dia",
+                                  desde: date | None = None, hasta: date | None = None) -> TendenciaSueloSalida:
+        salida = TendenciaSueloSalida(mensaje="", success=True, estatus=200, idCultivo=idCultivo, unidad=unidad)
+        if unidad not in UNIDADES_TENDENCIA:
+            salida.mensaje = f"Unidad inválida. Use: {', '.join(UNIDADES_TENDENCIA)}"
+            salida.success = False
+            salida.estatus = 400
+            return salida
+
+        filtro = {"idCultivo": idCultivo, "eliminado": False}
+        if desde or hasta:
+            filtro["fechaMedicion"] = {}
+            if desde:
+                filtro["fechaMedicion"]["$gte"] = datetime.combine(desde, datetime.min.time())
+            if hasta:
+                filtro["fechaMedicion"]["$lte"] = datetime.combine(hasta, datetime.max.time())
+
+        # Todo se agrega en el servidor; solo viajan los renglones por periodo
+        pipeline = [
+            {"$match": filtro},
+            {"$set": {"periodo": {"$dateTrunc": {"date": "$fechaMedicion", "unit": UNIDADES_TENDENCIA[unidad],
+                                                 "startOfWeek": "monday"}}}},
+            {"$facet": {
+                "pH": [
+                    {"$group": {"_id": "$periodo", "mediciones": {"$sum": 1},
+                                "minimo": {"$min": "$pH"}, "promedio": {"$avg": "$pH"}, "maximo": {"$max": "$pH"}}},
+                ],
+                "nutrientes": [
+                    {"$unwind": "$nutrientes"},
+                    {"$group": {"_id": {"periodo": "$periodo", "nombre": "$nutrientes.nombre"},
+                                "mediciones": {"$sum": 1},
+                                "minimo": {"$min": "$nutrientes.valor"},
+                                "promedio": {"$avg": "$nutrientes.valor"},
+                                "maximo": {"$max": "$nutrientes.valor"}}},
+                    {"$sort": {"_id.nombre": 1}},
+                ],
+            }},
+        ]
+        resultado = await self.coleccion.aggregate(pipeline).to_list(length=None)
+        facetas = resultado[0] if resultado else {"pH": [], "nutrientes": []}
+
+        periodos = {}
+        for fila in facetas["pH"]:
+            periodos[fila["_id"]] = PeriodoTendencia(
+                periodo=fila["_id"],
+                mediciones=fila["mediciones"],
+                pH=EstadisticaMedicion(minimo=fila["minimo"], promedio=fila["promedio"], maximo=fila["maximo"]),
+            )
+        for fila in facetas["nutrientes"]:
+            periodo = periodos.get(fila["_id"]["periodo"])
+            if periodo is None or fila["_id"].get("nombre") is None:
+                continue
+            periodo.nutrientes.append(NutrienteTendencia(
+                nombre=fila["_id"]["nombre"], mediciones=fila["mediciones"],
+                minimo=fila["minimo"], promedio=fila["promedio"], maximo=fila["maximo"]))
+
+        salida.periodos = [periodos[clave] for clave in sorted(periodos)]
+        salida.mensaje = f"{len(salida.periodos)} periodos encontrados"
+        return salida
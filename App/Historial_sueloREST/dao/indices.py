@@ -0,0 +1,73 @@
+from pymongo import ASCENDING
+
+from comun.indices import aplicarRegistro, imprimirReporte
+
+# Índices que necesita este servicio, por colección.
+# Cada uno lleva nombre fijo para poder verificarlo contra lo que ya existe en la base.
+INDICES = {
+    "historial_suelo": [
+        # Índice meta + tiempo; MongoDB 6.3+ lo crea solo con este nombre al crear la colección
+        {"nombre": "idCultivo_1_fechaMedicion_1", "llaves": [("idCultivo", ASCENDING), ("fechaMedicion", ASCENDING)]},
+        # Listado: solo los no eliminados, en orden de (fechaMedicion, _id)
+        {"nombre": "no_eliminados_por_fecha", "llaves": [("fechaMedicion", ASCENDING), ("_id", ASCENDING)],
+         "opciones": {"partialFilterExpression": {"eliminado": False}}},
+        # Motor de alertas (AlertasREST): mediciones escritas desde su última ejecución
+        {"nombre": "actualizadoEn", "llaves": [("actualizadoEn", ASCENDING)]},
+    ],
+}
+
+# Colecciones de series de tiempo; se crean antes que sus índices
+SERIES_DE_TIEMPO = {
+    "historial_suelo": {"timeField": "fechaMedicion", "metaField": "idCultivo", "granularity": "hours"},
+}
+# editar y borrar actualizan campos que no son el metaField: en series de tiempo eso requiere MongoDB 7.0.
+# En servidores anteriores historial_suelo se queda como colección normal.
+VERSION_MINIMA_SERIES = (7, 0)
+
+
+async def versionServidor(db) -> tuple:
+    info = await db.command("buildInfo")
+    return tuple(info.get("versionArray", [0, 0])[:2])
+
+
+def _textoVersion(version: tuple) -> str:
+    return ".".join(str(v) for v in version)
+
+
+async def asegurarSeriesDeTiempo(db) -> list:
+    # Crea las colecciones de series de tiempo que falten; una colección normal con el mismo nombre solo se reporta
+    reporte = []
+    version = await versionServidor(db)
+    soportado = version >= VERSION_MINIMA_SERIES
+    for nombre, opciones in SERIES_DE_TIEMPO.items():
+        existentes = await db.list_collections(filter={"name": nombre}).to_list(length=None)
+        if not existentes:
+            if not soportado:
+                reporte.append(f"{nombre}: MongoDB {_textoVersion(version)} < {_textoVersion(VERSION_MINIMA_SERIES)}; "
+                               f"se usa como colección normal")
+                continue
+            try:
+                await db.create_collection(nombre, timeseries=opciones)
+                print(f"Colección de series de tiempo creada: {nombre}")
+            except Exception as ex:
+                reporte.append(f"{nombre}: no se pudo crear la colección de series de tiempo ({ex})")
+            continue
+
+        actual = existentes[0].get("options", {}).get("timeseries")
+        if existentes[0].get("type") != "timeseries" or actual is None:
+            if soportado:
+                reporte.append(f"{nombre} no es una colección de series de tiempo; ejecutar migraciones.historialASeries")
+        elif not soportado:
+            reporte.append(f"{nombre} es de series de tiempo pero MongoDB {_textoVersion(version)} < "
+                           f"{_textoVersion(VERSION_MINIMA_SERIES)}: editar y borrar fallarán; "
+                           f"restaurar la colección desde historial_suelo_respaldo")
+        elif any(actual.get(clave) != valor for clave, valor in opciones.items()):
+            reporte.append(f"{nombre} difiere: timeseries {dict(actual)} != {opciones}")
+    return reporte
+
+
+async def asegurarIndices(db) -> list:
+    # Primero las colecciones de series de tiempo: sus índices se crean sobre ellas
+    reporte = await asegurarSeriesDeTiempo(db)
+    reporte.extend(await aplicarRegistro(db, INDICES))
+    return imprimirReporte(reporte)
@@ -1,9 +1,20 @@
+import sys
+from pathlib import Path
+
+# La carpeta App contiene el paquete compartido 'comun'
+RAIZ_APP = str(Path(__file__).resolve().parents[1])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
+
 import uvicorn
 from fastapi import FastAPI
 from dao.mongo import Conexion
+from dao.indices import asegurarIndices
+from comun.instrumentacion import MedicionMiddleware
 from routers import historial_sueloRouters  # Solo se importa historial_suelo
 
 app = FastAPI()
+app.add_middleware(MedicionMiddleware)
 
 # Registrar el router de historial_suelo
 app.include_router(historial_sueloRouters.router)
@@ -18,6 +29,7 @@ async def startup():
     conexion = Conexion()
     app.conexion = conexion
     app.db = conexion.getDB()
+    await asegurarIndices(app.db)
 
 @app.on_event("shutdown")
 async def shutdown():
@@ -0,0 +1,89 @@
+"""
+Convierte historial_suelo en una colección de series de tiempo.
+
+Uso (desde Historial_sueloREST):  python -m migraciones.historialASeries
+
+- La colección actual se renombra a historial_suelo_respaldo (una colección de series
+  de tiempo no se puede renombrar, por eso se mueve la vieja y se crea la nueva).
+- Se crea historial_suelo con timeField fechaMedicion y metaField idCultivo y se copian
+  los documentos por lotes conservando su _id.
+- Las fechas guardadas como texto se convierten a datetime; los documentos sin fecha
+  válida se quedan solo en el respaldo y se reportan.
+- Requiere MongoDB 7.0 o posterior (VERSION_MINIMA_SERIES); en servidores anteriores no se migra.
+"""
+import asyncio
+from datetime import datetime
+
+from dao.mongo import Conexion
+from dao.indices import SERIES_DE_TIEMPO, VERSION_MINIMA_SERIES, asegurarIndices, versionServidor
+
+COLECCION = "historial_suelo"
+RESPALDO = "historial_suelo_respaldo"
+TAMANO_LOTE = 1000
+
+
+def _normalizar(doc: dict) -> dict | None:
+    fecha = doc.get("fechaMedicion")
+    if isinstance(fecha, str):
+        try:
+            fecha = datetime.fromisoformat(fecha)
+        except ValueError:
+            return None
+    if not isinstance(fecha, datetime):
+        return None
+    doc["fechaMedicion"] = fecha
+    doc.setdefault("eliminado", False)
+    if doc.get("idCultivo") is not None:
+        doc["idCultivo"] = str(doc["idCultivo"])
+    return doc
+
+
+async def migrar(db) -> dict:
+    resumen = {"copiados": 0, "omitidos": 0}
+    version = await versionServidor(db)
+    if version < VERSION_MINIMA_SERIES:
+        print(f"MongoDB {'.'.join(map(str, version))} no permite editar ni borrar mediciones en series de tiempo "
+              f"(se requiere {'.'.join(map(str, VERSION_MINIMA_SERIES))}); {COLECCION} no se migra.")
+        return resumen
+
+    info = await db.list_collections(filter={"name": COLECCION}).to_list(length=None)
+    if info and info[0].get("type") == "timeseries":
+        print(f"{COLECCION} ya es una colección de series de tiempo; no hay nada que migrar.")
+        return resumen
+
+    if info:
+        await db[COLECCION].rename(RESPALDO)
+    await db.create_collection(COLECCION, timeseries=SERIES_DE_TIEMPO[COLECCION])
+
+    lote = []
+    async for doc in db[RESPALDO].find({}, batch_size=TAMANO_LOTE):
+        normalizado = _normalizar(doc)
+        if normalizado is None:
+            resumen["omitidos"] += 1
+            print(f"Omitido {doc.get('_id')}: fechaMedicion inválida")
+            continue
+        lote.append(normalizado)
+        if len(lote) >= TAMANO_LOTE:
+            await db[COLECCION].insert_many(lote, ordered=False)
+            resumen["copiados"] += len(lote)
+            lote = []
+    if lote:
+        await db[COLECCION].insert_many(lote, ordered=False)
+        resumen["copiados"] += len(lote)
+
+    await asegurarIndices(db)
+    return resumen
+
+
+async def main():
+    conexion = Conexion()
+    try:
+        resumen = await migrar(conexion.getDB())
+        print(f"Migración completa: {resumen['copiados']} mediciones copiadas, {resumen['omitidos']} omitidas. "
+              f"Los originales quedan en {RESPALDO}.")
+    finally:
+        conexion.cerrar()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
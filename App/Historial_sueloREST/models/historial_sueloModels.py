@@ -42,3 +42,34 @@ class HistorialSueloDetalleSalida(Salida):
 
 class HistorialSueloSalida(BaseModel):
     historiales: List[HistorialSueloDetalle]
+    siguiente: Optional[str] = None
+
+class EstadisticaMedicion(BaseModel):
+    minimo: Optional[float] = None
+    promedio: Optional[float] = None
+    maximo: Optional[float] = None
+
+class NutrienteTendencia(EstadisticaMedicion):
+    nombre: str
+    mediciones: int
+
+class PeriodoTendencia(BaseModel):
+    periodo: datetime
+    mediciones: int
+    pH: EstadisticaMedicion
+    nutrientes: List[NutrienteTendencia] = []
+
+class TendenciaSueloSalida(Salida):
+    idCultivo: str
+    unidad: str
+    periodos: List[PeriodoTendencia] = []
+
+class LineaRechazada(BaseModel):
+    linea: int
+    error: str
+
+class LoteHistorialSalida(Salida):
+    lineas: int = 0
+    insertadas: int = 0
+    totalRechazadas: int = 0
+    rechazadas: List[LineaRechazada] = []  # solo las primeras MAX_RECHAZOS_REPORTADOS
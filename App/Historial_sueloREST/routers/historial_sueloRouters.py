@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Request
-from typing import Any
+from fastapi import APIRouter, Request, HTTPException, Query
+from typing import Any, Optional
+from datetime import date
 
 from dao.historial_sueloDao import HistorialSueloDAO
-from models.historial_sueloModels import HistorialSueloInsert, HistorialSueloUpdate, HistorialSueloSalida, HistorialSueloDetalleSalida, Salida
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, LIMITE_MAXIMO
+from comun.serializacion import respuestaRapida
+from models.historial_sueloModels import HistorialSueloInsert, HistorialSueloUpdate, HistorialSueloSalida, HistorialSueloDetalleSalida, Salida, TendenciaSueloSalida, LoteHistorialSalida
 
 router = APIRouter(prefix="/historial_suelo", tags=["Historial de Suelo"])
 
@@ -13,7 +16,17 @@ async def registrar_historial_suelo(historial_suelo: HistorialSueloInsert, reque
     -Se espera una fecha de medicion, pH, nutrientes, observaciones, ID de cultivo e ID de usuario.
     """
     historial_suelo_dao = HistorialSueloDAO(request.app.db)
-    return historial_suelo_dao.registrar(historial_suelo)
+    return await historial_suelo_dao.registrar(historial_suelo)
+
+@router.post("/lote", response_model=LoteHistorialSalida, summary="Registrar mediciones por lote (NDJSON)")
+async def registrar_lote_historial_suelo(request: Request) -> LoteHistorialSalida:
+    """
+    -Recibe el cuerpo como NDJSON (application/x-ndjson): un historial de suelo por línea, con los mismos campos que POST /.
+    -El cuerpo se procesa conforme llega; las líneas válidas se insertan por tramos.
+    -Devuelve cuántas se insertaron y el número de línea y motivo de cada rechazo.
+    """
+    historial_suelo_dao = HistorialSueloDAO(request.app.db)
+    return await historial_suelo_dao.registrarLote(request.stream())
 
 @router.put("/{idHistorial}", response_model=Salida, summary="Actualizar un historial de suelo existente")
 async def actualizar_historial_suelo(idHistorial: str, datos: HistorialSueloUpdate, request: Request) -> Salida:
@@ -22,7 +35,7 @@ async def actualizar_historial_suelo(idHistorial: str, datos: HistorialSueloUpda
     -Actualiza únicamente los campos enviados del historial de suelo.
     """
     historial_suelo_dao = HistorialSueloDAO(request.app.db)
-    return historial_suelo_dao.editar(idHistorial, datos)
+    return await historial_suelo_dao.editar(idHistorial, datos)
 
 @router.delete("/{idHistorial}", response_model=Salida, summary="Eliminar un historial de suelo por su ID")
 async def eliminar_historial_suelo(idHistorial: str, request: Request) -> Salida:
@@ -31,16 +44,35 @@ async def eliminar_historial_suelo(idHistorial: str, request: Request) -> Salida
     -Elimina el historial de suelo si existe en la base de datos.
     """
     historial_suelo_dao = HistorialSueloDAO(request.app.db)
-    return historial_suelo_dao.borrar(idHistorial)
+    return await historial_suelo_dao.borrar(idHistorial)
 
 @router.get("/", response_model=HistorialSueloSalida, summary="Consultar lista de historiales de suelo")
-async def listar_historiales_suelo(request: Request) -> HistorialSueloSalida:
+async def listar_historiales_suelo(request: Request, limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+                                  cursor: Optional[str] = None,
+                                  rapido: bool = Query(False, description="Omite la revalidación de pydantic y serializa con orjson; misma forma de respuesta")) -> HistorialSueloSalida:
     """
     -Recupera la lista de todos los registros de historial de suelo.
     - Incluye: fecha de medición, pH, nutrientes, observaciones, ID de cultivo e ID de usuario.
+    - Paginada: para la siguiente página enviar el valor de 'siguiente' como 'cursor'.
+    - Con 'rapido' la respuesta tiene la misma forma pero se arma sin revalidar cada fila.
+    """
+    historial_suelo_dao = HistorialSueloDAO(request.app.db)
+    try:
+        resultado = await historial_suelo_dao.consultar_lista(limite, cursor, rapido)
+        return respuestaRapida(resultado) if rapido else resultado
+    except CursorInvalido as ex:
+        raise HTTPException(status_code=400, detail=str(ex))
+
+@router.get("/cultivo/{idCultivo}/tendencia", response_model=TendenciaSueloSalida, summary="Tendencia de pH y nutrientes de un cultivo")
+async def tendencia_historial_suelo(idCultivo: str, request: Request, unidad: str = "dia",
+                                    desde: Optional[date] = None, hasta: Optional[date] = None) -> TendenciaSueloSalida:
+    """
+    - Agrupa las mediciones del cultivo por día, semana o mes (unidad = dia | semana | mes).
+    - Por periodo devuelve mínimo, promedio y máximo del pH y de cada nutriente.
+    - Opcionalmente se limita al rango de fechas desde/hasta.
     """
     historial_suelo_dao = HistorialSueloDAO(request.app.db)
-    return historial_suelo_dao.consultar_lista()
+    return await historial_suelo_dao.consultar_tendencia(idCultivo, unidad, desde, hasta)
 
 @router.get("/{idHistorial}", response_model=HistorialSueloDetalleSalida, summary="Consultar un historial de suelo por ID")
 async def obtener_historial_suelo(idHistorial: str, request: Request) -> HistorialSueloDetalleSalida:
@@ -48,4 +80,4 @@ async def obtener_historial_suelo(idHistorial: str, request: Request) -> Histori
     - Recupera los detalles de un historial de suelo específico usando su ID.
     """
     historial_suelo_dao = HistorialSueloDAO(request.app.db)
-    return historial_suelo_dao.consultar(idHistorial)
+    return await historial_suelo_dao.consultar(idHistorial)
@@ -3,16 +3,20 @@ from bson import ObjectId
 from datetime import date
 
 from models.ActividadesUsuariosModel import ActividadUsuarioInsert, Salida, ActividadUsuarioUpdate, \
-    ActividadUsuarioDetalle, ActividadUsuarioDetalleSalida, ActividadesUsuariosSalida
+    ActividadUsuarioDetalle, ActividadUsuarioDetalleSalida, ActividadesUsuariosSalida, ActividadUsuarioListado
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, limitar, filtroDesde, cortarPagina
+from comun.serializacion import filasConfiables
+from comun.instrumentacion import medirMetodos
 
 
+@medirMetodos
 class ActividadUsuarioDAO:
     VALID_ESTATUS = {"Pendiente", "Completada", "Cancelada"}
 
     def __init__(self, db):
         self.db = db
 
-    def registrar(self, actividad: ActividadUsuarioInsert) -> Salida:
+    async def registrar(self, actividad: ActividadUsuarioInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
 
         try:
@@ -54,7 +58,7 @@ class ActividadUsuarioDAO:
                 salida.mensaje = f"ID de cultivo inválido: {actividad.idCultivo}"
                 return salida
 
-            cultivo_existente = self.db.cultivos.find_one({"_id": oid_cultivo})
+            cultivo_existente = await self.db.cultivos.find_one({"_id": oid_cultivo}, {"_id": 1})
             if not cultivo_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un cultivo con id: {actividad.idCultivo}"
@@ -68,7 +72,7 @@ class ActividadUsuarioDAO:
                 salida.mensaje = f"ID de usuario inválido: {actividad.idUsuario}"
                 return salida
 
-            usuario_existente = self.db.usuarios.find_one({"_id": oid_usuario})
+            usuario_existente = await self.db.usuarios.find_one({"_id": oid_usuario}, {"_id": 1})
             if not usuario_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un usuario con id: {actividad.idUsuario}"
@@ -76,7 +80,7 @@ class ActividadUsuarioDAO:
 
             # 6. Insertar la actividad de usuario en la colección
             doc = jsonable_encoder(actividad)
-            result = self.db.actividades_usuarios.insert_one(doc)
+            result = await self.db.actividades_usuarios.insert_one(doc)
 
             salida.estatus = "OK"
             salida.mensaje = f"Actividad de usuario registrada con éxito con id: {result.inserted_id}"
@@ -88,7 +92,7 @@ class ActividadUsuarioDAO:
             salida.mensaje = "Error al registrar la actividad de usuario, consulte al administrador."
             return salida
 
-    def actualizar(self, id_actividad: str, datos: ActividadUsuarioUpdate) -> Salida:
+    async def actualizar(self, id_actividad: str, datos: ActividadUsuarioUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -100,7 +104,7 @@ class ActividadUsuarioDAO:
                 return salida
 
             # 2. Verificar que la actividad exista en la BD
-            existente = self.db.actividades_usuarios.find_one({"_id": oid_act})
+            existente = await self.db.actividades_usuarios.find_one({"_id": oid_act})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró una actividad con id: {id_actividad}"
@@ -147,7 +151,7 @@ class ActividadUsuarioDAO:
                     salida.mensaje = f"ID de cultivo inválido: {datos.idCultivo}"
                     return salida
 
-                cultivo_existente = self.db.cultivos.find_one({"_id": oid_cultivo})
+                cultivo_existente = await self.db.cultivos.find_one({"_id": oid_cultivo}, {"_id": 1})
                 if not cultivo_existente:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"No se encontró un cultivo con id: {datos.idCultivo}"
@@ -163,7 +167,7 @@ class ActividadUsuarioDAO:
                     salida.mensaje = f"ID de usuario inválido: {datos.idUsuario}"
                     return salida
 
-                usuario_existente = self.db.usuarios.find_one({"_id": oid_usuario})
+                usuario_existente = await self.db.usuarios.find_one({"_id": oid_usuario}, {"_id": 1})
                 if not usuario_existente:
                     salida.estatus = "ERROR"
                     salida.mensaje = f"No se encontró un usuario con id: {datos.idUsuario}"
@@ -177,7 +181,7 @@ class ActividadUsuarioDAO:
                 return salida
 
             # 9. Ejecutar la actualización
-            result = self.db.actividades_usuarios.update_one(
+            result = await self.db.actividades_usuarios.update_one(
                 {"_id": oid_act},
                 {"$set": jsonable_encoder(update_fields)},
             )
@@ -197,7 +201,7 @@ class ActividadUsuarioDAO:
             salida.mensaje = "Error al actualizar la actividad de usuario, consulte al administrador."
             return salida
 
-    def eliminar(self, id_actividad: str) -> Salida:
+    async def eliminar(self, id_actividad: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -209,14 +213,14 @@ class ActividadUsuarioDAO:
                 return salida
 
             # 2. Verificar que la actividad exista en la BD
-            existente = self.db.actividades_usuarios.find_one({"_id": oid_act})
+            existente = await self.db.actividades_usuarios.find_one({"_id": oid_act})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró una actividad con id: {id_actividad}"
                 return salida
 
             # 3. Realizar la eliminación lógica: cambiar estatus a "Cancelada"
-            result = self.db.actividades_usuarios.update_one(
+            result = await self.db.actividades_usuarios.update_one(
                 {"_id": oid_act},
                 {"$set": {"estatus": "Cancelada"}},
             )
@@ -236,7 +240,7 @@ class ActividadUsuarioDAO:
             salida.mensaje = "Error al eliminar la actividad de usuario, consulte al administrador."
             return salida
 
-    def consultar(self, id_actividad: str) -> ActividadUsuarioDetalleSalida:
+    async def consultar(self, id_actividad: str) -> ActividadUsuarioDetalleSalida:
         salida = ActividadUsuarioDetalleSalida(estatus="", mensaje="", actividad=None)
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -248,7 +252,7 @@ class ActividadUsuarioDAO:
                 return salida
 
             # 2. Buscar la actividad en la colección
-            doc = self.db.actividades_usuarios.find_one({"_id": oid_act})
+            doc = await self.db.actividades_usuarios.find_one({"_id": oid_act})
             if not doc:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró una actividad con id: {id_actividad}"
@@ -259,7 +263,7 @@ class ActividadUsuarioDAO:
             nombre_cultivo = ""
             try:
                 oid_cultivo = ObjectId(cultivo_id)
-                cultivo_doc = self.db.cultivos.find_one({"_id": oid_cultivo})
+                cultivo_doc = await self.db.cultivos.find_one({"_id": oid_cultivo}, {"nomCultivo": 1})
                 if cultivo_doc:
                     nombre_cultivo = cultivo_doc.get("nomCultivo", "")
             except Exception:
@@ -271,7 +275,7 @@ class ActividadUsuarioDAO:
             nombre_usuario = ""
             try:
                 oid_usuario = ObjectId(usuario_id)
-                usuario_doc = self.db.usuarios.find_one({"_id": oid_usuario})
+                usuario_doc = await self.db.usuarios.find_one({"_id": oid_usuario}, {"nombre": 1})
                 if usuario_doc:
                     nombre_usuario = usuario_doc.get("nombre", "")
             except Exception:
@@ -302,74 +306,76 @@ class ActividadUsuarioDAO:
             salida.mensaje = "Error al consultar la actividad de usuario, consulte al administrador."
             return salida
 
-    def consultaGeneral(self) -> ActividadesUsuariosSalida:
+    @staticmethod
+    def _lookupNombre(coleccion: str, campo_id: str, campo_nombre: str, alias: str) -> dict:
+        # Une el documento referenciado por campo_id (ObjectId o string) y trae solo su nombre
+        return {
+            "$lookup": {
+                "from": coleccion,
+                "let": {"ref": {"$convert": {"input": f"${campo_id}", "to": "objectId",
+                                             "onError": None, "onNull": None}}},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$_id", "$$ref"]}}},
+                    {"$project": {"_id": 0, campo_nombre: 1}},
+                ],
+                "as": alias,
+            }
+        }
+
+    def _pipelineDetalle(self) -> list:
+        # Filas con la forma de ActividadUsuarioDetalle, nombres resueltos en el servidor
+        return [
+            self._lookupNombre("cultivos", "idCultivo", "nomCultivo", "cultivo"),
+            self._lookupNombre("usuarios", "idUsuario", "nombre", "usuario"),
+            {"$project": {
+                "_id": 0,
+                "idActividad": {"$toString": "$_id"},
+                "actividad": {"$ifNull": ["$actividad", ""]},
+                "fechaActividad": "$fechaActividad",
+                "estatus": {"$switch": {
+                    "branches": [
+                        {"case": {"$eq": ["$estatus", True]}, "then": "True"},
+                        {"case": {"$eq": ["$estatus", False]}, "then": "False"},
+                    ],
+                    "default": {"$toString": {"$ifNull": ["$estatus", ""]}},
+                }},
+                "idCultivo": {"$toString": {"$ifNull": ["$idCultivo", ""]}},
+                "idUsuario": {"$toString": {"$ifNull": ["$idUsuario", ""]}},
+                "nombreCultivo": {"$ifNull": [{"$first": "$cultivo.nomCultivo"}, ""]},
+                "nombreUsuario": {"$ifNull": [{"$first": "$usuario.nombre"}, ""]},
+            }},
+        ]
+
+    async def consultaGeneral(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None,
+                              rapido: bool = False) -> ActividadesUsuariosSalida:
         salida = ActividadesUsuariosSalida(estatus="", mensaje="", actividades=[])
         try:
-            cursor = self.db.actividades_usuarios.find()
-            lista_detalles = []
-
-            for doc in cursor:
-                # 1. Convertir _id a string
-                id_act = str(doc.get("_id"))
-
-                # 2. forzar estatus a string
-                estatus_str = str(doc.get("estatus", ""))
-
-                # 3. Convertir idCultivo a string y obtener nombreCultivo
-                cultivo_id = doc.get("idCultivo")
-                nombre_cultivo = ""
-                cultivo_id_str = ""
-                try:
-                    # si está guardado como ObjectId
-                    if isinstance(cultivo_id, ObjectId):
-                        cultivo_id_str = str(cultivo_id)
-                    else:
-                        cultivo_id_str = str(cultivo_id)
-                    oid_cult = ObjectId(cultivo_id_str)
-                    cult_doc = self.db.cultivos.find_one({"_id": oid_cult})
-                    if cult_doc:
-                        nombre_cultivo = cult_doc.get("nomCultivo", "")
-                except Exception:
-                    cultivo_id_str = str(cultivo_id or "")
-                    nombre_cultivo = ""
-
-                # 4. Convertir idUsuario a string y obtener nombreUsuario
-                usuario_id = doc.get("idUsuario")
-                nombre_usuario = ""
-                usuario_id_str = ""
-                try:
-                    if isinstance(usuario_id, ObjectId):
-                        usuario_id_str = str(usuario_id)
-                    else:
-                        usuario_id_str = str(usuario_id)
-                    oid_usr = ObjectId(usuario_id_str)
-                    usr_doc = self.db.usuarios.find_one({"_id": oid_usr})
-                    if usr_doc:
-                        nombre_usuario = usr_doc.get("nombre", "")
-                except Exception:
-                    usuario_id_str = str(usuario_id or "")
-                    nombre_usuario = ""
-
-                # 5. Construir el detalle convirtiendo todos los campos a los tipos adecuados
-                detalle = ActividadUsuarioDetalle(
-                    idActividad=id_act,
-                    actividad=doc.get("actividad", ""),
-                    fechaActividad=doc.get("fechaActividad"),
-                    estatus=estatus_str,
-                    idCultivo=cultivo_id_str,
-                    idUsuario=usuario_id_str,
-                    nombreCultivo=nombre_cultivo,
-                    nombreUsuario=nombre_usuario,
-                )
-                lista_detalles.append(detalle)
+            limite = limitar(limite)
+            # Una sola agregación: primero se corta la página por _id y luego se unen los nombres con $lookup
+            pipeline = [
+                {"$match": filtroDesde(cursor)},
+                {"$sort": {"_id": 1}},
+                {"$limit": limite + 1},
+            ] + self._pipelineDetalle()
+            docs = await self.db.actividades_usuarios.aggregate(pipeline).to_list(length=None)
+            docs, salida.siguiente = cortarPagina(docs, limite, lambda a: (ObjectId(a["idActividad"]),))
 
             salida.estatus = "OK"
             salida.mensaje = "Listado de todas las actividades con detalle."
-            salida.actividades = lista_detalles
+            if rapido:
+                # Las filas ya vienen con la forma de la respuesta desde la agregación
+                salida.actividades = filasConfiables(ActividadUsuarioListado, docs)
+            else:
+                salida.actividades = [ActividadUsuarioDetalle(**doc) for doc in docs]
+            return salida
+
+        except CursorInvalido as ex:
+            salida.estatus = "ERROR"
+            salida.mensaje = str(ex)
             return salida
 
         except Exception as ex:
             print("ERROR en consulta general actividades:", ex)
             salida.estatus = "ERROR"
             salida.mensaje = "Error al obtener listado de actividades, consulte al administrador."
-            return salida
\ No newline at end of file
+            return salida
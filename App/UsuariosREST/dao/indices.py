@@ -0,0 +1,26 @@
+from pymongo import ASCENDING
+
+from comun.indices import aplicarRegistro, imprimirReporte
+from dao.listadoUsuarios import asegurarListado
+
+# Índices que necesita este servicio, por colección.
+# Cada uno lleva nombre fijo para poder verificarlo contra lo que ya existe en la base.
+INDICES = {
+    "usuarios": [
+        # iniciar_sesion y registrar buscan por email en cada petición
+        {"nombre": "email_unico", "llaves": [("email", ASCENDING)], "opciones": {"unique": True}},
+    ],
+    "insumos": [
+        {"nombre": "nombreInsumo", "llaves": [("nombreInsumo", ASCENDING)]},
+    ],
+    "tokens_revocados": [
+        # comun/seguridad/tokens.py: la revocación se borra cuando ya expiraron los tokens que afecta
+        {"nombre": "expira_ttl", "llaves": [("expira", ASCENDING)], "opciones": {"expireAfterSeconds": 0}},
+    ],
+}
+
+
+async def asegurarIndices(db) -> list:
+    reporte = await aplicarRegistro(db, INDICES)
+    reporte.extend(await asegurarListado(db))
+    return imprimirReporte(reporte)
@@ -2,15 +2,25 @@ from bson import ObjectId
 from fastapi.encoders import jsonable_encoder
 
 from models.InsumosModel import InsumoInsert, Salida, InsumoUpdate, InsumoDetalleSalida, InsumoListado, InsumosSalida
+from comun.paginacion import LIMITE_DEFECTO, limitar, filtroDesde, cortarPagina
+from comun.versiones import versionGlobal, incrementarVersionGlobal
+from comun.catalogoInsumos import catalogoInsumos
+from comun.instrumentacion import medirMetodos
 
 
+@medirMetodos
 class InsumoDAO:
     VALID_TIPOS = {"Insecticidas", "Fertilizantes", "Herbicidas", "Pesticidas", "Semillas"}
+    # Entrada de la colección 'versiones' que cambia con cada escritura sobre insumos (ETag del listado)
+    CLAVE_VERSION = "insumos"
 
     def __init__(self, db):
         self.db = db
 
-    def registrar(self, insumo: InsumoInsert) -> Salida:
+    async def version(self) -> int:
+        return await versionGlobal(self.db, self.CLAVE_VERSION)
+
+    async def registrar(self, insumo: InsumoInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
 
         try:
@@ -45,7 +55,7 @@ class InsumoDAO:
                 return salida
 
             # 4. Verificar unicidad de nombreInsumo
-            existente = self.db.insumos.find_one({"nombreInsumo": insumo.nombreInsumo.strip()})
+            existente = await self.db.insumos.find_one({"nombreInsumo": insumo.nombreInsumo.strip()})
             if existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = "Ya existe un insumo con el mismo nombre."
@@ -53,7 +63,9 @@ class InsumoDAO:
 
             # 5. Insertar el insumo en la colección
             doc = jsonable_encoder(insumo)
-            result = self.db.insumos.insert_one(doc)
+            result = await self.db.insumos.insert_one(doc)
+            await incrementarVersionGlobal(self.db, self.CLAVE_VERSION)
+            catalogoInsumos.invalidar()
 
             salida.estatus = "OK"
             salida.mensaje = f"Insumo registrado con éxito con id: {result.inserted_id}"
@@ -65,7 +77,7 @@ class InsumoDAO:
             salida.mensaje = "Error al registrar el insumo, consulte al administrador."
             return salida
 
-    def actualizar(self, id_insumo: str, datos: InsumoUpdate) -> Salida:
+    async def actualizar(self, id_insumo: str, datos: InsumoUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -77,7 +89,7 @@ class InsumoDAO:
                 return salida
 
             # 2. Verificar que el insumo exista en la base de datos
-            existente = self.db.insumos.find_one({"_id": oid_insumo})
+            existente = await self.db.insumos.find_one({"_id": oid_insumo})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un insumo con id: {id_insumo}"
@@ -92,7 +104,7 @@ class InsumoDAO:
                     salida.estatus = "ERROR"
                     salida.mensaje = "El campo 'nombreInsumo' no puede estar vacío si se envía."
                     return salida
-                otro = self.db.insumos.find_one({
+                otro = await self.db.insumos.find_one({
                     "nombreInsumo": nuevo_nombre,
                     "_id": {"$ne": oid_insumo}
                 })
@@ -135,12 +147,14 @@ class InsumoDAO:
                 return salida
 
             # 8. Ejecutar la actualización
-            result = self.db.insumos.update_one(
+            result = await self.db.insumos.update_one(
                 {"_id": oid_insumo},
                 {"$set": jsonable_encoder(update_fields)},
             )
 
             if result.modified_count == 1:
+                await incrementarVersionGlobal(self.db, self.CLAVE_VERSION)
+                catalogoInsumos.invalidar()
                 salida.estatus = "OK"
                 salida.mensaje = f"Insumo {id_insumo} actualizado con éxito."
             else:
@@ -155,7 +169,7 @@ class InsumoDAO:
             salida.mensaje = "Error al actualizar el insumo, consulte al administrador."
             return salida
 
-    def eliminar(self, id_insumo: str) -> Salida:
+    async def eliminar(self, id_insumo: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
 
         try:
@@ -168,7 +182,7 @@ class InsumoDAO:
                 return salida
 
             # Buscar insumo
-            insumo_existente = self.db.insumos.find_one({"_id": oid})
+            insumo_existente = await self.db.insumos.find_one({"_id": oid})
             if not insumo_existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un insumo con ID: {id_insumo}"
@@ -180,11 +194,17 @@ class InsumoDAO:
                 salida.mensaje = "El insumo ya ha sido eliminado previamente."
                 return salida
 
-            # Marcar como inactivo
-            self.db.insumos.update_one(
-                {"_id": oid},
+            # Marcar como inactivo; otra petición pudo haberlo desactivado después de la lectura
+            result = await self.db.insumos.update_one(
+                {"_id": oid, "estatus": {"$ne": "Inactivo"}},
                 {"$set": {"estatus": "Inactivo"}}
             )
+            if result.modified_count != 1:
+                salida.estatus = "ERROR"
+                salida.mensaje = "El insumo ya ha sido eliminado previamente."
+                return salida
+            await incrementarVersionGlobal(self.db, self.CLAVE_VERSION)
+            catalogoInsumos.invalidar()
 
             salida.estatus = "OK"
             salida.mensaje = "Insumo eliminado (lógicamente) con éxito."
@@ -196,7 +216,7 @@ class InsumoDAO:
             salida.mensaje = "Ocurrió un error al intentar eliminar el insumo."
             return salida
 
-    def obtener_por_id(self, id_insumo: str) -> InsumoDetalleSalida:
+    async def obtener_por_id(self, id_insumo: str) -> InsumoDetalleSalida:
         salida = InsumoDetalleSalida(estatus="", mensaje="", insumo=None)
 
         try:
@@ -208,8 +228,12 @@ class InsumoDAO:
                 salida.mensaje = f"ID de insumo inválido: {id_insumo}"
                 return salida
 
-            # Buscar el insumo
-            insumo = self.db.insumos.find_one({"_id": oid})
+            # Buscar el insumo en el catálogo en memoria (o en Mongo si no cabe en él)
+            catalogo = await catalogoInsumos.cargar(self.db, [oid])
+            if catalogo is None:
+                insumo = await self.db.insumos.find_one({"_id": oid})
+            else:
+                insumo = dict(catalogo[oid]) if catalogo[oid] else None
 
             if not insumo:
                 salida.estatus = "ERROR"
@@ -231,11 +255,15 @@ class InsumoDAO:
             salida.mensaje = "Ocurrió un error al consultar el insumo. Contacte al administrador."
             return salida
 
-    def consultaGeneral(self) -> InsumosSalida:
+    async def consultaGeneral(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None) -> InsumosSalida:
         salida = InsumosSalida(estatus="", mensaje="", insumos=[])
         try:
-
-            documentos = self.db.insumos.find()
+            limite = limitar(limite)
+            filtro = filtroDesde(cursor)
+            documentos = await catalogoInsumos.pagina(self.db, filtro.get("_id", {}).get("$gt"), limite + 1)
+            if documentos is None:
+                documentos = await self.db.insumos.find(filtro).sort("_id", 1).limit(limite + 1).to_list(length=None)
+            documentos, salida.siguiente = cortarPagina(documentos, limite)
 
             insumos_list = []
             for doc in documentos:
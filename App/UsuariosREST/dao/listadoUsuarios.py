@@ -0,0 +1,42 @@
+"""
+Listado de usuarios materializado en la colección usuarios_listado.
+
+Reemplaza a la vista usuariosListView: en lugar de proyectar toda la colección usuarios en
+cada consulta, UsuarioDAO actualiza la fila del usuario en cada escritura y el listado se lee
+directamente por el índice de _id.
+"""
+from bson import ObjectId
+
+COLECCION_LISTADO = "usuarios_listado"
+
+# Misma forma que usuariosListView; se conserva _id (el del usuario) para ordenar y paginar
+PROYECCION_LISTADO = {"$project": {"_id": 1, "idUsuario": {"$toString": "$_id"}, "nombre": 1, "estatus": 1, "email": 1}}
+
+
+async def actualizarListado(db, oid: ObjectId):
+    # Rehace la fila de un usuario con la misma proyección que la reconstrucción completa
+    pipeline = [
+        {"$match": {"_id": oid}},
+        PROYECCION_LISTADO,
+        {"$merge": {"into": COLECCION_LISTADO, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]
+    await db.usuarios.aggregate(pipeline).to_list(length=None)
+
+
+async def reconstruirListado(db) -> int:
+    # $out reemplaza la colección completa de forma atómica y conserva sus índices
+    await db.usuarios.aggregate([PROYECCION_LISTADO, {"$out": COLECCION_LISTADO}]).to_list(length=None)
+    return await db[COLECCION_LISTADO].count_documents({})
+
+
+async def asegurarListado(db) -> list:
+    # Primer arranque, o colección borrada: se materializa completa una vez
+    reporte = []
+    try:
+        if (await db[COLECCION_LISTADO].estimated_document_count() == 0
+                and await db.usuarios.estimated_document_count() > 0):
+            total = await reconstruirListado(db)
+            print(f"Listado de usuarios materializado: {total} usuarios")
+    except Exception as ex:
+        reporte.append(f"{COLECCION_LISTADO}: no se pudo materializar ({ex})")
+    return reporte
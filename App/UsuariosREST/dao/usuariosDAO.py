@@ -1,21 +1,35 @@
 from fastapi.encoders import jsonable_encoder
 import re
 from bson import ObjectId
-from models.UsuariosModel import UsuarioInsert, Salida, UsuarioUpdate, UsuariosSalida, UsuarioDetalleSalida, UsuarioDetalle
+from models.UsuariosModel import UsuarioInsert, Salida, UsuarioUpdate, UsuariosSalida, UsuarioDetalleSalida, UsuarioDetalle, TokenSalida
+from comun.seguridad.autenticacion import SesionUsuario, iniciarSesion
+from comun.seguridad.cacheAutenticacion import cacheAutenticacion
+from comun.seguridad.tokens import emitirToken, listaRevocacion, DURACION_SEGUNDOS
+from comun.versiones import CLAVE_USUARIOS, incrementarVersionGlobal
+from comun.paginacion import CursorInvalido, LIMITE_DEFECTO, limitar, filtroDesde, cortarPagina
+from dao.listadoUsuarios import COLECCION_LISTADO, actualizarListado
+from comun.instrumentacion import medirMetodos
 
 
+@medirMetodos
 class UsuarioDAO:
     VALID_ROLES = {"Administrador", "Agricultor", "Supervisor"}
 
     def __init__(self, db):
         self.db = db
 
-    def registrar(self, usuario: UsuarioInsert) -> Salida:
+    async def _invalidarCredenciales(self, id_usuario: str):
+        # Solo tras una escritura que cambió algo: este proceso lo quita de inmediato
+        # y los demás lo notan por la versión de usuarios (que también cambia los ETag)
+        cacheAutenticacion.invalidarUsuario(id_usuario)
+        await incrementarVersionGlobal(self.db, CLAVE_USUARIOS)
+
+    async def registrar(self, usuario: UsuarioInsert) -> Salida:
         salida = Salida(estatus="", mensaje="")
 
         try:
             # 1. Verificar que el email no exista
-            existente = self.db.usuarios.find_one({"email": usuario.email})
+            existente = await self.db.usuarios.find_one({"email": usuario.email})
             if existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = "El correo electrónico ya está registrado."
@@ -46,7 +60,8 @@ class UsuarioDAO:
 
             # 4. Insertar el usuario en la base de datos
             doc = jsonable_encoder(usuario)
-            result = self.db.usuarios.insert_one(doc)
+            result = await self.db.usuarios.insert_one(doc)
+            await actualizarListado(self.db, result.inserted_id)
 
             salida.estatus = "OK"
             salida.mensaje = f"Usuario registrado con éxito con id: {result.inserted_id}"
@@ -58,13 +73,13 @@ class UsuarioDAO:
             salida.mensaje = "Error al registrar el usuario, consulte al administrador."
             return salida
 
-    def actualizar(self, id_usuario: str, datos: UsuarioUpdate) -> Salida:
+    async def actualizar(self, id_usuario: str, datos: UsuarioUpdate) -> Salida:
         salida = Salida(estatus="", mensaje="")
 
         try:
             # 1. Verificar que el usuario exista
             oid = ObjectId(id_usuario)
-            existente = self.db.usuarios.find_one({"_id": oid})
+            existente = await self.db.usuarios.find_one({"_id": oid})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un usuario con id: {id_usuario}"
@@ -74,7 +89,7 @@ class UsuarioDAO:
 
             # 2. Validar email si se va a modificar
             if datos.email is not None:
-                otro = self.db.usuarios.find_one({
+                otro = await self.db.usuarios.find_one({
                     "email": datos.email,
                     "_id": {"$ne": oid}
                 })
@@ -127,10 +142,16 @@ class UsuarioDAO:
                 return salida
 
             # 7. Ejecutar la actualización
-            result = self.db.usuarios.update_one(
+            result = await self.db.usuarios.update_one(
                 {"_id": oid},
                 {"$set": update_fields}
             )
+            if result.modified_count == 1:
+                await self._invalidarCredenciales(id_usuario)
+                await actualizarListado(self.db, oid)
+            # Los tokens ya emitidos llevan el rol y suponen un usuario activo
+            if datos.estatus is False or datos.rol is not None or datos.password is not None:
+                await listaRevocacion.revocar(self.db, id_usuario)
 
             if result.modified_count == 1:
                 salida.estatus = "OK"
@@ -147,7 +168,7 @@ class UsuarioDAO:
             salida.mensaje = "Error al actualizar el usuario, consulte al administrador."
             return salida
 
-    def eliminar(self, id_usuario: str) -> Salida:
+    async def eliminar(self, id_usuario: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -159,17 +180,21 @@ class UsuarioDAO:
                 return salida
 
             # 2. Verificar que el usuario exista
-            existente = self.db.usuarios.find_one({"_id": oid})
+            existente = await self.db.usuarios.find_one({"_id": oid})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un usuario con id: {id_usuario}"
                 return salida
 
             # 3. Realizar la eliminación lógica (cambiar estatus a False)
-            result = self.db.usuarios.update_one(
+            result = await self.db.usuarios.update_one(
                 {"_id": oid},
                 {"$set": {"estatus": False}}
             )
+            if result.modified_count == 1:
+                await self._invalidarCredenciales(id_usuario)
+                await actualizarListado(self.db, oid)
+            await listaRevocacion.revocar(self.db, id_usuario)
 
             if result.modified_count == 1:
                 salida.estatus = "OK"
@@ -185,19 +210,26 @@ class UsuarioDAO:
             salida.mensaje = "Error al eliminar el usuario, consulte al administrador."
             return salida
 
-    def consultaGeneral(self):
+    async def consultaGeneral(self, limite: int = LIMITE_DEFECTO, cursor: str | None = None):
         salida = UsuariosSalida(estatus="", mensaje="", usuarios=[])
         try:
-            lista=list(self.db.usuariosListView.find())
+            limite = limitar(limite)
+            # Lectura directa del listado materializado, paginando sobre su índice de _id
+            lista = await self.db[COLECCION_LISTADO].find(filtroDesde(cursor), {"_id": 0}) \
+                .sort("_id", 1).limit(limite + 1).to_list(length=None)
+            lista, salida.siguiente = cortarPagina(lista, limite, lambda u: (ObjectId(u["idUsuario"]),))
             salida.estatus = "OK"
             salida.mensaje = "Listado de usuarios"
             salida.usuarios = lista
+        except CursorInvalido as ex:
+            salida.estatus = "ERROR"
+            salida.mensaje = str(ex)
         except:
             salida.estatus="ERROR"
             salida.mensaje="No se pudo mostrar la lista"
         return salida
 
-    def consultar(self, id_usuario: str) -> UsuarioDetalleSalida:
+    async def consultar(self, id_usuario: str) -> UsuarioDetalleSalida:
         salida = UsuarioDetalleSalida(estatus="", mensaje="", usuario=None)
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -209,7 +241,7 @@ class UsuarioDAO:
                 return salida
 
             # 2. Buscar el usuario en la base de datos
-            doc = self.db.usuarios.find_one({"_id": oid})
+            doc = await self.db.usuarios.find_one({"_id": oid})
             if not doc:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un usuario con id: {id_usuario}"
@@ -239,42 +271,25 @@ class UsuarioDAO:
             salida.mensaje = "Error al consultar el usuario, consulte al administrador."
             return salida
 
-    def iniciar_sesion(self, email: str, password: str) -> UsuarioDetalleSalida:
-        salida = UsuarioDetalleSalida(estatus="", mensaje="", usuario=None)
-
-        try:
-            # 1. Verificar que el email exista
-            usuario = self.db.usuarios.find_one({"email": email})
-            if not usuario:
-                salida.estatus = "ERROR"
-                salida.mensaje = "El correo electrónico no está registrado."
-                return salida
-
-            # 2. Comparar la contraseña
-            if usuario.get("password") != password:
-                salida.estatus = "ERROR"
-                salida.mensaje = "Contraseña incorrecta."
-                return salida
-
-            # 3. Verificar que el usuario esté activo
-            if not usuario.get("estatus", False):
-                salida.estatus = "ERROR"
-                salida.mensaje = "El usuario no está activo."
-                return salida
-
-            # 4. Credenciales correctas
-            salida.estatus = "OK"
-            salida.mensaje = f"Usuario {str(usuario['_id'])} autenticado con éxito."
-            salida.usuario = usuario
-            return salida
-
-        except Exception as ex:
-            print("ERROR en iniciar_sesion:", ex)
-            salida.estatus = "ERROR"
-            salida.mensaje = "Error al iniciar sesión, consulte al administrador."
-            return salida
-
-    def asignar_rol(self, id_usuario: str, nuevo_rol: str) -> Salida:
+    async def iniciar_sesion(self, email: str, password: str) -> SesionUsuario:
+        # La verificación de credenciales es la misma que usa validarUsuario en todos los servicios
+        return await iniciarSesion(self.db, email, password)
+
+    async def emitirSesion(self, email: str, password: str) -> TokenSalida:
+        # Verifica las credenciales una sola vez y entrega un token firmado para las siguientes peticiones
+        resultado = await self.iniciar_sesion(email, password)
+        if resultado.estatus != "OK" or not resultado.usuario:
+            return TokenSalida(estatus="ERROR", mensaje=resultado.mensaje)
+
+        usuario = resultado.usuario
+        return TokenSalida(
+            estatus="OK",
+            mensaje="Token emitido con éxito.",
+            token=emitirToken(str(usuario["_id"]), usuario.get("rol", "")),
+            expiraEn=DURACION_SEGUNDOS,
+        )
+
+    async def asignar_rol(self, id_usuario: str, nuevo_rol: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el ID sea un ObjectId válido
@@ -286,7 +301,7 @@ class UsuarioDAO:
                 return salida
 
             # 2. Verificar que el usuario exista
-            existente = self.db.usuarios.find_one({"_id": oid})
+            existente = await self.db.usuarios.find_one({"_id": oid})
             if not existente:
                 salida.estatus = "ERROR"
                 salida.mensaje = f"No se encontró un usuario con id: {id_usuario}"
@@ -301,10 +316,15 @@ class UsuarioDAO:
                 return salida
 
             # 4. Actualizar el rol del usuario
-            result = self.db.usuarios.update_one(
+            result = await self.db.usuarios.update_one(
                 {"_id": oid},
                 {"$set": {"rol": nuevo_rol}}
             )
+            if result.modified_count == 1:
+                await self._invalidarCredenciales(id_usuario)
+                # El listado no muestra el rol; se refresca igual por si la fila faltaba
+                await actualizarListado(self.db, oid)
+            await listaRevocacion.revocar(self.db, id_usuario)
             if result.modified_count == 1:
                 salida.estatus = "OK"
                 salida.mensaje = f"Rol de usuario {id_usuario} actualizado a '{nuevo_rol}'."
@@ -319,11 +339,11 @@ class UsuarioDAO:
             salida.mensaje = "Error al asignar rol, consulte al administrador."
             return salida
 
-    def recuperar_password(self, email: str) -> Salida:
+    async def recuperar_password(self, email: str) -> Salida:
         salida = Salida(estatus="", mensaje="")
         try:
             # 1. Verificar que el email exista
-            usuario = self.db.usuarios.find_one({"email": email})
+            usuario = await self.db.usuarios.find_one({"email": email})
             if not usuario:
                 salida.estatus = "ERROR"
                 salida.mensaje = "El correo electrónico no está registrado."
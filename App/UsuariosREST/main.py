@@ -1,10 +1,21 @@
+import sys
+from pathlib import Path
+
+# La carpeta App contiene el paquete compartido 'comun'
+RAIZ_APP = str(Path(__file__).resolve().parents[1])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
+
 import uvicorn
 from fastapi import FastAPI
 
 from dao.database import Conexion
+from dao.indices import asegurarIndices
+from comun.instrumentacion import MedicionMiddleware
 from routes import usuariosRoutes, actividadesusuariosRoutes, insumosRoutes
 
 app=FastAPI()
+app.add_middleware(MedicionMiddleware)
 app.include_router(usuariosRoutes.router)
 app.include_router(actividadesusuariosRoutes.router)
 app.include_router(insumosRoutes.router)
@@ -20,6 +31,7 @@ async def startup():
     conexion = Conexion()
     app.conexion = conexion
     app.db = conexion.getDB()
+    await asegurarIndices(app.db)
 
 @app.on_event("shutdown")
 async def shutdown():
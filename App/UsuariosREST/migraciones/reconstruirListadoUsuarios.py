@@ -0,0 +1,26 @@
+"""
+Reconstruye por completo la colección usuarios_listado a partir de usuarios.
+
+Uso (desde UsuariosREST):  python -m migraciones.reconstruirListadoUsuarios
+
+- Para recuperación: si el listado quedó desfasado (escrituras hechas fuera de UsuarioDAO,
+  restauraciones, cargas masivas) se vuelve a generar completo.
+- Se puede ejecutar con el servicio arriba: el reemplazo de la colección es atómico.
+"""
+import asyncio
+
+from dao.database import Conexion
+from dao.listadoUsuarios import reconstruirListado
+
+
+async def main():
+    conexion = Conexion()
+    try:
+        total = await reconstruirListado(conexion.getDB())
+        print(f"Listado de usuarios reconstruido: {total} usuarios.")
+    finally:
+        conexion.cerrar()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -48,6 +48,7 @@ class Salida(BaseModel):
 
 class ActividadesUsuariosSalida(Salida):
     actividades: List[ActividadUsuarioListado]
+    siguiente: Optional[str] = None
 
 
 class ActividadUsuarioDetalleSalida(Salida):
@@ -39,6 +39,7 @@ class Salida(BaseModel):
 
 class InsumosSalida(Salida):
     insumos: List[InsumoListado]
+    siguiente: Optional[str] = None
 
 
 class InsumoDetalleSalida(Salida):
@@ -40,6 +40,7 @@ class UsuarioListado(BaseModel):
 
 class UsuariosSalida(Salida):
     usuarios: list[UsuarioListado]
+    siguiente: Optional[str] = None
 
 class UsuarioDetalle(BaseModel):
     idUsuario: str
@@ -52,4 +53,9 @@ class UsuarioDetalle(BaseModel):
     rol: str
 
 class UsuarioDetalleSalida(Salida):
-    usuario: Optional[UsuarioDetalle] = None
\ No newline at end of file
+    usuario: Optional[UsuarioDetalle] = None
+
+class TokenSalida(Salida):
+    token: Optional[str] = None
+    tipo: str = "bearer"
+    expiraEn: int = 0
\ No newline at end of file
@@ -1,17 +1,19 @@
 from bson import ObjectId
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from typing import Optional
 
 from dao.usuariosDAO import UsuarioDAO
 from dao.actividadesusuariosDAO import ActividadUsuarioDAO
 from models.ActividadesUsuariosModel import ActividadUsuarioInsert, Salida, ActividadUsuarioUpdate, \
     ActividadUsuarioDetalleSalida, ActividadesUsuariosSalida
-from models.UsuariosModel import UsuarioDetalleSalida
-from routes.usuariosRoutes import validarUsuario
+from comun.seguridad.autenticacion import SesionUsuario, validarUsuario
+from comun.paginacion import LIMITE_DEFECTO, LIMITE_MAXIMO
+from comun.serializacion import respuestaRapida
 
 router = APIRouter(prefix="/actividades_usuarios", tags=["ActividadesUsuarios"])
 
 @router.post("/", response_model=Salida, summary="Registrar una nueva actividad de usuario")
-async def registrar_actividad(actividad: ActividadUsuarioInsert, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def registrar_actividad(actividad: ActividadUsuarioInsert, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Registra una nueva actividad de usuario en el sistema.
     - Verifica que los campos requeridos estén presentes y sean válidos.
@@ -21,12 +23,12 @@ async def registrar_actividad(actividad: ActividadUsuarioInsert, request: Reques
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar['rol'] in {"Administrador", "Supervisor"}:
         actividad_dao = ActividadUsuarioDAO(request.app.db)
-        return actividad_dao.registrar(actividad)
+        return await actividad_dao.registrar(actividad)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.put("/{id_actividad}", response_model=Salida, summary="Actualizar una actividad de usuario")
-async def actualizar_actividad(id_actividad: str, datos: ActividadUsuarioUpdate, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def actualizar_actividad(id_actividad: str, datos: ActividadUsuarioUpdate, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Actualiza una actividad de usuario existente.
     - Verifica que el id_actividad exista en la base de datos.
@@ -37,12 +39,12 @@ async def actualizar_actividad(id_actividad: str, datos: ActividadUsuarioUpdate,
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] in {"Administrador", "Supervisor"}:
         actividad_dao = ActividadUsuarioDAO(request.app.db)
-        return actividad_dao.actualizar(id_actividad, datos)
+        return await actividad_dao.actualizar(id_actividad, datos)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.delete("/{id_actividad}", response_model=Salida, summary="Eliminar (lógicamente) una actividad de usuario")
-async def eliminar_actividad(id_actividad: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def eliminar_actividad(id_actividad: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Elimina lógicamente una actividad de usuario (cambiando estatus a 'Cancelada').
     - Verifica que el id_actividad exista en la base de datos.
@@ -51,12 +53,12 @@ async def eliminar_actividad(id_actividad: str, request: Request, respuesta: Usu
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] == "Administrador":
         actividad_dao = ActividadUsuarioDAO(request.app.db)
-        return actividad_dao.eliminar(id_actividad)
+        return await actividad_dao.eliminar(id_actividad)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.get("/{id_actividad}", response_model=ActividadUsuarioDetalleSalida, summary="Obtener detalle de una actividad de usuario")
-async def consultar_actividad(id_actividad: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> ActividadUsuarioDetalleSalida:
+async def consultar_actividad(id_actividad: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> ActividadUsuarioDetalleSalida:
     """
     Consulta una actividad de usuario por su ID.
     - Verifica que el id_actividad exista en la base de datos.
@@ -66,19 +68,25 @@ async def consultar_actividad(id_actividad: str, request: Request, respuesta: Us
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] in {"Administrador", "Supervisor"}:
         actividad_dao = ActividadUsuarioDAO(request.app.db)
-        return actividad_dao.consultar(id_actividad)
+        return await actividad_dao.consultar(id_actividad)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.get("/", response_model=ActividadesUsuariosSalida, summary="Obtener listado de todas las actividades de usuario")
-async def listar_actividades(request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> ActividadesUsuariosSalida:
+async def listar_actividades(request: Request, limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+                             cursor: Optional[str] = None,
+                             rapido: bool = Query(False, description="Omite la revalidación de pydantic y serializa con orjson; misma forma de respuesta"),
+                             respuesta: SesionUsuario = Depends(validarUsuario)) -> ActividadesUsuariosSalida:
     """
     Retorna la lista de todas las actividades de usuario.
     - Solo usuarios con rol 'Administrador' o 'Supervisor' pueden listar actividades.
+    - Paginada: para la siguiente página enviar el valor de 'siguiente' como 'cursor'.
+    - Con 'rapido' la respuesta tiene la misma forma pero se arma sin revalidar cada fila.
     """
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] in {"Administrador", "Supervisor"}:
         actividad_dao = ActividadUsuarioDAO(request.app.db)
-        return actividad_dao.consultaGeneral()
+        resultado = await actividad_dao.consultaGeneral(limite, cursor, rapido)
+        return respuestaRapida(resultado) if rapido else resultado
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
\ No newline at end of file
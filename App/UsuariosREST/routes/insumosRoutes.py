@@ -1,14 +1,16 @@
-from fastapi import APIRouter, Request, Depends, HTTPException
+from fastapi import APIRouter, Request, Response, Depends, HTTPException, Query
+from typing import Optional
 
 from dao.insumosDAO import InsumoDAO
 from models.InsumosModel import InsumoInsert, Salida, InsumoUpdate, InsumoDetalleSalida, InsumosSalida
-from models.UsuariosModel import UsuarioDetalleSalida
-from routes.usuariosRoutes import validarUsuario
+from comun.seguridad.autenticacion import SesionUsuario, validarUsuario
+from comun.paginacion import LIMITE_DEFECTO, LIMITE_MAXIMO
+from comun.versiones import etiquetaFuerte, coincideEtiqueta, noModificado
 
 router = APIRouter(prefix="/insumos", tags=["Insumos"])
 
 @router.post("/", response_model=Salida, summary="Registrar un nuevo insumo")
-async def registrar_insumo(insumo: InsumoInsert, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def registrar_insumo(insumo: InsumoInsert, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Registra un nuevo insumo en el sistema.
     - Verifica que los campos obligatorios estén presentes y sean válidos.
@@ -20,12 +22,12 @@ async def registrar_insumo(insumo: InsumoInsert, request: Request, respuesta: Us
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] == "Administrador":
         insumo_dao = InsumoDAO(request.app.db)
-        return insumo_dao.registrar(insumo)
+        return await insumo_dao.registrar(insumo)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.put("/{id_insumo}", response_model=Salida, summary="Editar un insumo existente")
-async def actualizar_insumo(id_insumo: str, insumo_update: InsumoUpdate, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def actualizar_insumo(id_insumo: str, insumo_update: InsumoUpdate, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Actualiza un insumo existente.
     - Verifica que el insumo con el ID proporcionado exista.
@@ -39,12 +41,12 @@ async def actualizar_insumo(id_insumo: str, insumo_update: InsumoUpdate, request
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] == "Administrador":
         insumo_dao = InsumoDAO(request.app.db)
-        return insumo_dao.actualizar(id_insumo, insumo_update)
+        return await insumo_dao.actualizar(id_insumo, insumo_update)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.delete("/{id_insumo}", response_model=Salida, summary="Eliminar lógicamente un insumo")
-async def eliminar_insumo(id_insumo: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def eliminar_insumo(id_insumo: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Elimina lógicamente un insumo existente (cambia su estatus a 'Inactivo').
     - Verifica que el insumo con el ID proporcionado exista.
@@ -54,12 +56,12 @@ async def eliminar_insumo(id_insumo: str, request: Request, respuesta: UsuarioDe
     usuar = respuesta.usuario
     if respuesta.estatus == "OK" and usuar["rol"] == "Administrador":
         insumo_dao = InsumoDAO(request.app.db)
-        return insumo_dao.eliminar(id_insumo)
+        return await insumo_dao.eliminar(id_insumo)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.get("/{id_insumo}", response_model=InsumoDetalleSalida, summary="Obtener detalles de un insumo")
-async def obtener_insumo(id_insumo: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> InsumoDetalleSalida:
+async def obtener_insumo(id_insumo: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> InsumoDetalleSalida:
     """
     Consulta los detalles de un insumo específico por su ID.
     - Verifica que el ID proporcionado sea válido.
@@ -68,18 +70,25 @@ async def obtener_insumo(id_insumo: str, request: Request, respuesta: UsuarioDet
     """
     if respuesta.estatus == "OK":
         insumo_dao = InsumoDAO(request.app.db)
-        return insumo_dao.obtener_por_id(id_insumo)
+        return await insumo_dao.obtener_por_id(id_insumo)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
 
 @router.get("/", response_model=InsumosSalida, summary="Consultar listado general de insumos")
-async def obtener_lista_insumos(request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> InsumosSalida:
+async def obtener_lista_insumos(request: Request, response: Response, limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+                               cursor: Optional[str] = None, respuesta: SesionUsuario = Depends(validarUsuario)) -> InsumosSalida:
     """
     Consulta general de todos los insumos activos.
     - Usuarios con cualquier rol autenticado pueden consultar insumos.
+    - Paginada: para la siguiente página enviar el valor de 'siguiente' como 'cursor'.
+    - Devuelve ETag; con If-None-Match igual responde 304 sin cuerpo.
     """
     if respuesta.estatus == "OK":
         insumo_dao = InsumoDAO(request.app.db)
-        return insumo_dao.consultaGeneral()
+        etiqueta = etiquetaFuerte("insumos", await insumo_dao.version(), limite, cursor)
+        if coincideEtiqueta(request, etiqueta):
+            return noModificado(etiqueta)
+        response.headers["ETag"] = etiqueta
+        return await insumo_dao.consultaGeneral(limite, cursor)
     else:
         raise HTTPException(status_code=403, detail="Sin autorización")
\ No newline at end of file
@@ -1,22 +1,17 @@
 from bson import ObjectId
-from fastapi import APIRouter, Request, Depends, HTTPException
-from typing import Any
-
-from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from typing import Any, Optional
 
 from dao.usuariosDAO import UsuarioDAO
-from models.UsuariosModel import UsuarioInsert, Salida, UsuarioUpdate, UsuariosSalida, UsuarioDetalleSalida
+from models.UsuariosModel import UsuarioInsert, Salida, UsuarioUpdate, UsuariosSalida, UsuarioDetalleSalida, TokenSalida
+from comun.seguridad.autenticacion import SesionUsuario, validarUsuario
+from comun.seguridad.cacheAutenticacion import cacheAutenticacion
+from comun.paginacion import LIMITE_DEFECTO, LIMITE_MAXIMO
 
 router = APIRouter(prefix="/usuarios", tags=["Usuarios"])
 
-security = HTTPBasic()
-
-async def validarUsuario(request: Request, credenciales: HTTPBasicCredentials=Depends(security)) -> UsuarioDetalleSalida:
-    usuarioDAO = UsuarioDAO(request.app.db)
-    return usuarioDAO.iniciar_sesion(credenciales.username, credenciales.password)
-
 @router.post("/", response_model=Salida, summary="Registrar un nuevo usuario")
-async def registrar_usuario(usuario: UsuarioInsert, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def registrar_usuario(usuario: UsuarioInsert, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     Registra un nuevo usuario en el sistema.
     - Verifica que el email no exista.
@@ -26,12 +21,12 @@ async def registrar_usuario(usuario: UsuarioInsert, request: Request, respuesta:
     usuar = respuesta.usuario
     if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
         usuario_dao = UsuarioDAO(request.app.db)
-        return usuario_dao.registrar(usuario)
+        return await usuario_dao.registrar(usuario)
     else:
         raise HTTPException(status_code=404, detail="Sin autorizacion")
 
 @router.put("/{idUsuario}", response_model=Salida, summary="Actualizar un usuario existente")
-async def actualizar_usuario(idUsuario: str, datos: UsuarioUpdate, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def actualizar_usuario(idUsuario: str, datos: UsuarioUpdate, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     - Verifica que el usuario con el id especificado exista.
     - Valida que el email no esté en uso por otro usuario si se modifica.
@@ -42,16 +37,16 @@ async def actualizar_usuario(idUsuario: str, datos: UsuarioUpdate, request: Requ
     if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
         usuario_dao = UsuarioDAO(request.app.db)
         print(usuar)
-        return usuario_dao.actualizar(idUsuario, datos)
+        return await usuario_dao.actualizar(idUsuario, datos)
     else:
         if respuesta.estatus == 'OK' and usuar['_id'] == ObjectId(idUsuario):
             usuario_dao = UsuarioDAO(request.app.db)
-            return usuario_dao.actualizar(idUsuario, datos)
+            return await usuario_dao.actualizar(idUsuario, datos)
         else:
             raise HTTPException(status_code=404, detail="Sin autorizacion")
 
 @router.delete("/{idUsuario}", response_model=Salida, summary="Desactivar un usuario por su ID")
-async def eliminar_usuario(idUsuario: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Salida:
+async def eliminar_usuario(idUsuario: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> Salida:
     """
     - Verifica que el ID proporcionado sea válido.
     - Comprueba que el usuario exista.
@@ -60,24 +55,38 @@ async def eliminar_usuario(idUsuario: str, request: Request, respuesta: UsuarioD
     usuar = respuesta.usuario
     if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
         usuario_dao = UsuarioDAO(request.app.db)
-        return usuario_dao.eliminar(idUsuario)
+        return await usuario_dao.eliminar(idUsuario)
     else:
         raise HTTPException(status_code=404, detail="Sin autorizacion")
 
 @router.get("/", response_model=UsuariosSalida, summary="Consultar lista de usuarios")
-async def consultaUsuarios(request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> Any:
+async def consultaUsuarios(request: Request, limite: int = Query(LIMITE_DEFECTO, ge=1, le=LIMITE_MAXIMO),
+                           cursor: Optional[str] = None, respuesta: SesionUsuario = Depends(validarUsuario)) -> Any:
     """
     - Recupera la lista de usuarios con campos: idUsuario, nombre, estatus y email.
+    - Paginada: para la siguiente página enviar el valor de 'siguiente' como 'cursor'.
     """
     usuar = respuesta.usuario
     if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
         usuario_DAO = UsuarioDAO(request.app.db)
-        return usuario_DAO.consultaGeneral()
+        return await usuario_DAO.consultaGeneral(limite, cursor)
+    else:
+        raise HTTPException(status_code=404, detail="Sin autorizacion")
+
+@router.get("/autenticacion/estadisticas", summary="Estadísticas de la caché de autenticación")
+async def estadisticas_autenticacion(respuesta: SesionUsuario = Depends(validarUsuario)) -> dict:
+    """
+    - Devuelve entradas, aciertos y fallos de la caché de credenciales verificadas.
+    - Solo disponible para usuarios con rol 'Administrador'.
+    """
+    usuar = respuesta.usuario
+    if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
+        return cacheAutenticacion.estadisticas()
     else:
         raise HTTPException(status_code=404, detail="Sin autorizacion")
 
 @router.get("/{idUsuario}", response_model=UsuarioDetalleSalida, summary="Obtener un usuario por ID")
-async def obtener_usuario(idUsuario: str, request: Request, respuesta: UsuarioDetalleSalida = Depends(validarUsuario)) -> UsuarioDetalleSalida:
+async def obtener_usuario(idUsuario: str, request: Request, respuesta: SesionUsuario = Depends(validarUsuario)) -> UsuarioDetalleSalida:
     """
     - Verifica que el ID proporcionado sea válido.
     - Comprueba que el usuario exista en la base de datos.
@@ -86,11 +95,11 @@ async def obtener_usuario(idUsuario: str, request: Request, respuesta: UsuarioDe
     usuar = respuesta.usuario
     if respuesta.estatus == 'OK' and usuar['rol'] == 'Administrador':
         usuario_dao = UsuarioDAO(request.app.db)
-        return usuario_dao.consultar(idUsuario)
+        return await usuario_dao.consultar(idUsuario)
     else:
         if respuesta.estatus == 'OK' and usuar['_id'] == ObjectId(idUsuario):
             usuario_dao = UsuarioDAO(request.app.db)
-            return usuario_dao.consultar(idUsuario)
+            return await usuario_dao.consultar(idUsuario)
         else:
             raise HTTPException(status_code=404, detail="Sin autorizacion")
 
@@ -102,7 +111,20 @@ async def iniciar_sesion(correo: str, contrasena: str, request: Request) -> Sali
     - Comprueba que el usuario esté activo (estatus=True).
     """
     usuario_dao = UsuarioDAO(request.app.db)
-    return usuario_dao.iniciar_sesion(email=correo, password=contrasena)
+    return await usuario_dao.iniciar_sesion(email=correo, password=contrasena)
+
+@router.post("/token", response_model=TokenSalida, summary="Obtener un token de sesión")
+async def emitir_token(correo: str, contrasena: str, request: Request) -> TokenSalida:
+    """
+    - Verifica las credenciales igual que /login.
+    - Devuelve un token firmado para enviar como 'Authorization: Bearer <token>'.
+    - El token expira y se revoca al desactivar al usuario o cambiar su rol o contraseña.
+    """
+    usuario_dao = UsuarioDAO(request.app.db)
+    salida = await usuario_dao.emitirSesion(email=correo, password=contrasena)
+    if salida.estatus != "OK":
+        raise HTTPException(status_code=401, detail=salida.mensaje)
+    return salida
 
 @router.post("/recuperar-password", response_model=Salida, summary="Recuperar contraseña por email")
 async def recuperar_password(email: str, request: Request) -> Salida:
@@ -111,4 +133,4 @@ async def recuperar_password(email: str, request: Request) -> Salida:
     - Devuelve la contraseña si el email está registrado.
     """
     usuario_dao = UsuarioDAO(request.app.db)
-    return usuario_dao.recuperar_password(email)
\ No newline at end of file
+    return await usuario_dao.recuperar_password(email)
\ No newline at end of file
@@ -0,0 +1,245 @@
+"""
+Benchmark de latencia de los endpoints de lectura de cada servicio.
+
+Uso (desde App, con una base local ya sembrada con BD/generarDatos.py):
+    python -m benchmarks.ejecutarBenchmarks --email admin@example.com --password ... --peticiones 200 --concurrencia 16
+
+- Cada app se levanta en el mismo proceso (startup incluido) y se le habla por ASGI con httpx, sin red.
+- Se recorren todas las rutas GET; los parámetros de ruta se toman de documentos reales de la base.
+  Las rutas de escritura no se ejecutan para no alterar los datos sembrados.
+- Por ruta se registra p50/p95/p99, peticiones por segundo, errores y consultas a Mongo por petición
+  (del encabezado Server-Timing que agrega comun/instrumentacion.py).
+- El resultado se guarda como línea base en JSON y se compara contra la corrida anterior;
+  si alguna ruta empeora más de la tolerancia el proceso termina con código 1.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import re
+import secrets
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode
+
+import httpx
+
+from gateway.cargador import SERVICIOS, cargarServicio
+
+# Todas las apps cargadas deben firmar y validar tokens con el mismo secreto
+os.environ.setdefault("AGRO_TOKEN_SECRETO", secrets.token_hex(32))
+
+LINEA_BASE = Path(__file__).resolve().parent / "resultados" / "lineaBase.json"
+
+# Rutas que recorren colecciones completas o no terminan (SSE); no son útiles como medición de latencia
+RUTAS_EXCLUIDAS = {"/cultivos/exportar", "/alertas/stream"}
+# Radio para medir /cultivos/cercanos
+KM_CERCANIA = 50
+
+PATRON_SERVER_TIMING = re.compile(r'db;dur=([\d.]+);desc="consultas=(\d+)')
+
+
+async def _resolverParametros(db) -> dict:
+    # Un documento real por tipo de id para llenar los parámetros de las rutas
+    parametros = {}
+    cultivo = (await db.cultivos.find_one({"registroActivo": True, "aplicacionesInsumos.0": {"$exists": True}})
+               or await db.cultivos.find_one({"registroActivo": True}))
+    if cultivo:
+        parametros["id_cultivo"] = parametros["idCultivo"] = str(cultivo["_id"])
+        if cultivo.get("aplicacionesInsumos"):
+            parametros["id_aplicacionInsumo"] = str(cultivo["aplicacionesInsumos"][0]["_id"])
+        bucket = await db.riegos_buckets.find_one({"idCultivo": cultivo["_id"], "conteo": {"$gt": 0}})
+        if bucket:
+            parametros["id_riego"] = bucket["riegos"][0]["idRiego"]
+        seguimiento = await db.seguimiento_cultivo.find_one({"idCultivo": cultivo["_id"]}, {"_id": 1})
+        if seguimiento:
+            parametros["id_seguimiento"] = str(seguimiento["_id"])
+
+    # Búsqueda por cercanía alrededor de un cultivo que sí tiene punto GeoJSON
+    ubicado = await db.cultivos.find_one({"registroActivo": True, "ubicacion.geo": {"$exists": True}},
+                                         {"ubicacion.geo": 1})
+    if ubicado:
+        parametros["longitud"], parametros["latitud"] = (str(c) for c in ubicado["ubicacion"]["geo"]["coordinates"])
+        parametros["km"] = str(KM_CERCANIA)
+
+    for parametro, coleccion in (("idUsuario", "usuarios"), ("id_insumo", "insumos"),
+                                 ("id_actividad", "actividades_usuarios"), ("idHistorial", "historial_suelo"),
+                                 ("id_alerta", "alertas")):
+        doc = await db[coleccion].find_one({}, {"_id": 1})
+        if doc:
+            parametros[parametro] = str(doc["_id"])
+    return parametros
+
+
+def _rutasGet(app, parametros: dict) -> tuple:
+    rutas, omitidas = [], []
+    for ruta in app.routes:
+        if "GET" not in getattr(ruta, "methods", set()) or ruta.path in RUTAS_EXCLUIDAS:
+            continue
+        if not getattr(ruta, "include_in_schema", True):
+            continue
+        consulta = [campo.alias for campo in ruta.dependant.query_params if campo.required]
+        faltantes = [p for p in [*ruta.param_convertors, *consulta] if p not in parametros]
+        if faltantes:
+            omitidas.append(f"{ruta.path} (sin valor para {', '.join(faltantes)})")
+            continue
+        url = ruta.path.format(**{p: parametros[p] for p in ruta.param_convertors})
+        if consulta:
+            url += "?" + urlencode({p: parametros[p] for p in consulta})
+        rutas.append((ruta.path, url))
+    return rutas, omitidas
+
+
+def _percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = min(len(ordenados) - 1, max(0, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+async def medirRuta(cliente, url: str, peticiones: int, concurrencia: int) -> dict:
+    latencias, consultas, tiempos_db, errores = [], [], [], 0
+
+    async def trabajador(cantidad: int):
+        nonlocal errores
+        for _ in range(cantidad):
+            inicio = time.perf_counter()
+            respuesta = await cliente.get(url)
+            latencias.append((time.perf_counter() - inicio) * 1000)
+            if respuesta.status_code >= 400:
+                errores += 1
+            coincidencia = PATRON_SERVER_TIMING.search(respuesta.headers.get("server-timing", ""))
+            if coincidencia:
+                tiempos_db.append(float(coincidencia.group(1)))
+                consultas.append(int(coincidencia.group(2)))
+
+    await cliente.get(url)  # calentamiento: cachés, conexiones del pool
+    inicio = time.perf_counter()
+    reparto = [peticiones // concurrencia + (1 if i < peticiones % concurrencia else 0) for i in range(concurrencia)]
+    await asyncio.gather(*(trabajador(n) for n in reparto if n))
+    duracion = time.perf_counter() - inicio
+
+    return {
+        "peticiones": len(latencias),
+        "errores": errores,
+        "p50_ms": round(_percentil(latencias, 50), 2),
+        "p95_ms": round(_percentil(latencias, 95), 2),
+        "p99_ms": round(_percentil(latencias, 99), 2),
+        "peticiones_por_segundo": round(len(latencias) / duracion, 1) if duracion else 0.0,
+        "consultas_por_peticion": round(statistics.mean(consultas), 2) if consultas else None,
+        "db_ms_por_peticion": round(statistics.mean(tiempos_db), 2) if tiempos_db else None,
+    }
+
+
+async def _token(app, email: str, password: str) -> str | None:
+    transporte = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark") as cliente:
+        respuesta = await cliente.post("/usuarios/token", params={"correo": email, "contrasena": password})
+    return respuesta.json().get("token") if respuesta.status_code == 200 else None
+
+
+async def medirServicio(servicio: str, argumentos, encabezados: dict) -> dict:
+    app = cargarServicio(servicio)
+    resultados = {}
+    async with app.router.lifespan_context(app):
+        if servicio == "UsuariosREST" and not encabezados.get("authorization", "").startswith("Bearer"):
+            token = await _token(app, argumentos.email, argumentos.password)
+            if token:
+                encabezados["authorization"] = f"Bearer {token}"
+        parametros = await _resolverParametros(app.db)
+        rutas, omitidas = _rutasGet(app, parametros)
+        for ruta in omitidas:
+            print(f"  omitida {servicio} {ruta}")
+
+        transporte = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transporte, base_url="http://benchmark",
+                                     headers=encabezados, timeout=None) as cliente:
+            for plantilla, url in rutas:
+                if argumentos.filtro and not re.search(argumentos.filtro, plantilla):
+                    continue
+                medicion = await medirRuta(cliente, url, argumentos.peticiones, argumentos.concurrencia)
+                clave = f"{servicio} GET {plantilla}"
+                resultados[clave] = medicion
+                print(f"  {clave}: p50={medicion['p50_ms']} p95={medicion['p95_ms']} p99={medicion['p99_ms']} ms, "
+                      f"{medicion['peticiones_por_segundo']} req/s, consultas={medicion['consultas_por_peticion']}, "
+                      f"errores={medicion['errores']}")
+    return resultados
+
+
+def comparar(anterior: dict, actual: dict, tolerancia: float) -> list:
+    regresiones = []
+    for clave, medicion in actual.items():
+        previa = anterior.get(clave)
+        if previa is None:
+            continue
+        if previa["p95_ms"] and medicion["p95_ms"] > previa["p95_ms"] * (1 + tolerancia):
+            regresiones.append(f"{clave}: p95 {previa['p95_ms']} -> {medicion['p95_ms']} ms")
+        if (previa.get("consultas_por_peticion") is not None and medicion.get("consultas_por_peticion") is not None
+                and medicion["consultas_por_peticion"] > previa["consultas_por_peticion"]):
+            regresiones.append(f"{clave}: consultas {previa['consultas_por_peticion']} -> "
+                               f"{medicion['consultas_por_peticion']} por petición")
+    return regresiones
+
+
+async def ejecutar(argumentos) -> int:
+    encabezados = {}
+    if argumentos.token:
+        encabezados["authorization"] = f"Bearer {argumentos.token}"
+    elif argumentos.email and argumentos.password:
+        # Basic queda como respaldo hasta que UsuariosREST emita un token
+        basico = base64.b64encode(f"{argumentos.email}:{argumentos.password}".encode("utf-8")).decode("ascii")
+        encabezados["authorization"] = f"Basic {basico}"
+
+    resultados = {}
+    for servicio in argumentos.servicios:
+        print(f"{servicio}:")
+        try:
+            resultados.update(await medirServicio(servicio, argumentos, encabezados))
+        except Exception as ex:
+            print(f"  no se pudo medir {servicio}: {ex}")
+    if not encabezados:
+        print("Aviso: sin credenciales; las rutas protegidas responderán 401")
+
+    ruta_base = Path(argumentos.linea_base)
+    regresiones = []
+    if ruta_base.exists():
+        anterior = json.loads(ruta_base.read_text(encoding="utf-8")).get("resultados", {})
+        regresiones = comparar(anterior, resultados, argumentos.tolerancia)
+        for linea in regresiones:
+            print(f"REGRESIÓN {linea}")
+        if not regresiones:
+            print("Sin regresiones contra la corrida anterior.")
+
+    if not argumentos.no_guardar:
+        ruta_base.parent.mkdir(parents=True, exist_ok=True)
+        ruta_base.write_text(json.dumps({
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "peticiones": argumentos.peticiones,
+            "concurrencia": argumentos.concurrencia,
+            "resultados": resultados,
+        }, indent=2, ensure_ascii=False), encoding="utf-8")
+    return 1 if regresiones else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de latencia de los servicios de AgroApp.")
+    parser.add_argument("--servicios", nargs="+", default=list(SERVICIOS), choices=SERVICIOS)
+    parser.add_argument("--email", default=os.environ.get("AGRO_BENCH_EMAIL"))
+    parser.add_argument("--password", default=os.environ.get("AGRO_BENCH_PASSWORD"))
+    parser.add_argument("--token", default=None, help="Token Bearer ya emitido (en lugar de email/password)")
+    parser.add_argument("--peticiones", type=int, default=200, help="Peticiones por ruta")
+    parser.add_argument("--concurrencia", type=int, default=16)
+    parser.add_argument("--filtro", default=None, help="Expresión regular para elegir rutas")
+    parser.add_argument("--linea-base", default=str(LINEA_BASE))
+    parser.add_argument("--tolerancia", type=float, default=0.2, help="Aumento de p95 permitido (0.2 = 20%%)")
+    parser.add_argument("--no-guardar", action="store_true", help="Compara sin reemplazar la línea base")
+    sys.exit(asyncio.run(ejecutar(parser.parse_args())))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+"""
+Código compartido por los cuatro servicios y el gateway: paginación, serialización, versiones (ETag),
+instrumentación, verificación de índices, catálogo de insumos en memoria y seguridad (autenticación y tokens).
+
+Cada servicio agrega la carpeta App a sys.path al arrancar (main.py y migraciones) para importarlo
+como 'comun', igual que lo hace el gateway.
+"""
@@ -0,0 +1,106 @@
+import asyncio
+import bisect
+import time
+
+from comun.versiones import versionGlobal
+from comun.instrumentacion import medirMetodos
+
+MAX_ENTRADAS = 5000
+TTL_SEGUNDOS = 300
+VERIFICAR_CADA = 5
+CLAVE_VERSION = "insumos"
+
+
+@medirMetodos
+class CatalogoInsumos:
+    """
+    Copia en memoria del catálogo de insumos (colección pequeña que cambia poco).
+    - Se carga completo con una sola consulta, ordenado por _id, y se reutiliza hasta que vence el TTL.
+    - Lo usan UsuariosREST (InsumoDAO) y CultivosREST (aplicaciones y existencias); quien escribe lo invalida.
+      Los demás procesos notan el cambio por la versión CLAVE_VERSION de la colección versiones,
+      revisada como máximo cada VERIFICAR_CADA segundos.
+    - Si el catálogo pasa de MAX_ENTRADAS no se guarda y los métodos devuelven None: se consulta Mongo.
+    """
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl_segundos: float = TTL_SEGUNDOS,
+                 verificar_cada: float = VERIFICAR_CADA):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.verificar_cada = verificar_cada
+        self._candado = asyncio.Lock()
+        self._docs = None        # lista ordenada por _id
+        self._ids = []
+        self._por_id = {}
+        self._version = None
+        self._expira = 0.0
+        self._verificado = 0.0
+        self._demasiado_grande = False
+        self.aciertos = 0
+        self.fallos = 0
+
+    def invalidar(self):
+        self._docs = None
+        self._ids = []
+        self._por_id = {}
+        self._demasiado_grande = False
+        self._expira = 0.0
+
+    async def _vigente(self, db) -> bool:
+        ahora = time.monotonic()
+        if ahora >= self._expira:
+            return False
+        if ahora - self._verificado >= self.verificar_cada:
+            if await versionGlobal(db, CLAVE_VERSION) != self._version:
+                # Otro proceso escribió: la copia queda vencida hasta recargarla
+                self._expira = 0.0
+                return False
+            self._verificado = ahora
+        return True
+
+    async def _cargar(self, db) -> bool:
+        # Devuelve True si el catálogo quedó en memoria
+        if await self._vigente(db):
+            self.aciertos += 1
+            return not self._demasiado_grande
+        async with self._candado:
+            # Otra petición pudo haberlo cargado mientras se esperaba el candado
+            if await self._vigente(db):
+                self.aciertos += 1
+                return not self._demasiado_grande
+            self.fallos += 1
+            version = await versionGlobal(db, CLAVE_VERSION)
+            docs = await db.insumos.find({}).sort("_id", 1).limit(self.max_entradas + 1).to_list(length=None)
+            self.invalidar()
+            if len(docs) > self.max_entradas:
+                self._demasiado_grande = True
+            else:
+                self._docs = docs
+                self._ids = [doc["_id"] for doc in docs]
+                self._por_id = {doc["_id"]: doc for doc in docs}
+            self._version = version
+            self._verificado = time.monotonic()
+            self._expira = self._verificado + self.ttl_segundos
+            return not self._demasiado_grande
+
+    async def pagina(self, db, desde, cantidad: int) -> list | None:
+        # Documentos con _id mayor a 'desde', en orden de _id, como haría find().sort().limit()
+        if not await self._cargar(db):
+            return None
+        inicio = bisect.bisect_right(self._ids, desde) if desde is not None else 0
+        return self._docs[inicio:inicio + cantidad]
+
+    async def cargar(self, db, ids) -> dict | None:
+        # Misma forma que CargadorReferencias.cargar: {oid: documento o None}
+        if not await self._cargar(db):
+            return None
+        return {oid: self._por_id.get(oid) for oid in ids}
+
+    def estadisticas(self) -> dict:
+        return {
+            "entradas": len(self._por_id),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+        }
+
+
+catalogoInsumos = CatalogoInsumos()
@@ -0,0 +1,62 @@
+"""
+Verificación de índices contra un registro declarativo.
+- Cada servicio declara en dao/indices.py los índices que necesita (INDICES) y los aplica al arrancar.
+- Cada índice lleva nombre fijo para poder verificarlo contra lo que ya existe en la base.
+"""
+
+# Opciones que se comparan para detectar diferencias
+OPCIONES_VERIFICADAS = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds", "2dsphereIndexVersion")
+
+
+def _difiere(spec: dict, existente: dict) -> list:
+    diferencias = []
+    if list(existente.get("key", [])) != [tuple(llave) for llave in spec["llaves"]]:
+        diferencias.append(f"llaves {existente.get('key')} != {spec['llaves']}")
+    for opcion in OPCIONES_VERIFICADAS:
+        esperado = spec.get("opciones", {}).get(opcion)
+        actual = existente.get(opcion)
+        if opcion == "2dsphereIndexVersion" and esperado is None:
+            continue
+        if esperado != actual and not (esperado is None and actual is False):
+            diferencias.append(f"{opcion}: {actual} != {esperado}")
+    return diferencias
+
+
+async def aplicarRegistro(db, registro: dict) -> list:
+    """
+    Crea los índices del registro que falten y regresa el reporte de los que difieren.
+    - Es idempotente: un índice igual al registrado no se toca.
+    - Un índice con el mismo nombre pero distinta definición no se borra; solo se reporta.
+    """
+    reporte = []
+    for coleccion, specs in registro.items():
+        try:
+            existentes = await db[coleccion].index_information()
+        except Exception as ex:
+            reporte.append(f"{coleccion}: no se pudieron leer los índices ({ex})")
+            continue
+
+        for spec in specs:
+            existente = existentes.get(spec["nombre"])
+            if existente is not None:
+                diferencias = _difiere(spec, existente)
+                if diferencias:
+                    reporte.append(f"{coleccion}.{spec['nombre']} difiere: {'; '.join(diferencias)}")
+                continue
+            try:
+                await db[coleccion].create_index(spec["llaves"], name=spec["nombre"], **spec.get("opciones", {}))
+                print(f"Índice creado: {coleccion}.{spec['nombre']}")
+            except Exception as ex:
+                reporte.append(f"{coleccion}.{spec['nombre']} no se pudo crear: {ex}")
+
+        registrados = {spec["nombre"] for spec in specs} | {"_id_"}
+        for nombre in existentes:
+            if nombre not in registrados:
+                reporte.append(f"{coleccion}.{nombre} existe en la base pero no está en el registro")
+    return reporte
+
+
+def imprimirReporte(reporte: list) -> list:
+    for linea in reporte:
+        print("Índices:", linea)
+    return reporte
@@ -0,0 +1,181 @@
+"""
+Medición de los comandos de Mongo por petición HTTP (Server-Timing y advertencias de N+1).
+- El listener del driver corre en el hilo de Motor; Motor copia el contexto (contextvars) a ese hilo,
+  así que la medición y el método del DAO fijados del lado del event loop llegan al listener.
+"""
+import functools
+import inspect
+import json
+import os
+import threading
+from collections import Counter
+from contextvars import ContextVar
+
+from pymongo import monitoring
+
+# Veces que una misma forma de consulta puede repetirse en una petición antes de advertir un posible N+1
+UMBRAL_REPETICIONES = int(os.environ.get("AGRO_UMBRAL_N1", "5"))
+
+# Comandos del driver que no son consultas de la aplicación
+COMANDOS_IGNORADOS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "saslStart", "saslContinue",
+                      "buildInfo", "getLastError"}
+
+_medicionActual: ContextVar = ContextVar("medicionPeticion", default=None)
+# Métodos del DAO en curso, del más externo al más interno; los fija medirMetodos en el event loop
+_metodosActuales: ContextVar = ContextVar("metodosDAO", default=())
+
+
+def _forma(valor):
+    # La estructura de la consulta sin los valores concretos
+    if isinstance(valor, dict):
+        return {llave: _forma(v) for llave, v in valor.items()}
+    if isinstance(valor, (list, tuple)) and valor and all(isinstance(v, dict) for v in valor):
+        return [_forma(v) for v in valor]
+    return "?"
+
+
+def formaConsulta(nombre: str, comando) -> str:
+    coleccion = comando.get(nombre)
+    detalle = {llave: comando[llave] for llave in ("filter", "pipeline", "updates", "deletes", "query", "sort")
+               if llave in comando}
+    return f"{nombre} {coleccion} {json.dumps(_forma(detalle), sort_keys=True)}"
+
+
+def _medido(metodo):
+    if inspect.isasyncgenfunction(metodo):
+        @functools.wraps(metodo)
+        async def generador(*args, **kwargs):
+            # El nombre se fija solo mientras avanza el generador; no se filtra al código que lo consume
+            interno = metodo(*args, **kwargs)
+            try:
+                while True:
+                    token = _metodosActuales.set(_metodosActuales.get() + (metodo.__qualname__,))
+                    try:
+                        valor = await interno.__anext__()
+                    except StopAsyncIteration:
+                        return
+                    finally:
+                        _metodosActuales.reset(token)
+                    yield valor
+            finally:
+                await interno.aclose()
+        return generador
+
+    @functools.wraps(metodo)
+    async def envoltura(*args, **kwargs):
+        token = _metodosActuales.set(_metodosActuales.get() + (metodo.__qualname__,))
+        try:
+            return await metodo(*args, **kwargs)
+        finally:
+            _metodosActuales.reset(token)
+    return envoltura
+
+
+def medirMetodos(clase):
+    """Decorador de clase: las consultas de cada método async del DAO se atribuyen a ese método."""
+    for nombre, metodo in list(vars(clase).items()):
+        if inspect.iscoroutinefunction(metodo) or inspect.isasyncgenfunction(metodo):
+            setattr(clase, nombre, _medido(metodo))
+    return clase
+
+
+def metodoActual() -> str:
+    return " > ".join(_metodosActuales.get()) or "desconocido"
+
+
+def _documentos(respuesta) -> int:
+    cursor = respuesta.get("cursor") if isinstance(respuesta, dict) else None
+    if cursor:
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    return respuesta.get("n", 0) if isinstance(respuesta, dict) else 0
+
+
+class MedicionPeticion:
+    """Comandos de Mongo atribuidos a una petición HTTP."""
+
+    def __init__(self):
+        self.consultas = 0
+        self.tiempo_ms = 0.0
+        self.documentos = 0
+        self.formas = Counter()
+        self.metodos = {}
+        self._candado = threading.Lock()
+
+    def registrar(self, forma: str | None, metodo: str | None, duracion_ms: float, documentos: int):
+        with self._candado:
+            self.consultas += 1
+            self.tiempo_ms += duracion_ms
+            self.documentos += documentos
+            if forma is not None:
+                self.formas[forma] += 1
+                self.metodos.setdefault(forma, metodo)
+
+    def serverTiming(self) -> str:
+        return f'db;dur={self.tiempo_ms:.2f};desc="consultas={self.consultas} documentos={self.documentos}"'
+
+    def repetidas(self, umbral: int = UMBRAL_REPETICIONES) -> list:
+        return [(forma, veces, self.metodos.get(forma)) for forma, veces in self.formas.items() if veces > umbral]
+
+
+class MonitorComandos(monitoring.CommandListener):
+
+    def __init__(self):
+        self._pendientes = {}
+
+    def started(self, event):
+        medicion = _medicionActual.get()
+        if medicion is None or event.command_name in COMANDOS_IGNORADOS:
+            return
+        # getMore continúa una consulta ya contada: suma tiempo pero no es una forma nueva
+        forma = None if event.command_name == "getMore" else formaConsulta(event.command_name, event.command)
+        metodo = metodoActual() if forma is not None else None
+        self._pendientes[(event.connection_id, event.request_id)] = (medicion, forma, metodo)
+
+    def succeeded(self, event):
+        pendiente = self._pendientes.pop((event.connection_id, event.request_id), None)
+        if pendiente is not None:
+            medicion, forma, metodo = pendiente
+            medicion.registrar(forma, metodo, event.duration_micros / 1000, _documentos(event.reply))
+
+    def failed(self, event):
+        pendiente = self._pendientes.pop((event.connection_id, event.request_id), None)
+        if pendiente is not None:
+            medicion, forma, metodo = pendiente
+            medicion.registrar(forma, metodo, event.duration_micros / 1000, 0)
+
+
+monitorComandos = MonitorComandos()
+
+
+class MedicionMiddleware:
+    """
+    Middleware ASGI que mide los comandos de Mongo de cada petición.
+    - Agrega el encabezado Server-Timing con el tiempo total en la base y el número de consultas.
+    - Advierte cuando una misma forma de consulta se repite más de UMBRAL_REPETICIONES veces (posible N+1).
+    """
+
+    def __init__(self, app, umbral: int = UMBRAL_REPETICIONES):
+        self.app = app
+        self.umbral = umbral
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        medicion = MedicionPeticion()
+        token = _medicionActual.set(medicion)
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                encabezados = list(mensaje.get("headers", []))
+                encabezados.append((b"server-timing", medicion.serverTiming().encode("latin-1")))
+                mensaje = {**mensaje, "headers": encabezados}
+            await send(mensaje)
+
+        try:
+            await self.app(scope, receive, enviar)
+        finally:
+            _medicionActual.reset(token)
+            for forma, veces, metodo in medicion.repetidas(self.umbral):
+                print(f"ADVERTENCIA N+1: {metodo} repitió {veces} veces '{forma}' en {scope['method']} {scope['path']}")
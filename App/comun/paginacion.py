@@ -0,0 +1,66 @@
+import base64
+
+from bson import ObjectId, json_util
+
+LIMITE_DEFECTO = 50
+LIMITE_MAXIMO = 200
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificarCursor(*valores) -> str:
+    # Cursor opaco: la clave de orden del último documento entregado
+    texto = json_util.dumps(list(valores))
+    return base64.urlsafe_b64encode(texto.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decodificarCursor(cursor: str) -> list:
+    try:
+        texto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        valores = json_util.loads(texto)
+    except Exception:
+        raise CursorInvalido("Cursor de paginación inválido.")
+    if not isinstance(valores, list) or not valores:
+        raise CursorInvalido("Cursor de paginación inválido.")
+    return valores
+
+
+def limitar(limite) -> int:
+    return max(1, min(int(limite or LIMITE_DEFECTO), LIMITE_MAXIMO))
+
+
+def filtroDesde(cursor: str | None, filtro: dict | None = None) -> dict:
+    # Documentos posteriores al cursor, en orden ascendente de _id
+    filtro = dict(filtro or {})
+    if cursor:
+        ultimo = decodificarCursor(cursor)[0]
+        if not isinstance(ultimo, ObjectId):
+            raise CursorInvalido("Cursor de paginación inválido.")
+        filtro["_id"] = {"$gt": ultimo}
+    return filtro
+
+
+def filtroDesdeClave(cursor: str | None, campos: tuple, filtro: dict | None = None) -> dict:
+    # Documentos posteriores al cursor para un orden ascendente compuesto, p. ej. (fecha, _id)
+    filtro = dict(filtro or {})
+    if cursor:
+        ultimo = decodificarCursor(cursor)
+        if len(ultimo) != len(campos):
+            raise CursorInvalido("Cursor de paginación inválido.")
+        condiciones = []
+        for i, campo in enumerate(campos):
+            condicion = {campos[j]: ultimo[j] for j in range(i)}
+            condicion[campo] = {"$gt": ultimo[i]}
+            condiciones.append(condicion)
+        filtro["$or"] = condiciones
+    return filtro
+
+
+def cortarPagina(docs: list, limite: int, clave=lambda doc: (doc["_id"],)) -> tuple:
+    # Se pide un documento de más: si llegó, hay otra página
+    if len(docs) <= limite:
+        return docs, None
+    pagina = docs[:limite]
+    return pagina, codificarCursor(*clave(pagina[-1]))
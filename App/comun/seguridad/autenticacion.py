@@ -0,0 +1,114 @@
+"""
+Autenticación que comparten todos los servicios: token Bearer firmado o credenciales Basic.
+- Con token no se consulta Mongo en cada petición: solo se recargan las revocaciones cada pocos segundos.
+- Basic verifica contra la colección usuarios y reutiliza la caché.
+- Las rutas protegidas de cada servicio dependen de validarUsuario; las credenciales inválidas responden 401.
+"""
+from typing import Optional
+
+from bson import ObjectId
+from fastapi import Depends, HTTPException, Request
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, HTTPBearer, HTTPAuthorizationCredentials
+from pydantic import BaseModel
+
+from comun.seguridad.cacheAutenticacion import cacheAutenticacion
+from comun.seguridad.tokens import listaRevocacion, verificarToken
+
+security = HTTPBasic(auto_error=False)
+bearer = HTTPBearer(auto_error=False)
+
+
+class SesionUsuario(BaseModel):
+    estatus: str
+    mensaje: str
+    # Documento del usuario; las rutas usan '_id' y 'rol'
+    usuario: Optional[dict] = None
+
+
+async def iniciarSesion(db, email: str, password: str) -> SesionUsuario:
+    salida = SesionUsuario(estatus="", mensaje="")
+
+    try:
+        # 1. Verificar que el email exista
+        usuario = await db.usuarios.find_one({"email": email})
+        if not usuario:
+            salida.estatus = "ERROR"
+            salida.mensaje = "El correo electrónico no está registrado."
+            return salida
+
+        # 2. Comparar la contraseña
+        if usuario.get("password") != password:
+            salida.estatus = "ERROR"
+            salida.mensaje = "Contraseña incorrecta."
+            return salida
+
+        # 3. Verificar que el usuario esté activo
+        if not usuario.get("estatus", False):
+            salida.estatus = "ERROR"
+            salida.mensaje = "El usuario no está activo."
+            return salida
+
+        # 4. Credenciales correctas
+        salida.estatus = "OK"
+        salida.mensaje = f"Usuario {str(usuario['_id'])} autenticado con éxito."
+        salida.usuario = usuario
+        return salida
+
+    except Exception as ex:
+        print("ERROR en iniciar_sesion:", ex)
+        salida.estatus = "ERROR"
+        salida.mensaje = "Error al iniciar sesión, consulte al administrador."
+        return salida
+
+
+async def autenticar(db, email: str, password: str) -> SesionUsuario:
+    # Igual que iniciarSesion, pero reutiliza credenciales ya verificadas desde la caché
+    await cacheAutenticacion.sincronizar(db)
+    salida = cacheAutenticacion.obtener(email, password)
+    if salida is not None:
+        return salida
+
+    salida = await iniciarSesion(db, email, password)
+    if salida.estatus == "OK" and salida.usuario:
+        cacheAutenticacion.guardar(email, password, salida)
+    return salida
+
+
+def validarToken(token: str) -> SesionUsuario | None:
+    datos = verificarToken(token)
+    if datos is None:
+        return None
+    try:
+        id_usuario = ObjectId(datos["sub"])
+    except Exception:
+        return None
+
+    # Misma forma que deja iniciarSesion, con lo que usan las rutas (_id y rol)
+    return SesionUsuario(estatus="OK", mensaje=f"Usuario {datos['sub']} autenticado con token.",
+                         usuario={"_id": id_usuario, "rol": datos.get("rol", "")})
+
+
+async def validarUsuario(request: Request,
+                         token: HTTPAuthorizationCredentials = Depends(bearer),
+                         credenciales: HTTPBasicCredentials = Depends(security)) -> SesionUsuario:
+    if token is not None:
+        await listaRevocacion.sincronizar(request.app.db)
+        sesion = validarToken(token.credentials)
+        if sesion is None:
+            raise HTTPException(
+                status_code=401,
+                detail="Token inválido o expirado",
+                headers={"WWW-Authenticate": "Bearer"},)
+        return sesion
+    if credenciales is None:
+        raise HTTPException(
+            status_code=401,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Basic"},)
+    resultado_login = await autenticar(request.app.db, credenciales.username, credenciales.password)
+    if resultado_login.estatus != "OK" or not resultado_login.usuario:
+        raise HTTPException(
+            status_code=401,
+            detail="Credenciales incorrectas o usuario no encontrado",
+            headers={"WWW-Authenticate": "Basic"},)
+    return resultado_login
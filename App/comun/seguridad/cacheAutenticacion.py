@@ -0,0 +1,106 @@
+import hashlib
+import hmac
+import secrets
+import time
+from collections import OrderedDict
+
+from comun.versiones import CLAVE_USUARIOS, versionGlobal
+
+MAX_ENTRADAS = 10000
+TTL_SEGUNDOS = 300
+VERIFICAR_CADA = 5
+
+
+class CacheAutenticacion:
+    """
+    Caché LRU con expiración de credenciales ya verificadas.
+    - La llave es un HMAC-SHA256 de email y contraseña; la contraseña nunca se guarda en claro.
+    - Solo se guardan inicios de sesión correctos.
+    - Se invalida por id de usuario cuando cambian sus datos, su rol o su estatus.
+      Los demás procesos notan el cambio por la versión CLAVE_USUARIOS de la colección versiones,
+      revisada como máximo cada VERIFICAR_CADA segundos; si cambió se vacía la caché completa.
+    """
+
+    def __init__(self, max_entradas: int = MAX_ENTRADAS, ttl_segundos: float = TTL_SEGUNDOS,
+                 verificar_cada: float = VERIFICAR_CADA):
+        self.max_entradas = max_entradas
+        self.ttl_segundos = ttl_segundos
+        self.verificar_cada = verificar_cada
+        self._secreto = secrets.token_bytes(32)
+        self._entradas = OrderedDict()  # llave -> (expira, id_usuario, resultado)
+        self._por_usuario = {}          # id_usuario -> {llaves}
+        self._version = None
+        self._verificado = 0.0
+        self.aciertos = 0
+        self.fallos = 0
+
+    def _llave(self, email: str, password: str) -> str:
+        mensaje = f"{email}\0{password}".encode("utf-8")
+        return hmac.new(self._secreto, mensaje, hashlib.sha256).hexdigest()
+
+    def _quitar(self, llave: str):
+        entrada = self._entradas.pop(llave, None)
+        if entrada is None:
+            return
+        llaves = self._por_usuario.get(entrada[1])
+        if llaves is not None:
+            llaves.discard(llave)
+            if not llaves:
+                del self._por_usuario[entrada[1]]
+
+    async def sincronizar(self, db):
+        # Se llama antes de obtener(); las escrituras de otros procesos incrementan la versión
+        ahora = time.monotonic()
+        if ahora - self._verificado < self.verificar_cada:
+            return
+        self._verificado = ahora
+        try:
+            version = await versionGlobal(db, CLAVE_USUARIOS)
+        except Exception as ex:
+            # Sin poder comprobar la versión no se confía en lo guardado
+            print("Error al verificar la versión de usuarios:", ex)
+            self.limpiar()
+            self._version = None
+            return
+        if version != self._version:
+            self.limpiar()
+            self._version = version
+
+    def obtener(self, email: str, password: str):
+        llave = self._llave(email, password)
+        entrada = self._entradas.get(llave)
+        if entrada is None or entrada[0] <= time.monotonic():
+            if entrada is not None:
+                self._quitar(llave)
+            self.fallos += 1
+            return None
+        self._entradas.move_to_end(llave)
+        self.aciertos += 1
+        return entrada[2]
+
+    def guardar(self, email: str, password: str, resultado):
+        id_usuario = str(resultado.usuario["_id"])
+        llave = self._llave(email, password)
+        self._quitar(llave)
+        self._entradas[llave] = (time.monotonic() + self.ttl_segundos, id_usuario, resultado)
+        self._por_usuario.setdefault(id_usuario, set()).add(llave)
+        while len(self._entradas) > self.max_entradas:
+            self._quitar(next(iter(self._entradas)))
+
+    def invalidarUsuario(self, id_usuario: str):
+        for llave in list(self._por_usuario.get(str(id_usuario), ())):
+            self._quitar(llave)
+
+    def limpiar(self):
+        self._entradas.clear()
+        self._por_usuario.clear()
+
+    def estadisticas(self) -> dict:
+        return {
+            "entradas": len(self._entradas),
+            "aciertos": self.aciertos,
+            "fallos": self.fallos,
+        }
+
+
+cacheAutenticacion = CacheAutenticacion()
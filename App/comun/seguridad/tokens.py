@@ -0,0 +1,99 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+# Todos los servicios que validen tokens deben compartir el mismo secreto.
+# Sin él cada proceso firmaría con uno distinto: el servicio no arranca.
+SECRETO = os.environ.get("AGRO_TOKEN_SECRETO", "").encode("utf-8")
+if not SECRETO:
+    raise RuntimeError("Falta la variable de entorno AGRO_TOKEN_SECRETO (secreto compartido para firmar tokens)")
+DURACION_SEGUNDOS = 15 * 60
+COLECCION_REVOCADOS = "tokens_revocados"
+VERIFICAR_CADA = 5
+
+
+def _codificar(datos: bytes) -> str:
+    return base64.urlsafe_b64encode(datos).rstrip(b"=").decode("ascii")
+
+
+def _decodificar(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _firmar(contenido: str) -> str:
+    return _codificar(hmac.new(SECRETO, contenido.encode("ascii"), hashlib.sha256).digest())
+
+
+class ListaRevocacion:
+    """
+    Usuarios cuyos tokens emitidos antes de cierto momento ya no son válidos
+    (desactivados, con rol cambiado...).
+    - Se guardan en la colección COLECCION_REVOCADOS, común a todos los procesos. Una revocación
+      solo necesita vivir lo que dura un token; el índice TTL sobre 'expira' la borra después.
+    - Cada proceso consulta una copia local que recarga como máximo cada VERIFICAR_CADA segundos.
+    """
+
+    def __init__(self, verificar_cada: float = VERIFICAR_CADA):
+        self.verificar_cada = verificar_cada
+        self._revocados = {}  # id_usuario -> momento de la revocación
+        self._verificado = 0.0
+
+    async def revocar(self, db, id_usuario: str):
+        ahora = time.time()
+        self._revocados[str(id_usuario)] = ahora
+        await db[COLECCION_REVOCADOS].update_one(
+            {"_id": str(id_usuario)},
+            {"$max": {"revocado": ahora},
+             "$set": {"expira": datetime.now(timezone.utc) + timedelta(seconds=DURACION_SEGUNDOS)}},
+            upsert=True)
+
+    async def sincronizar(self, db):
+        # Se llama antes de verificar tokens; trae las revocaciones hechas por otros procesos
+        ahora = time.monotonic()
+        if ahora - self._verificado < self.verificar_cada:
+            return
+        self._verificado = ahora
+        try:
+            limite = time.time() - DURACION_SEGUNDOS
+            docs = await db[COLECCION_REVOCADOS].find({"revocado": {"$gte": limite}}).to_list(length=None)
+        except Exception as ex:
+            # Se conserva la última copia; se vuelve a intentar en la siguiente verificación
+            print(f"Error al leer {COLECCION_REVOCADOS}:", ex)
+            return
+        self._revocados = {doc["_id"]: doc["revocado"] for doc in docs}
+
+    def estaRevocado(self, id_usuario: str, emitido: float) -> bool:
+        momento = self._revocados.get(str(id_usuario))
+        return momento is not None and emitido <= momento
+
+
+listaRevocacion = ListaRevocacion()
+
+
+def emitirToken(id_usuario: str, rol: str) -> str:
+    ahora = time.time()
+    datos = {"sub": str(id_usuario), "rol": rol, "iat": ahora, "exp": ahora + DURACION_SEGUNDOS}
+    contenido = _codificar(json.dumps(datos, separators=(",", ":")).encode("utf-8"))
+    return f"{contenido}.{_firmar(contenido)}"
+
+
+def verificarToken(token: str) -> dict | None:
+    # Solo trabajo de CPU: firma, expiración y la copia local de la lista de revocación
+    try:
+        contenido, firma = token.split(".", 1)
+        if not hmac.compare_digest(firma, _firmar(contenido)):
+            return None
+        datos = json.loads(_decodificar(contenido))
+    except Exception:
+        return None
+
+    if datos.get("exp", 0) <= time.time():
+        return None
+    if listaRevocacion.estaRevocado(datos.get("sub"), datos.get("iat", 0)):
+        return None
+    return datos
+
@@ -0,0 +1,83 @@
+"""
+Camino rápido para listados grandes: filas tomadas de Mongo sin volver a validarlas con pydantic
+y serializadas con orjson. La forma del JSON es la misma que produce el response_model.
+"""
+from datetime import date, datetime
+from functools import lru_cache
+from types import UnionType
+from typing import Union, get_args, get_origin
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+
+def _aTexto(valor):
+    return str(valor) if isinstance(valor, ObjectId) else valor
+
+
+def _aFlotante(valor):
+    return float(valor) if isinstance(valor, int) and not isinstance(valor, bool) else valor
+
+
+def _aFecha(valor):
+    return valor.date() if isinstance(valor, datetime) else valor
+
+
+def _convertidor(anotacion):
+    # Solo las conversiones que pydantic haría con datos que vienen de Mongo; lo demás pasa tal cual
+    origen = get_origin(anotacion)
+    if origen in (Union, UnionType):
+        opciones = [a for a in get_args(anotacion) if a is not type(None)]
+        return _convertidor(opciones[0]) if len(opciones) == 1 else None
+    if origen is list:
+        argumentos = get_args(anotacion)
+        elemento = _convertidor(argumentos[0]) if argumentos else None
+        return (lambda valores: [elemento(v) for v in valores]) if elemento else None
+    if anotacion is str:
+        return _aTexto
+    if anotacion is float:
+        return _aFlotante
+    if anotacion is date:
+        return _aFecha
+    if isinstance(anotacion, type) and issubclass(anotacion, BaseModel):
+        return proyector(anotacion)
+    return None
+
+
+@lru_cache(maxsize=None)
+def proyector(modelo: type[BaseModel]):
+    # Campos públicos del modelo (los que salen en la respuesta) con su valor por defecto y conversión
+    campos = [(nombre, None if campo.is_required() else campo.get_default(call_default_factory=True),
+               _convertidor(campo.annotation))
+              for nombre, campo in modelo.model_fields.items()]
+
+    def proyectar(doc):
+        if doc is None or isinstance(doc, BaseModel):
+            return doc
+        fila = {}
+        for nombre, defecto, convertir in campos:
+            valor = doc.get(nombre, defecto)
+            fila[nombre] = convertir(valor) if convertir is not None and valor is not None else valor
+        return fila
+
+    return proyectar
+
+
+def filasConfiables(modelo: type[BaseModel], docs) -> list:
+    proyectar = proyector(modelo)
+    return [proyectar(doc) for doc in docs]
+
+
+def _porDefecto(valor):
+    if isinstance(valor, BaseModel):
+        return dict(valor)
+    if isinstance(valor, ObjectId):
+        return str(valor)
+    raise TypeError(f"Tipo no serializable: {type(valor).__name__}")
+
+
+def respuestaRapida(contenido, status_code: int = 200) -> Response:
+    return Response(content=orjson.dumps(contenido, default=_porDefecto),
+                    status_code=status_code, media_type="application/json")
@@ -0,0 +1,60 @@
+"""
+Versiones para ETag y GET condicional.
+- Cada escritura que cambia datos incrementa un contador ($inc): el campo 'version' del
+  documento, o una entrada de la colección 'versiones' para listados sin documento padre.
+- Sobre el mismo documento el $inc va en la misma escritura (conVersion); filtroSiCambia evita
+  incrementar cuando el $set no cambia nada, y matched_count indica si hubo cambios.
+- La lectura pide solo el contador; si coincide con If-None-Match se responde 304 sin armar la respuesta.
+- Aparte del contador, las escrituras que leen las reglas del motor de alertas marcan la hora del
+  cambio (CAMPO_ACTUALIZADO); el motor reevalúa lo escrito desde su última ejecución.
+"""
+import hashlib
+from datetime import datetime
+
+from fastapi import Request, Response
+
+CAMPO_VERSION = "version"
+# Cambia con cada escritura sobre usuarios: caché de credenciales y respuestas con nombres de usuario
+CLAVE_USUARIOS = "usuarios"
+CAMPO_ACTUALIZADO = "actualizadoEn"
+
+
+def filtroSiCambia(filtro: dict, campos: dict) -> dict:
+    # Solo coincide si algún campo del $set tiene otro valor
+    return {**filtro, "$or": [{campo: {"$ne": valor}} for campo, valor in campos.items()]}
+
+
+def conVersion(cambios: dict, campo: str = CAMPO_VERSION) -> dict:
+    return {**cambios, "$inc": {campo: 1}}
+
+
+def conActualizacion(campos: dict, prefijo: str = "") -> dict:
+    # Los campos de un $set (o un documento nuevo) con la hora de la escritura; prefijo p. ej. "riegos.$."
+    return {**campos, prefijo + CAMPO_ACTUALIZADO: datetime.now()}
+
+
+def etiquetaFuerte(*partes) -> str:
+    resumen = hashlib.blake2b("\0".join(str(p) for p in partes).encode("utf-8"), digest_size=12).hexdigest()
+    return f'"{resumen}"'
+
+
+def coincideEtiqueta(request: Request, etiqueta: str) -> bool:
+    # If-None-Match usa comparación débil: se ignora el prefijo W/ y puede traer varias etiquetas
+    encabezado = request.headers.get("if-none-match")
+    if not encabezado:
+        return False
+    candidatas = {e.strip().removeprefix("W/") for e in encabezado.split(",")}
+    return "*" in candidatas or etiqueta in candidatas
+
+
+def noModificado(etiqueta: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etiqueta})
+
+
+async def versionGlobal(db, clave: str) -> int:
+    doc = await db.versiones.find_one({"_id": clave})
+    return doc.get(CAMPO_VERSION, 0) if doc else 0
+
+
+async def incrementarVersionGlobal(db, clave: str):
+    await db.versiones.update_one({"_id": clave}, {"$inc": {CAMPO_VERSION: 1}}, upsert=True)
@@ -0,0 +1,61 @@
+"""
+Punto de entrada único: aloja las rutas de los cuatro servicios en un solo proceso.
+
+Uso (desde App):
+    python -m gateway.app        o        uvicorn gateway.app:app
+
+- Un solo cliente de Mongo (y un solo pool) para todas las rutas, creado en el startup.
+- Una sola dependencia de autenticación: todos los servicios usan comun.seguridad, así que en el proceso
+  hay una sola caché de credenciales y una sola lista de revocación.
+- Cada servicio sigue pudiéndose levantar solo con su propio main.py; aquí solo se reutilizan sus rutas.
+"""
+import uvicorn
+from fastapi import APIRouter, FastAPI
+from fastapi.routing import APIRoute
+
+from comun.instrumentacion import MedicionMiddleware
+from gateway.cargador import SERVICIOS, importarServicio
+
+app = FastAPI(title="AgroApp")
+
+usuarios = importarServicio("UsuariosREST", ("main", "dao.database"))
+Conexion = usuarios["dao.database"].Conexion
+# El listener de comandos de la conexión es el de comun.instrumentacion, el mismo módulo del middleware
+app.add_middleware(MedicionMiddleware)
+
+indices = []
+for servicio in SERVICIOS:
+    modulos = usuarios if servicio == "UsuariosREST" else importarServicio(servicio)
+    principal = modulos["main"]
+    if hasattr(principal, "asegurarIndices"):
+        indices.append((servicio, principal.asegurarIndices))
+
+    enrutador = APIRouter()
+    enrutador.routes.extend(ruta for ruta in principal.app.routes if isinstance(ruta, APIRoute) and ruta.path != "/")
+    app.include_router(enrutador)
+
+
+@app.get("/")
+async def home():
+    return {"mensaje": "Bienvenido a AgroApp", "servicios": list(SERVICIOS)}
+
+
+@app.on_event("startup")
+async def startup():
+    print("Conectando con MongoDB")
+    conexion = Conexion()
+    app.conexion = conexion
+    app.db = conexion.getDB()
+    for servicio, asegurar in indices:
+        print(f"Índices de {servicio}")
+        await asegurar(app.db)
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    print("Cerrando la conexion con MongoDB")
+    app.conexion.cerrar()
+
+
+if __name__ == '__main__':
+    uvicorn.run("gateway.app:app", host='127.0.0.1', reload=True)
@@ -0,0 +1,46 @@
+"""
+Carga los módulos de un servicio dentro del proceso actual.
+
+Cada servicio es su propia raíz de importación (dao, models, routes...), así que antes de
+cargar uno se olvidan los módulos del anterior y se pone su carpeta al frente de sys.path.
+Los objetos ya importados siguen funcionando: sus funciones conservan sus propios globals.
+El paquete 'comun' no se olvida: todos los servicios comparten la misma copia en el proceso.
+"""
+import importlib
+import sys
+from pathlib import Path
+
+RAIZ_APP = Path(__file__).resolve().parents[1]
+
+SERVICIOS = ("UsuariosREST", "CultivosREST", "Historial_sueloREST", "AlertasREST")
+
+# Paquetes y módulos de primer nivel que repiten nombre entre servicios
+PAQUETES_LOCALES = ("main", "mongo", "dao", "models", "routes", "routers", "rooters", "migraciones")
+
+
+def olvidarModulos():
+    for nombre in list(sys.modules):
+        if nombre.split(".")[0] in PAQUETES_LOCALES:
+            del sys.modules[nombre]
+
+
+def _importarDesde(servicio: str, modulos) -> dict:
+    ruta = str(RAIZ_APP / servicio)
+    sys.path.insert(0, ruta)
+    try:
+        cargados = {nombre: importlib.import_module(nombre) for nombre in modulos}
+    finally:
+        sys.path.remove(ruta)
+    return cargados
+
+
+def importarServicio(servicio: str, modulos=("main",)) -> dict:
+    if servicio not in SERVICIOS:
+        raise ValueError(f"Servicio desconocido: {servicio}")
+
+    olvidarModulos()
+    return _importarDesde(servicio, modulos)
+
+
+def cargarServicio(servicio: str):
+    return importarServicio(servicio)["main"].app
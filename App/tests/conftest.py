@@ -0,0 +1,16 @@
+"""
+Pruebas unitarias sin base de datos del paquete compartido y de la lógica pura de los servicios.
+- Se corren desde la raíz del repositorio con:  python -m pytest -q
+- La carpeta App va en sys.path igual que en main.py de cada servicio, para importar 'comun'.
+- comun/seguridad/tokens.py exige AGRO_TOKEN_SECRETO; las pruebas usan uno propio.
+"""
+import os
+import secrets
+import sys
+from pathlib import Path
+
+RAIZ_APP = str(Path(__file__).resolve().parents[1])
+if RAIZ_APP not in sys.path:
+    sys.path.append(RAIZ_APP)
+
+os.environ.setdefault("AGRO_TOKEN_SECRETO", secrets.token_hex(32))
@@ -0,0 +1,90 @@
+import asyncio
+
+from bson import ObjectId
+
+from comun.seguridad.autenticacion import SesionUsuario
+from comun.seguridad.cacheAutenticacion import CacheAutenticacion
+
+
+class ColeccionVersiones:
+    # Solo lo que usa versionGlobal: find_one por _id
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, filtro):
+        return self.docs.get(filtro["_id"])
+
+
+class BaseVersiones:
+    def __init__(self):
+        self.versiones = ColeccionVersiones()
+
+
+def sesion(id_usuario=None) -> SesionUsuario:
+    return SesionUsuario(estatus="OK", mensaje="", usuario={"_id": id_usuario or ObjectId(), "rol": "Agricultor"})
+
+
+def test_guarda_y_devuelve_credenciales():
+    cache = CacheAutenticacion()
+    resultado = sesion()
+    cache.guardar("a@x.com", "clave", resultado)
+    assert cache.obtener("a@x.com", "clave") is resultado
+    assert cache.obtener("a@x.com", "otra") is None
+    assert cache.estadisticas() == {"entradas": 1, "aciertos": 1, "fallos": 1}
+
+
+def test_invalidar_usuario_quita_todas_sus_entradas():
+    cache = CacheAutenticacion()
+    id_usuario = ObjectId()
+    cache.guardar("a@x.com", "clave", sesion(id_usuario))
+    cache.guardar("a@x.com", "anterior", sesion(id_usuario))
+    cache.guardar("b@x.com", "clave", sesion())
+    cache.invalidarUsuario(str(id_usuario))
+    assert cache.obtener("a@x.com", "clave") is None
+    assert cache.obtener("a@x.com", "anterior") is None
+    assert cache.obtener("b@x.com", "clave") is not None
+
+
+def test_expulsa_la_menos_usada():
+    cache = CacheAutenticacion(max_entradas=2)
+    cache.guardar("a@x.com", "1", sesion())
+    cache.guardar("b@x.com", "2", sesion())
+    cache.obtener("a@x.com", "1")  # 'b' queda como la menos usada
+    cache.guardar("c@x.com", "3", sesion())
+    assert cache.obtener("b@x.com", "2") is None
+    assert cache.obtener("a@x.com", "1") is not None
+    assert cache.obtener("c@x.com", "3") is not None
+    assert cache.estadisticas()["entradas"] == 2
+
+
+def test_entrada_vencida_no_se_devuelve():
+    cache = CacheAutenticacion(ttl_segundos=0)
+    cache.guardar("a@x.com", "clave", sesion())
+    assert cache.obtener("a@x.com", "clave") is None
+    assert cache.estadisticas()["entradas"] == 0
+
+
+def test_cambio_de_version_vacia_la_cache():
+    db = BaseVersiones()
+    cache = CacheAutenticacion(verificar_cada=0)
+    asyncio.run(cache.sincronizar(db))
+    cache.guardar("a@x.com", "clave", sesion())
+
+    # Sin escrituras la entrada sigue vigente
+    asyncio.run(cache.sincronizar(db))
+    assert cache.obtener("a@x.com", "clave") is not None
+
+    # Otro proceso actualizó un usuario
+    db.versiones.docs["usuarios"] = {"_id": "usuarios", "version": 1}
+    asyncio.run(cache.sincronizar(db))
+    assert cache.obtener("a@x.com", "clave") is None
+
+
+def test_version_se_revisa_solo_cada_intervalo():
+    db = BaseVersiones()
+    cache = CacheAutenticacion(verificar_cada=60)
+    asyncio.run(cache.sincronizar(db))
+    cache.guardar("a@x.com", "clave", sesion())
+    db.versiones.docs["usuarios"] = {"_id": "usuarios", "version": 1}
+    asyncio.run(cache.sincronizar(db))
+    assert cache.obtener("a@x.com", "clave") is not None
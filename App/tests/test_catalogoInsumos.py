@@ -0,0 +1,80 @@
+import asyncio
+
+from comun import catalogoInsumos
+from comun.catalogoInsumos import CLAVE_VERSION, CatalogoInsumos
+
+
+class Consulta:
+    # Solo lo que usa CatalogoInsumos: find().sort().limit().to_list()
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, campo, direccion):
+        self.docs = sorted(self.docs, key=lambda doc: doc[campo], reverse=direccion < 0)
+        return self
+
+    def limit(self, cantidad):
+        self.docs = self.docs[:cantidad]
+        return self
+
+    async def to_list(self, length=None):
+        return [dict(doc) for doc in self.docs]
+
+
+class ColeccionInsumos:
+    def __init__(self, docs):
+        self.docs = docs
+        self.consultas = 0
+
+    def find(self, filtro):
+        self.consultas += 1
+        return Consulta(self.docs)
+
+
+class ColeccionVersiones:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, filtro):
+        return self.docs.get(filtro["_id"])
+
+
+class Base:
+    def __init__(self, docs):
+        self.insumos = ColeccionInsumos(docs)
+        self.versiones = ColeccionVersiones()
+
+
+def test_pagina_y_cargar_desde_memoria():
+    db = Base([{"_id": i, "cantDisponible": 10} for i in (3, 1, 2)])
+    catalogo = CatalogoInsumos()
+    assert [doc["_id"] for doc in asyncio.run(catalogo.pagina(db, 1, 5))] == [2, 3]
+    assert asyncio.run(catalogo.cargar(db, [2, 9])) == {2: {"_id": 2, "cantDisponible": 10}, 9: None}
+    assert db.insumos.consultas == 1
+
+
+def test_cambio_de_version_de_otro_proceso_recarga(monkeypatch):
+    reloj = [1000.0]
+    monkeypatch.setattr(catalogoInsumos.time, "monotonic", lambda: reloj[0])
+    db = Base([{"_id": 1, "cantDisponible": 10}])
+    catalogo = CatalogoInsumos(verificar_cada=5)
+    assert asyncio.run(catalogo.cargar(db, [1]))[1]["cantDisponible"] == 10
+
+    # Otro proceso descontó existencia e incrementó la versión
+    db.insumos.docs = [{"_id": 1, "cantDisponible": 4}]
+    db.versiones.docs[CLAVE_VERSION] = {"_id": CLAVE_VERSION, "version": 1}
+    assert asyncio.run(catalogo.cargar(db, [1]))[1]["cantDisponible"] == 10  # aún sin revisar
+    reloj[0] += 5
+    assert asyncio.run(catalogo.cargar(db, [1]))[1]["cantDisponible"] == 4
+    assert db.insumos.consultas == 2
+
+    # Sin más cambios se sirve de memoria
+    reloj[0] += 5
+    assert asyncio.run(catalogo.cargar(db, [1]))[1]["cantDisponible"] == 4
+    assert db.insumos.consultas == 2
+
+
+def test_demasiado_grande_no_se_guarda():
+    db = Base([{"_id": i} for i in range(3)])
+    catalogo = CatalogoInsumos(max_entradas=2)
+    assert asyncio.run(catalogo.cargar(db, [0])) is None
@@ -0,0 +1,45 @@
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+
+from comun.indices import _difiere
+
+EMAIL = {"nombre": "email_unico", "llaves": [("email", ASCENDING)], "opciones": {"unique": True}}
+
+
+def existente(llaves, **opciones) -> dict:
+    # Misma forma que regresa index_information()
+    return {"v": 2, "key": list(llaves), **opciones}
+
+
+def test_indice_igual_no_difiere():
+    assert _difiere(EMAIL, existente([("email", 1)], unique=True)) == []
+
+
+def test_opcion_falsa_equivale_a_ausente():
+    spec = {"nombre": "fecha", "llaves": [("fecha", ASCENDING)]}
+    assert _difiere(spec, existente([("fecha", 1)], sparse=False)) == []
+
+
+def test_llaves_distintas():
+    diferencias = _difiere(EMAIL, existente([("email", -1)], unique=True))
+    assert len(diferencias) == 1 and diferencias[0].startswith("llaves")
+
+    compuesto = {"nombre": "c", "llaves": [("idCultivo", ASCENDING), ("fecha", DESCENDING)]}
+    assert _difiere(compuesto, existente([("fecha", -1), ("idCultivo", 1)]))
+
+
+def test_opciones_distintas():
+    assert _difiere(EMAIL, existente([("email", 1)])) == ["unique: None != True"]
+
+    ttl = {"nombre": "expira_ttl", "llaves": [("expira", ASCENDING)], "opciones": {"expireAfterSeconds": 0}}
+    assert _difiere(ttl, existente([("expira", 1)], expireAfterSeconds=3600)) == ["expireAfterSeconds: 3600 != 0"]
+
+    parcial = {"nombre": "p", "llaves": [("estatus", ASCENDING)],
+               "opciones": {"partialFilterExpression": {"estatus": "Pendiente"}}}
+    assert _difiere(parcial, existente([("estatus", 1)], partialFilterExpression={"estatus": "Aplicado"}))
+
+
+def test_version_2dsphere_solo_si_se_registra():
+    geo = {"nombre": "ubicacion", "llaves": [("ubicacion", GEOSPHERE)]}
+    assert _difiere(geo, existente([("ubicacion", "2dsphere")], **{"2dsphereIndexVersion": 3})) == []
+    geo["opciones"] = {"2dsphereIndexVersion": 2}
+    assert _difiere(geo, existente([("ubicacion", "2dsphere")], **{"2dsphereIndexVersion": 3}))
@@ -0,0 +1,56 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+# _lineasNDJSON vive en el DAO de Historial_sueloREST, que importa sus paquetes locales (models, dao)
+RAIZ_HISTORIAL = str(Path(__file__).resolve().parents[1] / "Historial_sueloREST")
+if RAIZ_HISTORIAL not in sys.path:
+    sys.path.insert(0, RAIZ_HISTORIAL)
+
+from dao.historial_sueloDao import MAX_BYTES_LINEA, _lineasNDJSON
+
+
+def lineas(*trozos) -> list:
+    async def flujo():
+        for trozo in trozos:
+            yield trozo
+
+    async def juntar():
+        return [par async for par in _lineasNDJSON(flujo())]
+    return asyncio.run(juntar())
+
+
+def test_lineas_partidas_entre_trozos():
+    assert lineas(b'{"a":', b'1}\n{"b"', b':2}\n') == [(1, b'{"a":1}'), (2, b'{"b":2}')]
+
+
+def test_ultima_linea_sin_salto():
+    assert lineas(b"uno\ndos") == [(1, b"uno"), (2, b"dos")]
+
+
+def test_lineas_vacias_conservan_numeracion():
+    assert lineas(b"uno\n\ntres\n") == [(1, b"uno"), (2, b""), (3, b"tres")]
+
+
+def test_sin_contenido():
+    assert lineas() == []
+    assert lineas(b"") == []
+
+
+@pytest.mark.parametrize("tamano_trozo", [1024, 16 * 1024, 200 * 1024])
+def test_linea_mayor_al_limite_se_descarta(tamano_trozo):
+    # El resultado no depende de cómo llegue partido el cuerpo
+    cuerpo = b"antes\n" + b"x" * (MAX_BYTES_LINEA + 10) + b"\ndespues\n"
+    trozos = [cuerpo[i:i + tamano_trozo] for i in range(0, len(cuerpo), tamano_trozo)]
+    assert lineas(*trozos) == [(1, b"antes"), (2, None), (3, b"despues")]
+
+
+def test_linea_mayor_al_limite_al_final():
+    assert lineas(b"antes\n", b"x" * (MAX_BYTES_LINEA + 1)) == [(1, b"antes"), (2, None)]
+
+
+def test_linea_en_el_limite_se_conserva():
+    linea = b"x" * MAX_BYTES_LINEA
+    assert lineas(linea[:1000], linea[1000:] + b"\n") == [(1, linea)]
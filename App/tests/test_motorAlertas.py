@@ -0,0 +1,47 @@
+import importlib.util
+from datetime import datetime
+from pathlib import Path
+
+# Se carga por ruta: el paquete 'dao' de AlertasREST se llama igual que el de los demás servicios
+_ruta = Path(__file__).resolve().parents[1] / "AlertasREST" / "dao" / "motorAlertas.py"
+_spec = importlib.util.spec_from_file_location("motorAlertas", _ruta)
+motorAlertas = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(motorAlertas)
+
+AYER = datetime(2024, 5, 1)
+HOY = datetime(2024, 5, 2)
+MARCA_CAMBIOS = datetime(2024, 5, 1, 23, 0)
+CORTE_CAMBIOS = datetime(2024, 5, 2, 8, 0)
+
+
+def test_vencidos_o_escritos_con_marcas():
+    condicion = motorAlertas._vencidosOEscritos("fechaEsperada", AYER, HOY, MARCA_CAMBIOS, CORTE_CAMBIOS)
+    assert condicion == {
+        "fechaEsperada": {"$lt": HOY},
+        "$or": [
+            # Llegó a su fecha límite en esta ventana
+            {"fechaEsperada": {"$gte": AYER}},
+            # Registrado tarde o editado (fecha, estado) desde la última ejecución, aunque la fecha sea anterior
+            {"actualizadoEn": {"$gte": MARCA_CAMBIOS, "$lt": CORTE_CAMBIOS}},
+        ],
+    }
+
+
+def test_vencidos_o_escritos_con_prefijo():
+    condicion = motorAlertas._vencidosOEscritos("fechaEsperada", AYER, HOY, MARCA_CAMBIOS, CORTE_CAMBIOS, "riegos.")
+    assert set(condicion) == {"riegos.fechaEsperada", "$or"}
+    assert [set(c) for c in condicion["$or"]] == [{"riegos.fechaEsperada"}, {"riegos.actualizadoEn"}]
+
+
+def test_sin_marca_de_escrituras_evalua_todo_lo_vencido():
+    # Primera ejecución, o marcas de una versión anterior sin la de escrituras
+    assert motorAlertas._vencidosOEscritos("fechaCosechaEst", "2024-05-01", "2024-05-02", None, CORTE_CAMBIOS) == {
+        "fechaCosechaEst": {"$lt": "2024-05-02"}}
+    assert motorAlertas._vencidosOEscritos("fechaCosechaEst", None, "2024-05-02", MARCA_CAMBIOS, CORTE_CAMBIOS) == {
+        "fechaCosechaEst": {"$lt": "2024-05-02"}}
+
+
+def test_escritos():
+    assert motorAlertas._escritos(None, CORTE_CAMBIOS) == {}
+    assert motorAlertas._escritos(MARCA_CAMBIOS, CORTE_CAMBIOS) == {
+        "actualizadoEn": {"$gte": MARCA_CAMBIOS, "$lt": CORTE_CAMBIOS}}
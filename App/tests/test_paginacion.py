@@ -0,0 +1,65 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+
+from comun.paginacion import (CursorInvalido, LIMITE_DEFECTO, LIMITE_MAXIMO, codificarCursor, cortarPagina,
+                              decodificarCursor, filtroDesde, filtroDesdeClave, limitar)
+
+
+def test_cursor_conserva_tipos_bson():
+    oid = ObjectId()
+    fecha = datetime(2024, 5, 1, 12, 30)
+    assert decodificarCursor(codificarCursor(fecha, oid)) == [fecha, oid]
+
+
+def test_cursor_es_seguro_para_url():
+    cursor = codificarCursor(ObjectId(), "ñandú/?&")
+    assert "=" not in cursor
+    assert all(c.isalnum() or c in "-_" for c in cursor)
+
+
+@pytest.mark.parametrize("cursor", ["", "%%%", "bm8gZXMganNvbg", codificarCursor()])
+def test_cursor_invalido(cursor):
+    with pytest.raises(CursorInvalido):
+        decodificarCursor(cursor)
+
+
+def test_limitar():
+    assert limitar(None) == LIMITE_DEFECTO
+    assert limitar(0) == LIMITE_DEFECTO
+    assert limitar(-5) == 1
+    assert limitar(LIMITE_MAXIMO + 1) == LIMITE_MAXIMO
+
+
+def test_filtro_desde_id():
+    oid = ObjectId()
+    assert filtroDesde(None, {"estatus": True}) == {"estatus": True}
+    assert filtroDesde(codificarCursor(oid), {"estatus": True}) == {"estatus": True, "_id": {"$gt": oid}}
+    with pytest.raises(CursorInvalido):
+        filtroDesde(codificarCursor("no es un ObjectId"))
+
+
+def test_filtro_desde_clave_compuesta():
+    fecha, oid = datetime(2024, 5, 1), ObjectId()
+    filtro = filtroDesdeClave(codificarCursor(fecha, oid), ("fecha", "_id"), {"idCultivo": 1})
+    assert filtro == {"idCultivo": 1, "$or": [{"fecha": {"$gt": fecha}},
+                                              {"fecha": fecha, "_id": {"$gt": oid}}]}
+    with pytest.raises(CursorInvalido):
+        filtroDesdeClave(codificarCursor(oid), ("fecha", "_id"))
+
+
+def test_cortar_pagina_sin_siguiente():
+    docs = [{"_id": ObjectId()} for _ in range(3)]
+    assert cortarPagina(docs, 3) == (docs, None)
+    assert cortarPagina([], 3) == ([], None)
+
+
+def test_cortar_pagina_con_siguiente():
+    docs = [{"_id": ObjectId(), "fecha": datetime(2024, 1, i + 1)} for i in range(4)]
+    pagina, siguiente = cortarPagina(docs, 3)
+    assert pagina == docs[:3]
+    assert decodificarCursor(siguiente) == [docs[2]["_id"]]
+
+    pagina, siguiente = cortarPagina(docs, 3, clave=lambda d: (d["fecha"], d["_id"]))
+    assert decodificarCursor(siguiente) == [docs[2]["fecha"], docs[2]["_id"]]
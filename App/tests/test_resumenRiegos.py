@@ -0,0 +1,82 @@
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import UpdateOne
+
+from gateway.cargador import importarServicio
+
+# El módulo importa dao.indices de CultivosREST; se carga como lo hace el gateway
+resumenRiegos = importarServicio("CultivosREST", ("dao.resumenRiegos",))["dao.resumenRiegos"]
+operacionesResumen = resumenRiegos.operacionesResumen
+
+CULTIVO = ObjectId()
+
+
+def riego(status="Aplicado", fechaAplicada=datetime(2024, 5, 10, 7, 30), cantAgua=100.0, duracionRiego=30,
+          fechaEsperada=datetime(2024, 5, 9)) -> dict:
+    return {"idRiego": "r1", "status": status, "fechaAplicada": fechaAplicada, "fechaEsperada": fechaEsperada,
+            "cantAgua": cantAgua, "duracionRiego": duracionRiego}
+
+
+def inc(periodo, inicio, agua, duracion, riegos) -> UpdateOne:
+    return UpdateOne({"idCultivo": CULTIVO, "periodo": periodo, "inicio": inicio},
+                     {"$inc": {"cantAgua": agua, "duracionRiego": duracion, "riegos": riegos}}, upsert=True)
+
+
+def test_alta_aplicado_suma_en_dia_y_mes():
+    assert operacionesResumen(CULTIVO, None, riego()) == [
+        inc("dia", datetime(2024, 5, 10), 100.0, 30.0, 1),
+        inc("mes", datetime(2024, 5, 1), 100.0, 30.0, 1),
+    ]
+
+
+def test_baja_resta():
+    assert operacionesResumen(CULTIVO, riego(), None) == [
+        inc("dia", datetime(2024, 5, 10), -100.0, -30.0, -1),
+        inc("mes", datetime(2024, 5, 1), -100.0, -30.0, -1),
+    ]
+
+
+def test_solo_aplicado_cuenta():
+    assert operacionesResumen(CULTIVO, None, riego(status="Pendiente")) == []
+    assert operacionesResumen(CULTIVO, riego(status="Pendiente"), riego(status="Cancelado")) == []
+    # Pendiente -> Aplicado es un alta; Aplicado -> Cancelado una baja
+    assert operacionesResumen(CULTIVO, riego(status="Pendiente"), riego()) == operacionesResumen(CULTIVO, None, riego())
+    assert operacionesResumen(CULTIVO, riego(), riego(status="Cancelado")) == operacionesResumen(CULTIVO, riego(), None)
+
+
+def test_cambio_de_cantidad_aplica_la_diferencia():
+    assert operacionesResumen(CULTIVO, riego(), riego(cantAgua=150.0)) == [
+        inc("dia", datetime(2024, 5, 10), 50.0, 0.0, 0),
+        inc("mes", datetime(2024, 5, 1), 50.0, 0.0, 0),
+    ]
+
+
+def test_sin_cambios_no_genera_operaciones():
+    assert operacionesResumen(CULTIVO, riego(), riego()) == []
+
+
+def test_cambio_de_dia_dentro_del_mes():
+    # El mes queda igual: su operación se omite
+    assert operacionesResumen(CULTIVO, riego(), riego(fechaAplicada=datetime(2024, 5, 20))) == [
+        inc("dia", datetime(2024, 5, 10), -100.0, -30.0, -1),
+        inc("dia", datetime(2024, 5, 20), 100.0, 30.0, 1),
+    ]
+
+
+def test_cambio_de_mes():
+    assert operacionesResumen(CULTIVO, riego(), riego(fechaAplicada=datetime(2024, 6, 2))) == [
+        inc("dia", datetime(2024, 5, 10), -100.0, -30.0, -1),
+        inc("mes", datetime(2024, 5, 1), -100.0, -30.0, -1),
+        inc("dia", datetime(2024, 6, 2), 100.0, 30.0, 1),
+        inc("mes", datetime(2024, 6, 1), 100.0, 30.0, 1),
+    ]
+
+
+def test_fecha_esperada_si_no_hay_aplicada():
+    assert operacionesResumen(CULTIVO, None, riego(fechaAplicada=None)) == [
+        inc("dia", datetime(2024, 5, 9), 100.0, 30.0, 1),
+        inc("mes", datetime(2024, 5, 1), 100.0, 30.0, 1),
+    ]
+    # Sin ninguna fecha válida no entra al resumen
+    assert operacionesResumen(CULTIVO, None, riego(fechaAplicada=None, fechaEsperada="2024-05-09")) == []
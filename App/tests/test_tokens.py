@@ -0,0 +1,76 @@
+import asyncio
+import time
+
+from comun.seguridad import tokens
+from comun.seguridad.tokens import ListaRevocacion, emitirToken, verificarToken
+
+
+class ColeccionRevocados:
+    # Lo que usa ListaRevocacion: update_one con upsert y find(...).to_list
+    def __init__(self):
+        self.docs = {}
+
+    async def update_one(self, filtro, cambios, upsert=False):
+        doc = self.docs.setdefault(filtro["_id"], {"_id": filtro["_id"], "revocado": 0})
+        doc["revocado"] = max(doc["revocado"], cambios["$max"]["revocado"])
+        doc.update(cambios["$set"])
+
+    def find(self, filtro):
+        limite = filtro["revocado"]["$gte"]
+        docs = [dict(d) for d in self.docs.values() if d["revocado"] >= limite]
+
+        class Cursor:
+            async def to_list(self, length=None):
+                return docs
+        return Cursor()
+
+
+class BaseRevocados(dict):
+    def __init__(self):
+        super().__init__({tokens.COLECCION_REVOCADOS: ColeccionRevocados()})
+
+
+def test_emite_y_verifica():
+    datos = verificarToken(emitirToken("u1", "Agricultor"))
+    assert datos["sub"] == "u1"
+    assert datos["rol"] == "Agricultor"
+    assert datos["exp"] - datos["iat"] == tokens.DURACION_SEGUNDOS
+
+
+def test_firma_alterada_no_verifica():
+    contenido, firma = emitirToken("u1", "Agricultor").split(".")
+    otro = emitirToken("u1", "Administrador").split(".")[0]
+    assert verificarToken(f"{otro}.{firma}") is None
+    assert verificarToken(f"{contenido}.{firma[:-2]}xx") is None
+    assert verificarToken("basura") is None
+
+
+def test_token_expirado(monkeypatch):
+    token = emitirToken("u1", "Agricultor")
+    despues = time.time() + tokens.DURACION_SEGUNDOS + 1
+    monkeypatch.setattr(tokens.time, "time", lambda: despues)
+    assert verificarToken(token) is None
+
+
+def test_revocacion_afecta_solo_tokens_anteriores(monkeypatch):
+    lista = ListaRevocacion()
+    monkeypatch.setattr(tokens, "listaRevocacion", lista)
+    anterior = emitirToken("u1", "Agricultor")
+    otro_usuario = emitirToken("u2", "Agricultor")
+    asyncio.run(lista.revocar(BaseRevocados(), "u1"))
+    time.sleep(0.01)
+    posterior = emitirToken("u1", "Supervisor")
+    assert verificarToken(anterior) is None
+    assert verificarToken(otro_usuario) is not None
+    assert verificarToken(posterior) is not None
+
+
+def test_revocacion_de_otro_proceso_llega_al_sincronizar():
+    db = BaseRevocados()
+    emisor = ListaRevocacion()
+    receptor = ListaRevocacion(verificar_cada=0)
+    emitido = time.time()
+    asyncio.run(emisor.revocar(db, "u1"))
+    assert not receptor.estaRevocado("u1", emitido)
+    asyncio.run(receptor.sincronizar(db))
+    assert receptor.estaRevocado("u1", emitido)
@@ -0,0 +1,20 @@
+from comun.versiones import conVersion, etiquetaFuerte, filtroSiCambia
+
+
+def test_filtro_si_cambia():
+    filtro = filtroSiCambia({"_id": 1, "registroActivo": True}, {"nomCultivo": "Maíz", "ubicacion.detalles": "Norte"})
+    assert filtro == {"_id": 1, "registroActivo": True,
+                      "$or": [{"nomCultivo": {"$ne": "Maíz"}}, {"ubicacion.detalles": {"$ne": "Norte"}}]}
+
+
+def test_con_version():
+    assert conVersion({"$set": {"a": 1}}) == {"$set": {"a": 1}, "$inc": {"version": 1}}
+    assert conVersion({"$set": {"a": 1}}, "versionSeguimientos") == {"$set": {"a": 1},
+                                                                     "$inc": {"versionSeguimientos": 1}}
+
+
+def test_etiqueta_cambia_con_cualquier_parte():
+    base = etiquetaFuerte("cultivo", "abc", 3, 7)
+    assert base == etiquetaFuerte("cultivo", "abc", 3, 7)
+    assert base != etiquetaFuerte("cultivo", "abc", 3, 8)
+    assert base.startswith('"') and base.endswith('"')
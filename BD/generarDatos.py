@@ -0,0 +1,322 @@
+"""
+Generador de datos sintéticos a partir de los JSON de ejemplo.
+
+Uso:
+    python generarDatos.py --escala 0.01 --limpiar
+    python generarDatos.py --usuarios 10000 --cultivos 500000 --riegos 50000000
+
+- Cada documento se arma copiando una plantilla al azar de "JSON con datos de ejemplo"
+  y reemplazando ids, referencias, fechas y cantidades.
+- Las referencias son consistentes: cultivos, riegos, seguimientos, historiales y actividades
+  apuntan a usuarios, cultivos e insumos que sí se generaron.
+- Los documentos siguen la forma que escriben los servicios: riegos en riegos_buckets,
+  historial_suelo como serie de tiempo (colección normal antes de MongoDB 7.0), aplicaciones en cultivos.aplicacionesInsumos.
+- Se inserta por lotes con varios insert_many en paralelo.
+- Los índices los crea cada servicio al arrancar (dao/indices.py); conviene arrancarlos
+  después de cargar los datos.
+- El resumen de agua (riegos_resumen) no se genera aquí; después de cargar, desde CultivosREST:
+  python -m migraciones.reconstruirResumenRiegos
+"""
+import argparse
+import asyncio
+import copy
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from bson import ObjectId, json_util
+from motor.motor_asyncio import AsyncIOMotorClient
+
+CARPETA_PLANTILLAS = Path(__file__).parent / "JSON con datos de ejemplo"
+PREFIJO_ARCHIVOS = "sistemagestionagricola"
+
+DATABASE_URL = 'mongodb://localhost:27017'
+DATABASE_NAME = 'sistemagestionagricola'
+
+# Mismos valores que RIEGOS_POR_BUCKET (CultivosREST/dao/riegosDAO.py), SERIES_DE_TIEMPO y VERSION_MINIMA_SERIES
+# (Historial_sueloREST/dao/indices.py) y PROYECCION_LISTADO (UsuariosREST/dao/listadoUsuarios.py)
+RIEGOS_POR_BUCKET = 200
+OPCIONES_HISTORIAL = {"timeField": "fechaMedicion", "metaField": "idCultivo", "granularity": "hours"}
+VERSION_MINIMA_SERIES = (7, 0)
+PROYECCION_LISTADO = {"$project": {"_id": 1, "idUsuario": {"$toString": "$_id"}, "nombre": 1, "estatus": 1, "email": 1}}
+
+VOLUMENES = {
+    "usuarios": 10_000,
+    "insumos": 500,
+    "cultivos": 500_000,
+    "riegos": 50_000_000,
+    "seguimientos": 1_000_000,
+    "historial": 5_000_000,
+    "actividades": 1_000_000,
+}
+
+FECHA_INICIO = datetime(2023, 1, 1)
+FECHA_FIN = datetime(2025, 12, 31)
+
+
+def cargarPlantillas(coleccion: str) -> list:
+    # Algunos archivos son un arreglo JSON y otros objetos concatenados; se leen ambos
+    texto = (CARPETA_PLANTILLAS / f"{PREFIJO_ARCHIVOS}.{coleccion}.json").read_text(encoding="utf-8")
+    decodificador = json.JSONDecoder(object_hook=json_util.object_hook)
+    documentos, posicion = [], 0
+    while True:
+        while posicion < len(texto) and texto[posicion].isspace():
+            posicion += 1
+        if posicion >= len(texto):
+            break
+        valor, posicion = decodificador.raw_decode(texto, posicion)
+        documentos.extend(valor if isinstance(valor, list) else [valor])
+    return documentos
+
+
+class Generador:
+
+    def __init__(self, volumenes: dict, semilla: int):
+        self.volumenes = volumenes
+        self.azar = random.Random(semilla)
+        self.usuarios = []
+        self.insumos = []
+        self.cultivos = []
+
+        self.plantillasUsuarios = cargarPlantillas("usuarios")
+        self.plantillasInsumos = cargarPlantillas("insumos")
+        self.plantillasCultivos = cargarPlantillas("cultivos")
+        self.plantillasSeguimientos = cargarPlantillas("seguimiento_cultivo")
+        self.plantillasHistorial = cargarPlantillas("historial_suelo")
+        self.plantillasActividades = cargarPlantillas("actividades_usuarios")
+        # El archivo de riegos trae {"riegos": [...]}; también se aprovechan los embebidos en cultivos
+        self.plantillasRiegos = [r for doc in cargarPlantillas("riegos") for r in doc.get("riegos", [])]
+        self.plantillasRiegos += [r for c in self.plantillasCultivos for r in c.get("riegos", [])]
+
+    # ---------------- utilidades
+    def _fecha(self) -> datetime:
+        segundos = int((FECHA_FIN - FECHA_INICIO).total_seconds())
+        return FECHA_INICIO + timedelta(seconds=self.azar.randrange(segundos))
+
+    def _variar(self, valor, porcentaje: float = 0.3):
+        if not isinstance(valor, (int, float)) or isinstance(valor, bool):
+            return valor
+        return round(valor * self.azar.uniform(1 - porcentaje, 1 + porcentaje), 2)
+
+    def _plantilla(self, plantillas: list) -> dict:
+        return copy.deepcopy(self.azar.choice(plantillas))
+
+    # ---------------- colecciones
+    def generarUsuarios(self):
+        for i in range(self.volumenes["usuarios"]):
+            doc = self._plantilla(self.plantillasUsuarios)
+            doc["_id"] = ObjectId()
+            local, _, dominio = doc.get("email", "usuario@example.com").partition("@")
+            doc["email"] = f"{local}.{i}@{dominio or 'example.com'}"
+            doc["estatus"] = self.azar.random() < 0.95
+            self.usuarios.append(doc["_id"])
+            yield doc
+
+    def generarInsumos(self):
+        for i in range(self.volumenes["insumos"]):
+            doc = self._plantilla(self.plantillasInsumos)
+            doc["_id"] = ObjectId()
+            doc["nombreInsumo"] = f"{doc.get('nombreInsumo', 'Insumo')} {i}"
+            doc["cantDisponible"] = self._variar(doc.get("cantDisponible", 100), 0.8)
+            self.insumos.append(doc["_id"])
+            yield doc
+
+    def _aplicacion(self, plantilla: dict) -> dict:
+        # Misma forma que AplicacionesInsumoDAO: fechas como texto (jsonable_encoder) e ids como ObjectId
+        return {
+            "_id": ObjectId(),
+            "cantidadAplicada": self._variar(plantilla.get("cantidadAplicada", plantilla.get("cantAplicada", 10))),
+            "fechaAplicacion": self._fecha().date().isoformat(),
+            "metodoAplicacion": plantilla.get("metodoAplicacion"),
+            "observaciones": plantilla.get("observaciones"),
+            "idUsuario": self.azar.choice(self.usuarios),
+            "idInsumo": self.azar.choice(self.insumos),
+        }
+
+    def generarCultivos(self):
+        for _ in range(self.volumenes["cultivos"]):
+            plantilla = self._plantilla(self.plantillasCultivos)
+            siembra = self._fecha()
+            ubicacion = plantilla.get("ubicacion")
+            if isinstance(ubicacion, list):
+                ubicacion = ubicacion[0] if ubicacion else None
+            if ubicacion and isinstance(ubicacion.get("coordenadas"), dict):
+                coordenadas = ubicacion["coordenadas"]
+                coordenadas["latitud"] = round(coordenadas.get("latitud", 19.4) + self.azar.uniform(-3, 3), 6)
+                coordenadas["longitud"] = round(coordenadas.get("longitud", -99.1) + self.azar.uniform(-3, 3), 6)
+                # Punto GeoJSON para el índice 2dsphere, igual que CultivoDAO.registrarNuevaUbicacion
+                ubicacion["geo"] = {"type": "Point", "coordinates": [coordenadas["longitud"], coordenadas["latitud"]]}
+
+            aplicaciones = plantilla.get("aplicacionesInsumos") or plantilla.get("aplicacionesInsumo") or [{}]
+            doc = {
+                "_id": ObjectId(),
+                "nomCultivo": plantilla.get("nomCultivo"),
+                "fechaSiembra": siembra.date().isoformat(),
+                "fechaCosechaEst": (siembra + timedelta(days=self.azar.randint(90, 240))).date().isoformat(),
+                "fechaCosechaReal": None,
+                "areaCultivo": self._variar(plantilla.get("areaCultivo", 5), 0.9),
+                "tipoSuelo": plantilla.get("tipoSuelo"),
+                "estadoActual": plantilla.get("estadoActual", "Sembrado"),
+                "idUsuario": self.azar.choice(self.usuarios),
+                "registroActivo": self.azar.random() < 0.95,
+                "ubicacion": ubicacion,
+                "aplicacionesInsumos": [self._aplicacion(self.azar.choice(aplicaciones))
+                                        for _ in range(self.azar.randint(0, 3))],
+            }
+            self.cultivos.append(doc["_id"])
+            yield doc
+
+    def _riego(self) -> dict:
+        plantilla = self.azar.choice(self.plantillasRiegos)
+        esperada = self._fecha()
+        aplicado = self.azar.random() < 0.7
+        return {
+            "fechaEsperada": esperada,
+            "fechaAplicada": esperada + timedelta(hours=self.azar.randint(0, 48)) if aplicado else None,
+            "cantAgua": self._variar(plantilla.get("cantAgua", plantilla.get("cantidadAgua", 100))),
+            "metodoRiego": plantilla.get("metodoRiego", "Goteo"),
+            "duracionRiego": self._variar(plantilla.get("duracionRiego", 2)),
+            "idUsuario": self.azar.choice(self.usuarios),
+            "status": "Aplicado" if aplicado else self.azar.choice(["Pendiente", "Cancelado"]),
+            "idRiego": str(ObjectId()),
+        }
+
+    def generarRiegosBuckets(self):
+        # Reparte los riegos entre todos los cultivos y los agrupa en buckets de RIEGOS_POR_BUCKET
+        total, cultivos = self.volumenes["riegos"], len(self.cultivos)
+        if not cultivos:
+            return
+        base, sobrante = divmod(total, cultivos)
+        for indice, id_cultivo in enumerate(self.cultivos):
+            pendientes = base + (1 if indice < sobrante else 0)
+            while pendientes > 0:
+                conteo = min(pendientes, RIEGOS_POR_BUCKET)
+                yield {"idCultivo": id_cultivo, "conteo": conteo, "riegos": [self._riego() for _ in range(conteo)]}
+                pendientes -= conteo
+
+    def generarSeguimientos(self):
+        for _ in range(self.volumenes["seguimientos"]):
+            doc = self._plantilla(self.plantillasSeguimientos)
+            doc["_id"] = ObjectId()
+            doc["fechaRevision"] = self._fecha().date().isoformat()
+            doc["idCultivo"] = self.azar.choice(self.cultivos)
+            doc["idUsuario"] = self.azar.choice(self.usuarios)
+            yield doc
+
+    def generarHistorial(self):
+        for _ in range(self.volumenes["historial"]):
+            doc = self._plantilla(self.plantillasHistorial)
+            doc.pop("_id", None)
+            doc["fechaMedicion"] = self._fecha()
+            doc["pH"] = round(min(14.0, max(0.0, self._variar(doc.get("pH", 6.5), 0.15))), 2)
+            for nutriente in doc.get("nutrientes", []):
+                nutriente["valor"] = self._variar(nutriente.get("valor"), 0.5)
+            doc["idCultivo"] = str(self.azar.choice(self.cultivos))
+            doc["idUsuario"] = str(self.azar.choice(self.usuarios))
+            doc["eliminado"] = False
+            yield doc
+
+    def generarActividades(self):
+        for _ in range(self.volumenes["actividades"]):
+            doc = self._plantilla(self.plantillasActividades)
+            doc["_id"] = ObjectId()
+            doc["fechaActividad"] = self._fecha()
+            doc["estatus"] = self.azar.random() < 0.5
+            doc["idCultivo"] = self.azar.choice(self.cultivos)
+            doc["idUsuario"] = self.azar.choice(self.usuarios)
+            yield doc
+
+
+async def insertarEnParalelo(coleccion, documentos, tamano_lote: int, concurrencia: int) -> int:
+    # Una cola acotada entre el generador y varios insert_many concurrentes: la memoria no crece con el volumen
+    cola = asyncio.Queue(maxsize=concurrencia * 2)
+    insertados = 0
+
+    async def trabajador():
+        nonlocal insertados
+        while True:
+            lote = await cola.get()
+            if lote is None:
+                return
+            await coleccion.insert_many(lote, ordered=False, bypass_document_validation=True)
+            insertados += len(lote)
+
+    trabajadores = [asyncio.create_task(trabajador()) for _ in range(concurrencia)]
+    lote = []
+    for doc in documentos:
+        lote.append(doc)
+        if len(lote) >= tamano_lote:
+            await cola.put(lote)
+            lote = []
+    if lote:
+        await cola.put(lote)
+    for _ in trabajadores:
+        await cola.put(None)
+    await asyncio.gather(*trabajadores)
+    return insertados
+
+
+async def generar(argumentos):
+    volumenes = {}
+    for nombre, cantidad in VOLUMENES.items():
+        explicito = getattr(argumentos, nombre)
+        volumenes[nombre] = max(0, explicito if explicito is not None else int(cantidad * argumentos.escala))
+    generador = Generador(volumenes, argumentos.semilla)
+    cliente = AsyncIOMotorClient(argumentos.url)
+    db = cliente[argumentos.bd]
+
+    pasos = [
+        ("usuarios", generador.generarUsuarios),
+        ("insumos", generador.generarInsumos),
+        ("cultivos", generador.generarCultivos),
+        ("riegos_buckets", generador.generarRiegosBuckets),
+        ("seguimiento_cultivo", generador.generarSeguimientos),
+        ("historial_suelo", generador.generarHistorial),
+        ("actividades_usuarios", generador.generarActividades),
+    ]
+    try:
+        if argumentos.limpiar:
+            for coleccion, _ in pasos:
+                await db.drop_collection(coleccion)
+        if "historial_suelo" not in await db.list_collection_names():
+            # Antes de MongoDB 7.0 el servicio no puede editar ni borrar en series de tiempo: colección normal
+            info = await db.command("buildInfo")
+            if tuple(info.get("versionArray", [0, 0])[:2]) >= VERSION_MINIMA_SERIES:
+                await db.create_collection("historial_suelo", timeseries=OPCIONES_HISTORIAL)
+            else:
+                print(f"historial_suelo: MongoDB {info.get('version')} < 7.0; se crea como colección normal")
+
+        print(f"Volúmenes: {volumenes}")
+        for coleccion, fuente in pasos:
+            inicio = time.perf_counter()
+            insertados = await insertarEnParalelo(db[coleccion], fuente(), argumentos.lote, argumentos.concurrencia)
+            segundos = time.perf_counter() - inicio
+            print(f"{coleccion}: {insertados} documentos en {segundos:.1f} s "
+                  f"({insertados / segundos if segundos else 0:.0f} docs/s)")
+
+        # Los usuarios se insertaron directo: el listado materializado se rehace completo
+        await db.usuarios.aggregate([PROYECCION_LISTADO, {"$out": "usuarios_listado"}]).to_list(length=None)
+        print(f"usuarios_listado: {await db.usuarios_listado.count_documents({})} documentos")
+    finally:
+        cliente.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera datos sintéticos a partir de los JSON de ejemplo.")
+    parser.add_argument("--url", default=DATABASE_URL)
+    parser.add_argument("--bd", default=DATABASE_NAME)
+    parser.add_argument("--escala", type=float, default=1.0,
+                        help="Multiplica los volúmenes por defecto (p. ej. 0.001 para una carga pequeña)")
+    for nombre, cantidad in VOLUMENES.items():
+        parser.add_argument(f"--{nombre}", type=int, default=None, help=f"Por defecto {cantidad} x escala")
+    parser.add_argument("--lote", type=int, default=5000, help="Documentos por insert_many")
+    parser.add_argument("--concurrencia", type=int, default=8, help="insert_many simultáneos")
+    parser.add_argument("--semilla", type=int, default=42)
+    parser.add_argument("--limpiar", action="store_true", help="Borra las colecciones antes de generar")
+    asyncio.run(generar(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()